@@ -1,14 +1,32 @@
 import logging
+import time
 import voluptuous as vol
 from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.device_registry import async_get as async_get_device_registry
 from homeassistant.components.persistent_notification import async_create as persistent_notification_async_create
 from homeassistant.helpers import config_validation as cv
 from homeassistant.core import SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN
-from .config_flow import OptionsFlowHandler as SilamPollenOptionsFlow
+from .const import (
+    DOMAIN,
+    VAR_OPTIONS,
+    DEFAULT_MOVEMENT_THRESHOLD,
+    DEFAULT_FORECAST_WINDOW,
+    DEFAULT_FORECAST_STEP,
+    DEFAULT_THRESHOLD_LOOKAHEAD,
+    DEFAULT_FORECAST_HOURS,
+    DEFAULT_MAX_RESPONSE_MB,
+    DEFAULT_MEMORY_BUDGET_MB,
+    PROFILE_MAX_CYCLES,
+    RESPONSE_SECTIONS,
+    RESPONSE_VARIABLES,
+    RESPONSE_FORMATS,
+)
+from .capabilities import cached_allergens
 from .coordinator import SilamCoordinator
-from .migration import async_migrate_entry
+from .data_processing import profile_altitudes, projection_fields
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -16,6 +34,7 @@ async def async_setup_entry(hass, entry):
     """Настраивает интеграцию SILAM Pollen через config entry."""
     # Запускаем миграцию, если версия равна 1 и minor_version меньше 2.
     if entry.version == 1 and entry.minor_version < 2:
+        from .migration import async_migrate_entry
         await async_migrate_entry(hass, entry)
 
     base_device_name = entry.title
@@ -26,8 +45,33 @@ async def async_setup_entry(hass, entry):
     desired_altitude = entry.data.get("altitude", hass.config.elevation)
     var_list = entry.options.get("var", entry.data.get("var", []))
     update_interval = entry.options.get("update_interval", entry.data.get("update_interval", 60))
+    # Интервал обновления фида аллергенов (по умолчанию – как у индекса)
+    allergen_update_interval = entry.options.get("allergen_update_interval", update_interval)
     forecast_enabled = entry.options.get("forecast", entry.data.get("forecast", False))
+    forecast_statistics = entry.options.get("forecast_statistics", entry.data.get("forecast_statistics", False))
     base_url = entry.data["base_url"]
+    # Режим следования за сущностью с координатами (person.*, device_tracker.*)
+    tracked_entity = entry.options.get("tracked_entity") or None
+    movement_threshold = entry.options.get("movement_threshold", DEFAULT_MOVEMENT_THRESHOLD)
+    # Дополнительные высоты вертикального профиля
+    extra_altitudes = entry.options.get("altitudes", [])
+    # Окна агрегации почасового прогноза
+    forecast_window = entry.options.get("forecast_window", DEFAULT_FORECAST_WINDOW)
+    forecast_step = entry.options.get("forecast_step", DEFAULT_FORECAST_STEP)
+    # Горизонт прогноза (часы)
+    forecast_hours = entry.options.get("forecast_hours", DEFAULT_FORECAST_HOURS)
+    # Пороги для бинарных сенсоров превышения
+    thresholds = _entry_thresholds(entry)
+    threshold_lookahead = entry.options.get("threshold_lookahead", DEFAULT_THRESHOLD_LOOKAHEAD)
+    # Хеджирование запросов в альтернативный набор данных
+    hedging = entry.options.get("hedge_requests", False)
+    # Предел размера ответа API (МБ)
+    max_response_size = entry.options.get("max_response_size", DEFAULT_MAX_RESPONSE_MB)
+    # Смешивание рядов основного и альтернативного наборов данных
+    blending = entry.options.get("blend_sources", False)
+    # Режим низкого потребления памяти и бюджет памяти обновления (МБ)
+    low_memory = entry.options.get("low_memory", False)
+    memory_budget = entry.options.get("memory_budget", DEFAULT_MEMORY_BUDGET_MB)
 
     # Создаем координатор для обновления данных.
     coordinator = SilamCoordinator(
@@ -40,91 +84,137 @@ async def async_setup_entry(hass, entry):
         desired_altitude,
         update_interval,
         base_url,
-        forecast=forecast_enabled
+        forecast=forecast_enabled,
+        entry_id=entry.entry_id,
+        forecast_statistics=forecast_statistics,
+        tracked_entity=tracked_entity,
+        movement_threshold=movement_threshold,
+        extra_altitudes=extra_altitudes,
+        forecast_window=forecast_window,
+        forecast_step=forecast_step,
+        thresholds=thresholds,
+        threshold_lookahead=threshold_lookahead,
+        forecast_hours=forecast_hours,
+        hedging=hedging,
+        allergen_update_interval=allergen_update_interval,
+        max_response_size=max_response_size,
+        blending=blending,
+        low_memory=low_memory,
+        memory_budget=memory_budget
+    )
+    await coordinator.async_load_history()
+    # Режим отладки: запись или воспроизведение ответов SILAM
+    await coordinator.async_set_cassette(
+        entry.options.get("cassette", "off"), entry.options.get("cassette_speed", 1.0)
     )
     await coordinator.async_config_entry_first_refresh()
+    coordinator.async_start_tracking()
+    entry.async_on_unload(coordinator.async_stop_tracking)
 
     # Сохраняем координатор для дальнейшего использования в платформах (sensor, weather).
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
 
-    # Определяем список платформ: всегда sensor, а weather – только если включена опция forecast.
+    # Определяем список платформ: всегда sensor, weather – только если включена опция forecast,
+    # binary_sensor – только если заданы пороги превышения.
     platforms = ["sensor"]
     if forecast_enabled:
         platforms.append("weather")
+    if thresholds:
+        platforms.append("binary_sensor")
     await hass.config_entries.async_forward_entry_setups(entry, platforms)
 
-    # Регистрируем службу ручного обновления, которая возвращает merged_data для обновлённых записей.
+    # Регистрируем службы: ручное обновление (возвращает merged_data или его проекцию для обновлённых записей),
+    # расчёт экспозиции (возвращает дозу, среднее, максимум и окно с наименьшей дозой)
+    # и профилирование циклов обновления (возвращает путь к профилю и самые затратные функции).
     # Данные цели передаются через ключ "targets" с вложенными списками "device_id" и "entity_id".
-    from homeassistant.helpers.device_registry import async_get as async_get_device_registry
 
-    async def handle_manual_update(call):
-        """Обработчик службы для ручного обновления данных для выбранных устройств/сущностей.
-        
-        Возвращает данные обновлённых записей в формате:
-        {"updated_entries": {<device_name>: merged_data, ...}}
-        """
-        updated_data = {}
-        targets = call.data.get("targets", {})
+    def _target_coordinators(targets):
+        """Возвращает координаторы (без повторов) для выбранных устройств и сущностей."""
+        coordinators = {}
         device_ids = targets.get("device_id", [])
         entity_ids = targets.get("entity_id", [])
 
-        if not device_ids and not entity_ids:
-            _LOGGER.warning("Для ручного обновления не выбрана ни одна цель")
-            return {"updated_entries": updated_data}
-
         # Получаем реестр устройств (синхронно, без await).
         device_registry = async_get_device_registry(hass)
+        registry = er.async_get(hass)
 
-        # Обрабатываем выбранные устройства.
-        for device_id in device_ids:
-            device_entry = device_registry.async_get(device_id)
-            if not device_entry:
-                _LOGGER.error("Устройство с id %s не найдено", device_id)
-                continue
-            # Для каждого идентификатора устройства, если он принадлежит нашей интеграции,
-            # используем entry_id для поиска координатора и его базового имени.
-            for identifier in device_entry.identifiers:
-                if identifier[0] == DOMAIN:
-                    entry_id = identifier[1]
-                    coordinator = hass.data.get(DOMAIN, {}).get(entry_id)
-                    if coordinator:
-                        await coordinator.async_request_refresh()
-                        updated_data[coordinator._base_device_name] = coordinator.merged_data
-                        _LOGGER.debug("Запущено ручное обновление для записи %s", entry_id)
-                    else:
-                        _LOGGER.error("Координатор для записи %s не найден", entry_id)
-
-        # Обрабатываем выбранные сущности.
+        # Устройства выбранных сущностей добавляются к выбранным устройствам.
         for entity_id in entity_ids:
-            registry = er.async_get(hass)
             entity_entry = registry.async_get(entity_id)
             if not entity_entry:
                 _LOGGER.error("Сущность с id %s не найдена", entity_id)
                 continue
             # Получаем device_id из записи сущности.
-            dev_id = entity_entry.device_id
-            if not dev_id:
+            if not entity_entry.device_id:
                 _LOGGER.error("Сущность %s не связана с устройством", entity_id)
                 continue
-            device_entry = device_registry.async_get(dev_id)
+            device_ids = [*device_ids, entity_entry.device_id]
+
+        for device_id in device_ids:
+            device_entry = device_registry.async_get(device_id)
             if not device_entry:
-                _LOGGER.error("Устройство для сущности %s не найдено", entity_id)
+                _LOGGER.error("Устройство с id %s не найдено", device_id)
                 continue
+            # Для каждого идентификатора устройства, если он принадлежит нашей интеграции,
+            # используем entry_id для поиска координатора.
             for identifier in device_entry.identifiers:
                 if identifier[0] == DOMAIN:
                     entry_id = identifier[1]
                     coordinator = hass.data.get(DOMAIN, {}).get(entry_id)
                     if coordinator:
-                        await coordinator.async_request_refresh()
-                        # Если для этого устройства уже добавлено значение, не перезаписываем.
-                        if coordinator._base_device_name not in updated_data:
-                            updated_data[coordinator._base_device_name] = coordinator.merged_data
-                        _LOGGER.debug("Запущено ручное обновление для записи %s (сущность)", entry_id)
+                        coordinators[entry_id] = coordinator
                     else:
                         _LOGGER.error("Координатор для записи %s не найден", entry_id)
+        return coordinators
+
+    async def handle_manual_update(call):
+        """Обработчик службы для ручного обновления данных для выбранных устройств/сущностей.
+        
+        Возвращает данные обновлённых записей в формате:
+        {"updated_entries": {<device_name>: merged_data, ...}}
+        Необязательные поля sections, variables, start, end и format ограничивают ответ
+        (MergedData.project); без них возвращается merged_data целиком.
+        """
+        updated_data = {}
+        targets = call.data.get("targets", {})
+        if not targets.get("device_id") and not targets.get("entity_id"):
+            _LOGGER.warning("Для ручного обновления не выбрана ни одна цель")
+            return {"updated_entries": updated_data}
+
+        columns, keys = projection_fields(call.data.get("variables"))
+        start = call.data.get("start")
+        end = call.data.get("end")
+        projection = {
+            "sections": call.data.get("sections"),
+            "columns": columns,
+            "keys": keys,
+            "start": dt_util.as_utc(start).timestamp() if start is not None else None,
+            "end": dt_util.as_utc(end).timestamp() if end is not None else None,
+            "numeric": call.data.get("format") == "numeric",
+        }
+        for entry_id, coordinator in _target_coordinators(targets).items():
+            await coordinator.async_request_refresh()
+            updated_data[coordinator._base_device_name] = coordinator.merged_data.project(**projection)
+            _LOGGER.debug("Запущено ручное обновление для записи %s", entry_id)
 
         return {"updated_entries": updated_data}
 
+    async def handle_exposure(call):
+        """Обработчик службы расчёта экспозиции по предвычисленным префиксным суммам.
+
+        Возвращает {"exposures": {<device_name>: сводка или None, ...}}.
+        """
+        start = call.data.get("start")
+        end = call.data.get("end")
+        start_ts = dt_util.as_utc(start).timestamp() if start is not None else time.time()
+        end_ts = dt_util.as_utc(end).timestamp() if end is not None else None
+        exposures = {}
+        for coordinator in _target_coordinators(call.data["targets"]).values():
+            exposures[coordinator._base_device_name] = coordinator.exposure(
+                call.data["variable"], start_ts, end_ts, call.data.get("window")
+            )
+        return {"exposures": exposures}
+
     hass.services.async_register(
         DOMAIN,
         "manual_update",
@@ -133,11 +223,85 @@ async def async_setup_entry(hass, entry):
             vol.Required("targets"): {
                 vol.Optional("device_id"): vol.All(cv.ensure_list, [str]),
                 vol.Optional("entity_id"): vol.All(cv.ensure_list, [str])
-            }
+            },
+            vol.Optional("sections"): vol.All(cv.ensure_list, [vol.In(RESPONSE_SECTIONS)]),
+            vol.Optional("variables"): vol.All(cv.ensure_list, [_allergen_validator(hass, RESPONSE_VARIABLES)]),
+            vol.Optional("start"): cv.datetime,
+            vol.Optional("end"): cv.datetime,
+            vol.Optional("format", default="raw"): vol.In(RESPONSE_FORMATS),
         }),
         supports_response=SupportsResponse.OPTIONAL
     )
 
+    async def handle_profile(call):
+        """Обработчик службы профилирования следующих циклов обновления выбранных записей.
+
+        С refresh=True циклы запускаются сразу (полное обновление), и ответ содержит сводку профиля:
+        {"profile": <путь к .prof>, "entries": [...], "cycles": N, "profiled_ms": ..., "hotspots": [...]}.
+        С refresh=False сессия ожидает плановых обновлений, ответ – {"armed": [...], "profile": <путь>},
+        а сводка записывается в журнал по завершении.
+        """
+        from .profiling import ProfileSession
+
+        coordinators = _target_coordinators(call.data["targets"])
+        if not coordinators:
+            raise HomeAssistantError("Не выбрана ни одна запись SILAM Pollen")
+        cycles = call.data.get("cycles", 1)
+        session = ProfileSession(hass, coordinators, cycles, call.data.get("top", 20))
+        try:
+            session.arm()
+        except RuntimeError as err:
+            raise HomeAssistantError(str(err)) from err
+        if not call.data.get("refresh", True):
+            # Результат никто не ожидает: ошибка сохранения уже записана в журнал
+            session.result.add_done_callback(lambda result: result.cancelled() or result.exception())
+            return {"armed": sorted(coordinators), "profile": session.path}
+        try:
+            for _ in range(cycles):
+                for coordinator in coordinators.values():
+                    await coordinator.async_full_refresh()
+            return await session.result
+        except Exception:
+            session.cancel()
+            raise
+
+    hass.services.async_register(
+        DOMAIN,
+        "exposure",
+        handle_exposure,
+        schema=vol.Schema({
+            vol.Required("targets"): {
+                vol.Optional("device_id"): vol.All(cv.ensure_list, [str]),
+                vol.Optional("entity_id"): vol.All(cv.ensure_list, [str])
+            },
+            vol.Required("variable"): _allergen_validator(hass, ("index",)),
+            vol.Optional("start"): cv.datetime,
+            vol.Optional("end"): cv.datetime,
+            vol.Optional("window"): vol.All(vol.Coerce(float), vol.Range(min=1, max=72)),
+        }),
+        supports_response=SupportsResponse.ONLY
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        "profile",
+        handle_profile,
+        schema=vol.Schema({
+            vol.Required("targets"): {
+                vol.Optional("device_id"): vol.All(cv.ensure_list, [str]),
+                vol.Optional("entity_id"): vol.All(cv.ensure_list, [str])
+            },
+            vol.Optional("cycles", default=1): vol.All(vol.Coerce(int), vol.Range(min=1, max=PROFILE_MAX_CYCLES)),
+            vol.Optional("top", default=20): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+            vol.Optional("refresh", default=True): cv.boolean,
+        }),
+        supports_response=SupportsResponse.OPTIONAL
+    )
+
+    # Колоночный прогноз для карточек панели (websocket API), команды регистрируются один раз
+    from .websocket import async_register_websocket_commands
+    async_register_websocket_commands(hass)
+
     # Регистрируем слушатель обновления опций, чтобы при изменении опций запись перезагружалась.
     entry.async_on_unload(entry.add_update_listener(update_listener))
     return True
@@ -145,41 +309,167 @@ async def async_setup_entry(hass, entry):
 async def async_unload_entry(hass, entry):
     """Отключает платформы интеграции и удаляет сохранённые данные координатора."""
     await hass.config_entries.async_forward_entry_unload(entry, "sensor")
-    forecast_enabled = entry.options.get("forecast", entry.data.get("forecast", False))
+    # Набор платформ определяется по координатору: опции к этому моменту могут быть уже изменены.
+    coordinator = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    forecast_enabled = coordinator._forecast_enabled if coordinator else entry.options.get("forecast", entry.data.get("forecast", False))
     if forecast_enabled:
         try:
             await hass.config_entries.async_forward_entry_unload(entry, "weather")
         except Exception as err:
             _LOGGER.warning("Weather platform unload error for entry %s: %s", entry.entry_id, err)
+    if coordinator is not None and coordinator.thresholds:
+        try:
+            await hass.config_entries.async_forward_entry_unload(entry, "binary_sensor")
+        except Exception as err:
+            _LOGGER.warning("Binary sensor platform unload error for entry %s: %s", entry.entry_id, err)
+    if coordinator is not None and coordinator.profiler is not None:
+        coordinator.profiler.cancel()
+    # Подписки websocket привязаны к координатору записи: после выгрузки они не получат обновлений
+    from .websocket import async_close_subscriptions
+    async_close_subscriptions(hass, entry.entry_id)
     hass.data.get(DOMAIN, {}).pop(entry.entry_id)
     return True
 
-async def update_listener(hass, entry):
-    """Обновляет запись при изменении опций, удаляя устаревшие сущности."""
-    registry = er.async_get(hass)
-    expected_ids = set()
+async def async_remove_entry(hass, entry):
+    """Удаляет сохранённую историю прогонов и архив записанных ответов при удалении записи."""
+    import shutil
+    from homeassistant.helpers.storage import Store
+    from .cassette import cassette_path
+    from .run_history import STORAGE_VERSION
+
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.runs").async_remove()
+    await hass.async_add_executor_job(shutil.rmtree, cassette_path(hass, entry.entry_id), True)
+
+def _allergen_validator(hass, extra=()):
+    """
+    Проверка аллергена в полях служб: ключ из VAR_OPTIONS, значения extra, аллерген из описаний
+    наборов данных (кеш capabilities.py) или аллерген, выбранный в одной из записей.
+    """
+    def validate(value):
+        value = cv.string(value)
+        if value in extra or value in VAR_OPTIONS or value in cached_allergens(hass):
+            return value
+        if any(value in coordinator._var_list for coordinator in hass.data.get(DOMAIN, {}).values()):
+            return value
+        raise vol.Invalid(f"Неизвестный аллерген: {value}")
+    return validate
+
+def _entry_thresholds(entry):
+    """
+    Возвращает пороги превышения из опций: {"index" или аллерген: значение}.
+    Нулевые и пустые значения означают, что бинарный сенсор не нужен.
+    """
+    thresholds = {}
+    keys = ["index", *entry.options.get("var", entry.data.get("var", []))]
+    for key in keys:
+        value = entry.options.get(f"threshold_{key}")
+        if value:
+            thresholds[key] = float(value)
+    return thresholds
+
+def _profile_altitudes(hass, entry):
+    """Дополнительные высоты профиля записи так, как их применяет координатор (без повторов и основной высоты)."""
+    return profile_altitudes(entry.data.get("altitude", hass.config.elevation), entry.options.get("altitudes", []))
+
+def _expected_unique_ids(hass, entry):
+    """Возвращает unique_id сущностей, ожидаемых для текущих опций записи."""
     # Ожидается сенсор "index".
-    expected_ids.add(f"{entry.entry_id}_index")
+    expected_ids = {f"{entry.entry_id}_index"}
     # Ожидаются сенсоры "main" для выбранных аллергенов.
+    # Для дополнительных высот профиля – сенсоры с суффиксом высоты.
     var_list = entry.options.get("var", entry.data.get("var", []))
+    altitudes = _profile_altitudes(hass, entry)
     for pollen in var_list:
         expected_ids.add(f"{entry.entry_id}_main_{pollen}")
+        for altitude in altitudes:
+            expected_ids.add(f"{entry.entry_id}_main_{pollen}_{altitude:g}m")
     # Если включен режим forecast, ожидается погодный сенсор с уникальным идентификатором _pollen_forecast.
     forecast_enabled = entry.options.get("forecast", entry.data.get("forecast", False))
     if forecast_enabled:
         expected_ids.add(f"{entry.entry_id}_pollen_forecast")
+    # Бинарные сенсоры для заданных порогов превышения.
+    for key in _entry_thresholds(entry):
+        expected_ids.add(f"{entry.entry_id}_threshold_{key}")
+    return expected_ids
+
+def _remove_stale_entities(hass, entry):
+    """Удаляет сущности записи, которые более не соответствуют опциям (по индексу реестра для config entry)."""
+    registry = er.async_get(hass)
+    expected_ids = _expected_unique_ids(hass, entry)
+    for entity in er.async_entries_for_config_entry(registry, entry.entry_id):
+        if entity.domain in ["sensor", "weather", "binary_sensor"] and entity.unique_id not in expected_ids:
+            registry.async_remove(entity.entity_id)
+            persistent_notification_async_create(
+                hass,
+                f"Сущность {entity.entity_id} удалена, так как выбранный тип пыльцы более не используется.",
+                title="SILAM Pollen"
+            )
+
+async def update_listener(hass, entry):
+    """
+    Применяет изменённые опции записи.
+
+    Смена набора аллергенов, интервалов обновления фидов, окон прогноза, публикации статистик,
+    хеджирования запросов, режима записи/воспроизведения и отслеживаемой сущности применяется на лету:
+    координатор перенастраивается, добавляются или удаляются только затронутые сущности.
+    Смена набора данных (base_url), включение/выключение прогноза, набора высот профиля
+    или набора порогов меняет набор платформ и сущностей, поэтому в этих случаях запись
+    перезагружается. Значения порогов меняются на лету.
+    """
+    coordinator = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    forecast_enabled = entry.options.get("forecast", entry.data.get("forecast", False))
+    if (
+        coordinator is None
+        or coordinator._base_url != entry.data.get("base_url")
+        or coordinator._forecast_enabled != forecast_enabled
+        or coordinator.altitudes[1:] != _profile_altitudes(hass, entry)
+    ):
+        _remove_stale_entities(hass, entry)
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+
+    # Набор бинарных сенсоров изменился – перезагружаем запись; иначе пороги меняются на лету.
+    thresholds = _entry_thresholds(entry)
+    if set(thresholds) != set(coordinator.thresholds):
+        _remove_stale_entities(hass, entry)
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    coordinator.async_set_thresholds(
+        thresholds, entry.options.get("threshold_lookahead", DEFAULT_THRESHOLD_LOOKAHEAD)
+    )
+
+    var_list = entry.options.get("var", entry.data.get("var", []))
+    update_interval = entry.options.get("update_interval", entry.data.get("update_interval", 60))
+    forecast_statistics = entry.options.get("forecast_statistics", entry.data.get("forecast_statistics", False))
 
-    for entity in list(registry.entities.values()):
-        if entity.config_entry_id == entry.entry_id and entity.domain in ["sensor", "weather"]:
-            if entity.unique_id not in expected_ids:
-                registry.async_remove(entity.entity_id)
-                persistent_notification_async_create(
-                    hass,
-                    f"Сущность {entity.entity_id} удалена, так как выбранный тип пыльцы более не используется.",
-                    title="SILAM Pollen"
-                )
-    await hass.config_entries.async_reload(entry.entry_id)
+    tracked_entity = entry.options.get("tracked_entity") or None
+    movement_threshold = entry.options.get("movement_threshold", DEFAULT_MOVEMENT_THRESHOLD)
+
+    coordinator.hedging = entry.options.get("hedge_requests", False)
+    coordinator.max_response_bytes = entry.options.get("max_response_size", DEFAULT_MAX_RESPONSE_MB) * 1024 * 1024
+    coordinator.low_memory = entry.options.get("low_memory", False)
+    coordinator.memory_budget_bytes = int(entry.options.get("memory_budget", DEFAULT_MEMORY_BUDGET_MB) * 1024 * 1024)
+    await coordinator.async_set_cassette(
+        entry.options.get("cassette", "off"), entry.options.get("cassette_speed", 1.0)
+    )
+
+    _remove_stale_entities(hass, entry)
+    await coordinator.async_set_blending(entry.options.get("blend_sources", False))
+    await coordinator.async_set_tracking(tracked_entity, movement_threshold)
+    added = await coordinator.async_reconfigure(
+        var_list,
+        update_interval,
+        forecast_statistics,
+        forecast_window=entry.options.get("forecast_window", DEFAULT_FORECAST_WINDOW),
+        forecast_step=entry.options.get("forecast_step", DEFAULT_FORECAST_STEP),
+        forecast_hours=entry.options.get("forecast_hours", DEFAULT_FORECAST_HOURS),
+        allergen_update_interval=entry.options.get("allergen_update_interval", update_interval),
+    )
+    if added and coordinator.async_add_allergen_sensors is not None:
+        coordinator.async_add_allergen_sensors(added)
 
 async def async_get_options_flow(config_entry):
     """Возвращает обработчик Options Flow для данной записи."""
-    return SilamPollenOptionsFlow()
+    # Схемы и селекторы потока настройки загружаются только при его открытии
+    from .config_flow import OptionsFlowHandler
+    return OptionsFlowHandler()
@@ -0,0 +1,94 @@
+"""
+binary_sensor.py для интеграции SILAM Pollen.
+
+Создаёт бинарные сенсоры превышения порогов: сенсор включён, если превышение
+идёт сейчас или ожидается в пределах горизонта threshold_lookahead.
+Состояние и атрибуты читаются из индексов пересечения, предвычисленных
+координатором один раз за обновление (coordinator.merged_data.crossings).
+"""
+
+import logging
+import time
+
+from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .capabilities import allergen_label
+from .const import DOMAIN, VAR_OPTIONS
+from .records import epoch_to_utc_isoformat
+from .thresholds import INDEX_THRESHOLD_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities):
+    coordinator = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if coordinator is None:
+        _LOGGER.error("Координатор для записи %s не найден!", entry.entry_id)
+        return
+
+    async_add_entities([
+        PollenThresholdBinarySensor(coordinator, entry.entry_id, key)
+        for key in coordinator.thresholds
+    ])
+
+
+class PollenThresholdBinarySensor(CoordinatorEntity, BinarySensorEntity):
+    """Бинарный сенсор превышения порога для индекса пыльцы или отдельного аллергена."""
+
+    _attr_has_entity_name = True
+    # Прогнозные атрибуты пересчитываются при каждом обновлении и не нужны в истории состояний
+    _unrecorded_attributes = frozenset({
+        "next_exceedance",
+        "exceedance_duration",
+        "hours_above",
+        "peak_time",
+        "peak_value",
+    })
+
+    def __init__(self, coordinator, entry_id: str, key: str):
+        super().__init__(coordinator)
+        self._entry_id = entry_id
+        self._key = key
+        if key == INDEX_THRESHOLD_KEY or key in VAR_OPTIONS:
+            name = "index" if key == INDEX_THRESHOLD_KEY else VAR_OPTIONS[key]
+            self._attr_translation_key = f"{name}_threshold"
+        else:
+            # Аллерген из описания набора данных, для которого нет перевода
+            self._attr_name = f"{allergen_label(key).capitalize()} threshold"
+        self._attr_unique_id = f"{entry_id}_threshold_{key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry_id)},
+        )
+
+    def _crossing(self):
+        merged = self.coordinator.merged_data
+        if not merged:
+            return None
+        return merged.crossings.get(self._key)
+
+    @property
+    def is_on(self) -> bool | None:
+        crossing = self._crossing()
+        if crossing is None:
+            return None
+        return crossing.exceeds_within(time.time(), self.coordinator.threshold_lookahead)
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        crossing = self._crossing()
+        if crossing is None:
+            return {"threshold": self.coordinator.thresholds.get(self._key)}
+        # Уже завершившиеся эпизоды пропускаются: между обновлениями данных время идёт
+        episode = crossing.upcoming(time.time())
+        return {
+            "threshold": crossing.threshold,
+            "next_exceedance": epoch_to_utc_isoformat(episode[0]) if episode else None,
+            "exceedance_duration": (episode[1] - episode[0]) / 3600 if episode else None,
+            "hours_above": crossing.hours_above,
+            "peak_time": epoch_to_utc_isoformat(crossing.peak_time) if crossing.peak_time is not None else None,
+            "peak_value": crossing.peak_value,
+        }
@@ -0,0 +1,117 @@
+"""
+blending.py
+
+Смешивание рядов двух наборов данных SILAM (основного набора записи и альтернативного
+из ALTERNATE_DATASETS) для точек, которые покрывают оба набора.
+
+Фид загружается из обоих наборов параллельно. Предпочтителен набор с более мелкой сеткой
+(региональный прогон): каждое значение берётся из него, если оно есть в этой точке времени,
+иначе – из другого набора. Ряды объединяются за один проход по их осям времени; для каждой
+переменной учитывается, сколько точек ряда обслужил каждый набор.
+"""
+
+import re
+from array import array
+
+from .const import ALTERNATE_DATASETS, DEFAULT_GRID_RESOLUTION, GRID_RESOLUTION
+from .records import ForecastSeries
+
+NAN = float("nan")
+
+
+def grid_step(base_url: str) -> float:
+    """Шаг сетки набора (градусы) по версии в базовом URL."""
+    match = re.search(r"v(\d+(?:_\d+)+)", base_url or "")
+    return GRID_RESOLUTION.get(match.group(1) if match else None, DEFAULT_GRID_RESOLUTION)
+
+
+def preferred_first(base_url: str, alternate_base: str) -> bool:
+    """Предпочтителен ли основной набор записи: шаг его сетки не крупнее, чем у альтернативного."""
+    return grid_step(base_url) <= grid_step(alternate_base)
+
+
+def primary_names(base_url: str, series: ForecastSeries) -> ForecastSeries:
+    """Ряд альтернативного набора с именами переменных основного набора записи (base_url)."""
+    alternate = ALTERNATE_DATASETS.get(base_url)
+    renames = {alt: var for var, alt in alternate[1].items()} if alternate is not None else {}
+    if not any(var in renames for var in series.values):
+        return series
+    renamed = ForecastSeries(series.station)
+    renamed.times = series.times
+    for var, column in series.values.items():
+        renamed.add_column(renames.get(var, var), column, series.units.get(var), series.texts.get(var))
+    return renamed
+
+
+def blend_series(preferred: ForecastSeries, fallback: ForecastSeries, names=("preferred", "fallback")):
+    """
+    Смесь рядов preferred и fallback на объединённой оси времени: значение предпочтительного ряда,
+    если оно есть (не NaN), иначе значение запасного. Любой из рядов может быть None.
+
+    Возвращает (ряд, {переменная: {имя набора: число точек}}), names – имена наборов рядов.
+    """
+    if preferred is None or fallback is None:
+        series = preferred if preferred is not None else fallback
+        name = names[0] if preferred is not None else names[1]
+        if series is None:
+            return None, {}
+        return series, {var: {name: len(series)} for var in series.values}
+
+    variables = list(preferred.values) + [var for var in fallback.values if var not in preferred.values]
+    first = [preferred.values.get(var) for var in variables]
+    second = [fallback.values.get(var) for var in variables]
+    first_texts = [preferred.texts.get(var) or {} for var in variables]
+    second_texts = [fallback.texts.get(var) or {} for var in variables]
+    columns = [array("d") for _ in variables]
+    texts = [{} for _ in variables]
+    counts = [[0, 0] for _ in variables]
+    times = array("q")
+
+    # Один проход слиянием двух отсортированных осей времени
+    first_times, second_times = preferred.times, fallback.times
+    i = j = 0
+    while i < len(first_times) or j < len(second_times):
+        ts_first = first_times[i] if i < len(first_times) else None
+        ts_second = second_times[j] if j < len(second_times) else None
+        if ts_second is None or (ts_first is not None and ts_first <= ts_second):
+            ts = ts_first
+            at_first = i
+            at_second = j if ts_second == ts else None
+        else:
+            ts = ts_second
+            at_first = None
+            at_second = j
+        times.append(ts)
+        for k, column in enumerate(columns):
+            value = NAN
+            text = None
+            if at_first is not None and first[k] is not None:
+                value = first[k][at_first]
+                text = first_texts[k].get(ts)
+                if value == value:
+                    counts[k][0] += 1
+            if value != value and at_second is not None and second[k] is not None:
+                value = second[k][at_second]
+                if value == value:
+                    text = second_texts[k].get(ts)
+                    counts[k][1] += 1
+                elif text is None:
+                    text = second_texts[k].get(ts)
+            column.append(value)
+            # Исходный текст значения берётся из набора, который его обслужил
+            if text is not None:
+                texts[k][ts] = text
+        if at_first is not None:
+            i += 1
+        if at_second is not None:
+            j += 1
+
+    served_first = any(count[0] for count in counts) or not any(count[1] for count in counts)
+    series = ForecastSeries(preferred.station if served_first else fallback.station)
+    series.times = times
+    provenance = {}
+    for var, column, count, var_texts in zip(variables, columns, counts, texts):
+        units = preferred.units.get(var) if var in preferred.values else fallback.units.get(var)
+        series.add_column(var, column, units, var_texts)
+        provenance[var] = {name: steps for name, steps in zip(names, count) if steps}
+    return series, provenance
@@ -0,0 +1,345 @@
+"""
+capabilities.py
+
+Описание возможностей наборов данных SILAM (NCSS dataset.xml).
+
+Для каждого базового URL один раз загружается описание набора: переменные и их единицы,
+вертикальные уровни, временное покрытие, границы области и время последнего прогона.
+Описание хранится в памяти и на диске (хранилище Home Assistant) со сроком жизни
+CAPABILITIES_TTL и используется для списка аллергенов в формах настройки и проверки служб,
+проверки доступности набора для координат без пробных запросов и планирования запросов
+координатора. Описание, временное покрытие которого короче запрошенного горизонта прогноза,
+обновляется раньше срока: новый прогон модели мог его продлить.
+Если описание недоступно, используются прежние таблицы из const.py.
+"""
+
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+
+import async_timeout
+
+from .const import (
+    CAPABILITIES_RETRY,
+    CAPABILITIES_TTL,
+    DATASET_DESCRIPTION_PATH,
+    DOMAIN,
+    DOWNLOAD_CHUNK_SIZE,
+    STREAM_CHUNK_SIZE,
+    URL_VAR_MAPPING,
+    VAR_OPTIONS,
+)
+from .records import parse_epoch
+from .download import ACCEPT_ENCODING, PARSER_OVERHEAD, PARSER_SIZE, async_read_xml, client_session
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.capabilities"
+# Ключ hass.data для общего кеша (hass.data[DOMAIN] хранит координаторы записей)
+DATA_CAPABILITIES = f"{DOMAIN}_capabilities"
+
+# Переменные концентрации пыльцы: cnc_POLLEN_<ТАКСОН>_m<размер>
+POLLEN_VARIABLE = re.compile(r"^cnc_POLLEN_([A-Z]+)_(m\d+)$")
+# Глобальные атрибуты, в которых NCSS публикует время прогона модели
+RUN_TIME_ATTRIBUTES = ("run_time", "forecast_reference_time", "_CoordinateModelRunDate", "time_coverage_start")
+
+
+def allergen_key(variable: str) -> str:
+    """Ключ аллергена для переменной SILAM: известный ключ из const.py или само имя переменной."""
+    for key, full_var in URL_VAR_MAPPING.items():
+        if full_var == variable:
+            return key
+    return variable
+
+
+def allergen_label(key: str) -> str:
+    """Имя аллергена по ключу или имени переменной (birch_m22, cnc_POLLEN_PLANE_m20 -> plane)."""
+    if key in VAR_OPTIONS:
+        return VAR_OPTIONS[key]
+    match = POLLEN_VARIABLE.match(key)
+    if match:
+        return match.group(1).lower()
+    return key
+
+
+class DatasetCapabilities:
+    """Описание одного набора данных SILAM."""
+
+    __slots__ = ("variables", "levels", "time_start", "time_end", "latest_run", "bbox", "fetched")
+
+    def __init__(self, variables=None, levels=(), time_start=None, time_end=None, latest_run=None,
+                 bbox=None, fetched=0.0):
+        self.variables = variables or {}  # {переменная: единицы измерения}
+        self.levels = tuple(levels)  # вертикальные уровни модели (м)
+        self.time_start = time_start  # секунды эпохи UTC
+        self.time_end = time_end
+        self.latest_run = latest_run
+        self.bbox = bbox  # (west, east, south, north)
+        self.fetched = fetched
+
+    def is_fresh(self, now: float = None) -> bool:
+        return (now if now is not None else time.time()) - self.fetched < CAPABILITIES_TTL
+
+    def covers(self, latitude, longitude) -> bool:
+        """Лежит ли точка внутри области набора (True, если границы неизвестны)."""
+        if self.bbox is None:
+            return True
+        west, east, south, north = self.bbox
+        return south <= float(latitude) <= north and west <= float(longitude) <= east
+
+    def allergens(self) -> dict:
+        """{ключ аллергена: переменная} для всех переменных пыльцы набора."""
+        return {
+            allergen_key(variable): variable
+            for variable in self.variables
+            if POLLEN_VARIABLE.match(variable)
+        }
+
+    def forecast_hours(self, now: float = None):
+        """Сколько часов прогноза доступно от текущего момента (None, если неизвестно)."""
+        if self.time_end is None:
+            return None
+        return max(int((self.time_end - (now if now is not None else time.time())) // 3600), 0)
+
+    def as_dict(self) -> dict:
+        return {
+            "variables": self.variables,
+            "levels": list(self.levels),
+            "time_start": self.time_start,
+            "time_end": self.time_end,
+            "latest_run": self.latest_run,
+            "bbox": list(self.bbox) if self.bbox is not None else None,
+            "fetched": self.fetched,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DatasetCapabilities":
+        bbox = data.get("bbox")
+        return cls(
+            data.get("variables"),
+            data.get("levels", ()),
+            data.get("time_start"),
+            data.get("time_end"),
+            data.get("latest_run"),
+            tuple(bbox) if bbox is not None else None,
+            data.get("fetched", 0.0),
+        )
+
+
+def _epoch_or_none(text):
+    try:
+        return parse_epoch(text.strip()) if text else None
+    except ValueError:
+        return None
+
+
+class DatasetParser:
+    """
+    Потоковый разбор NCSS dataset.xml (элемент gridDataset) с интерфейсом ET.XMLParser (feed/close):
+    close() возвращает DatasetCapabilities. Описание подаётся разборщику частями не больше
+    STREAM_CHUNK_SIZE, разобранные элементы удаляются из дерева, поэтому DOM описания не создаётся.
+    Учитывается первая ось высот (Height, GeoZ), а из прямых потомков корня – первые TimeSpan
+    и LatLonBox и последний глобальный атрибут с каждым именем.
+    """
+
+    # Элементы, дочерние элементы которых нужны при их разборе, и сами эти дочерние элементы
+    # удаляются вместе с ними
+    CONTAINERS = ("grid", "axis", "TimeSpan", "LatLonBox")
+
+    def __init__(self, budget=None, fetched: float = None):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._budget = budget
+        self._fetched = fetched
+        self._path = []  # открытые элементы от корня
+        self._variables = {}
+        self._levels = None
+        self._span = None  # тексты begin и end
+        self._box = None  # тексты west, east, south, north
+        self._attributes = {}
+        if budget is not None:
+            budget.allocate(PARSER_SIZE)
+
+    def feed(self, data) -> None:
+        view = memoryview(data) if isinstance(data, (bytes, bytearray)) else data
+        for start in range(0, len(data), STREAM_CHUNK_SIZE):
+            chunk = view[start:start + STREAM_CHUNK_SIZE]
+            size = len(chunk) * PARSER_OVERHEAD
+            if self._budget is not None:
+                self._budget.allocate(size)
+            try:
+                self._parser.feed(chunk)
+                self._read_events()
+            finally:
+                if self._budget is not None:
+                    self._budget.release(size)
+
+    def _read_events(self) -> None:
+        path = self._path
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                path.append(elem)
+                continue
+            path.pop()
+            self._add_element(elem, len(path) == 1)
+            if path and path[-1].tag not in self.CONTAINERS:
+                path[-1].remove(elem)
+
+    def _add_element(self, elem, top_level: bool) -> None:
+        tag = elem.tag
+        if tag == "grid":
+            name = elem.get("name")
+            if name:
+                units = elem.get("units")
+                for attribute in elem.findall("attribute"):
+                    if attribute.get("name") == "units":
+                        units = attribute.get("value")
+                self._variables[name] = units
+        elif tag == "axis":
+            if self._levels is None and elem.get("axisType") in ("Height", "GeoZ"):
+                values = elem.find("values")
+                self._levels = (
+                    tuple(float(value) for value in values.text.split())
+                    if values is not None and values.text else ()
+                )
+        elif not top_level:
+            return
+        elif tag == "attribute":
+            self._attributes[elem.get("name")] = elem.get("value")
+        elif tag == "TimeSpan" and self._span is None:
+            self._span = (elem.findtext("begin"), elem.findtext("end"))
+        elif tag == "LatLonBox" and self._box is None:
+            self._box = tuple(elem.findtext(side) for side in ("west", "east", "south", "north"))
+
+    def close(self) -> DatasetCapabilities:
+        self._parser.close()
+        self._read_events()
+        self._parser = None
+        if self._budget is not None:
+            self._budget.release(PARSER_SIZE)
+
+        time_start = time_end = None
+        if self._span is not None:
+            time_start, time_end = (_epoch_or_none(text) for text in self._span)
+
+        latest_run = None
+        for name in RUN_TIME_ATTRIBUTES:
+            latest_run = _epoch_or_none(self._attributes.get(name))
+            if latest_run is not None:
+                break
+
+        bbox = None
+        if self._box is not None:
+            try:
+                bbox = tuple(float(side) for side in self._box)
+            except (TypeError, ValueError):
+                bbox = None
+
+        return DatasetCapabilities(
+            self._variables, self._levels or (), time_start, time_end, latest_run, bbox,
+            fetched=time.time() if self._fetched is None else self._fetched,
+        )
+
+
+class CapabilityCache:
+    """Кеш описаний наборов в памяти и на диске с ограниченным сроком жизни."""
+
+    def __init__(self, hass):
+        from homeassistant.helpers.storage import Store
+
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._entries = None  # {base_url: DatasetCapabilities}, загружается из хранилища при первом обращении
+        self._failures = {}  # {base_url: monotonic-время неудачной загрузки}
+
+    async def _async_load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        try:
+            data = await self._store.async_load() or {}
+        except Exception as err:
+            _LOGGER.debug("Не удалось загрузить описания наборов данных: %s", err)
+            return
+        for base_url, item in data.items():
+            self._entries[base_url] = DatasetCapabilities.from_dict(item)
+
+    async def async_get(self, base_url: str, session=None, until: float = None, budget=None):
+        """
+        Возвращает описание набора: свежее из кеша или загруженное заново.
+        При ошибке загрузки возвращается устаревшее описание (если есть) или None.
+
+        :param until: конец запрошенного горизонта прогноза (секунды эпохи). Описание, покрытие
+                      которого заканчивается раньше, загружается заново не чаще раза в CAPABILITIES_RETRY.
+        :param budget: бюджет памяти обновления (режим низкого потребления памяти), в котором
+                       учитываются загрузка и разбор описания.
+        """
+        await self._async_load()
+        cached = self._entries.get(base_url)
+        if cached is not None and cached.is_fresh() and not (
+            until is not None
+            and cached.time_end is not None
+            and cached.time_end < until
+            and time.time() - cached.fetched >= CAPABILITIES_RETRY
+        ):
+            return cached
+        # После неудачной загрузки повторная попытка – не раньше чем через CAPABILITIES_RETRY
+        failed = self._failures.get(base_url)
+        if failed is not None and time.monotonic() - failed < CAPABILITIES_RETRY:
+            return cached
+        try:
+            if session is None:
+                async with client_session() as own_session:
+                    capabilities = await self._async_fetch(own_session, base_url, budget)
+            else:
+                capabilities = await self._async_fetch(session, base_url, budget)
+        except Exception as err:
+            _LOGGER.debug("Описание набора %s недоступно: %s", base_url, err)
+            self._failures[base_url] = time.monotonic()
+            return cached
+        self._failures.pop(base_url, None)
+        self._entries[base_url] = capabilities
+        self._store.async_delay_save(
+            lambda: {url: item.as_dict() for url, item in self._entries.items()}, 10
+        )
+        _LOGGER.debug(
+            "Описание набора %s: %d переменных, %d уровней", base_url, len(capabilities.variables), len(capabilities.levels)
+        )
+        return capabilities
+
+    def allergens(self) -> set:
+        """Ключи аллергенов всех описаний в памяти (пусто, если кеш ещё не загружен)."""
+        allergens = set()
+        for capabilities in (self._entries or {}).values():
+            allergens.update(capabilities.allergens())
+        return allergens
+
+    async def _async_fetch(self, session, base_url, budget=None):
+        async with async_timeout.timeout(10):
+            async with session.get(
+                base_url + DATASET_DESCRIPTION_PATH, headers={"Accept-Encoding": ACCEPT_ENCODING}
+            ) as response:
+                if response.status != 200:
+                    raise ValueError(f"HTTP {response.status}")
+                capabilities, _stats, _body = await async_read_xml(
+                    response, parser=DatasetParser(budget),
+                    chunk_size=STREAM_CHUNK_SIZE if budget is not None else DOWNLOAD_CHUNK_SIZE, budget=budget,
+                )
+        return capabilities
+
+
+async def async_get_capabilities(hass, base_url: str, session=None, until: float = None, budget=None):
+    """Описание набора base_url из общего кеша интеграции (или None), см. CapabilityCache.async_get."""
+    if not base_url or base_url == "unknown":
+        return None
+    cache = hass.data.get(DATA_CAPABILITIES)
+    if cache is None:
+        cache = hass.data[DATA_CAPABILITIES] = CapabilityCache(hass)
+    return await cache.async_get(base_url, session, until, budget)
+
+
+def cached_allergens(hass) -> set:
+    """Ключи аллергенов, найденные в описаниях наборов данных общего кеша (без загрузки)."""
+    cache = hass.data.get(DATA_CAPABILITIES)
+    return cache.allergens() if cache is not None else set()
@@ -0,0 +1,190 @@
+"""
+cassette.py
+
+Запись и воспроизведение ответов SILAM (режим отладки слоя загрузки координатора).
+
+В режиме записи каждый ответ (URL, метка запроса, код, заголовки, время запроса
+и его длительность, распакованное тело в сжатом gzip виде, объём ответа по сети
+и после распаковки) добавляется строкой JSON в текущий
+файл архива cassette-<номер>.jsonl. При превышении CASSETTE_MAX_BYTES начинается
+новый файл, хранятся только CASSETTE_MAX_FILES последних файлов.
+
+В режиме воспроизведения ответы архива подаются в _async_update_data вместо сетевых
+запросов: для каждой метки запроса (index, main, main@<уровень>) – по порядку записи,
+по кругу. Задержка ответа равна записанной, делённой на коэффициент скорости
+(0 – без задержки). Архив можно воспроизводить и вне Home Assistant (ArchiveReader).
+"""
+
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import defaultdict
+
+from .const import CASSETTE_MAX_BYTES, CASSETTE_MAX_FILES, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+CASSETTE_PREFIX = "cassette-"
+CASSETTE_SUFFIX = ".jsonl"
+
+
+def encode_body(text: str) -> str:
+    return base64.b64encode(gzip.compress(text.encode("utf-8"))).decode("ascii")
+
+
+def decode_body(data: str) -> str:
+    return gzip.decompress(base64.b64decode(data)).decode("utf-8")
+
+
+def iter_body(data: str, chunk_size: int):
+    """Распакованное тело записи частями не больше chunk_size байт, без строки со всем телом."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    compressed = base64.b64decode(data)
+    while compressed:
+        piece = decompressor.decompress(compressed, chunk_size)
+        compressed = decompressor.unconsumed_tail
+        if piece:
+            yield piece
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def _archive_files(path: str):
+    """Файлы архива от старого к новому."""
+    if not os.path.isdir(path):
+        return []
+    numbered = []
+    for name in os.listdir(path):
+        if name.startswith(CASSETTE_PREFIX) and name.endswith(CASSETTE_SUFFIX):
+            try:
+                numbered.append((int(name[len(CASSETTE_PREFIX):-len(CASSETTE_SUFFIX)]), name))
+            except ValueError:
+                continue
+    return [os.path.join(path, name) for _, name in sorted(numbered)]
+
+
+class ArchiveWriter:
+    """Ротируемый архив ответов на диске (блокирующие операции – вызывать в executor)."""
+
+    def __init__(self, path: str, max_bytes: int = CASSETTE_MAX_BYTES, max_files: int = CASSETTE_MAX_FILES):
+        self.path = path
+        self._max_bytes = max_bytes
+        self._max_files = max_files
+        self._lock = threading.Lock()
+
+    def _current_file(self) -> str:
+        files = _archive_files(self.path)
+        if files and os.path.getsize(files[-1]) < self._max_bytes:
+            return files[-1]
+        number = int(os.path.basename(files[-1])[len(CASSETTE_PREFIX):-len(CASSETTE_SUFFIX)]) + 1 if files else 1
+        # Новый файл: самые старые удаляются, чтобы осталось не более max_files
+        for old in files[:max(len(files) - self._max_files + 1, 0)]:
+            os.remove(old)
+        return os.path.join(self.path, f"{CASSETTE_PREFIX}{number:06d}{CASSETTE_SUFFIX}")
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._current_file(), "a", encoding="utf-8") as file:
+                file.write(line)
+
+
+class ArchiveReader:
+    """Записи архива, сгруппированные по метке запроса (блокирующее чтение)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = defaultdict(list)  # {метка: [запись, ...]} в порядке записи
+        self._cursors = defaultdict(int)
+        for file_path in _archive_files(path):
+            with open(file_path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Последняя строка может быть оборвана при остановке во время записи
+                        continue
+                    self.records[record["label"]].append(record)
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self.records.values())
+
+    def next(self, label: str, url: str = None):
+        """Следующая запись для метки (по кругу) или None, если таких записей нет."""
+        records = self.records.get(label)
+        if not records:
+            return None
+        position = self._cursors[label]
+        self._cursors[label] = (position + 1) % len(records)
+        record = records[position]
+        if url is not None and record["url"] != url:
+            _LOGGER.debug("Воспроизводится ответ на другой URL для %s: %s", label, record["url"])
+        return record
+
+
+class Cassette:
+    """Режим записи или воспроизведения для одного координатора."""
+
+    def __init__(self, hass, path: str, mode: str, speed: float = 1.0):
+        self._hass = hass
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._writer = ArchiveWriter(path) if mode == "record" else None
+        self._reader = None
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    async def async_load(self) -> None:
+        """Загружает архив для воспроизведения."""
+        if self.replaying:
+            self._reader = await self._hass.async_add_executor_job(ArchiveReader, self.path)
+            _LOGGER.debug("Загружено ответов для воспроизведения: %s (%s)", len(self._reader), self.path)
+
+    def record(self, url, label, status, headers, started, elapsed, text, transfer=None) -> None:
+        """
+        Добавляет ответ в архив (сжатие и запись выполняются в executor).
+        text – распакованное тело; transfer – объём ответа по сети и после распаковки (download.TransferStats.as_dict).
+        """
+        record = {
+            "url": url,
+            "label": label,
+            "status": status,
+            "headers": headers,
+            "time": started,
+            "elapsed": elapsed,
+        }
+        if transfer is not None:
+            record["transfer"] = transfer
+
+        def write():
+            record["body"] = encode_body(text)
+            self._writer.write(record)
+
+        self._hass.async_add_executor_job(write)
+
+    async def async_replay(self, url, label):
+        """
+        Возвращает (код, тело в формате архива) следующего записанного ответа для метки с записанной
+        задержкой. Тело распаковывается decode_body или частями iter_body.
+        """
+        record = self._reader.next(label, url) if self._reader is not None else None
+        if record is None:
+            raise LookupError(f"В архиве {self.path} нет ответов для {label}")
+        if self.speed > 0:
+            await asyncio.sleep(record.get("elapsed", 0) / self.speed)
+        return record["status"], record["body"]
+
+
+def cassette_path(hass, entry_id: str) -> str:
+    """Каталог архива записи в конфигурации Home Assistant."""
+    return hass.config.path(DOMAIN, "cassettes", entry_id)
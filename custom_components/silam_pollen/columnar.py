@@ -0,0 +1,124 @@
+"""
+columnar.py
+
+Компактное колоночное представление прогноза для websocket API SILAM Pollen.
+
+Снимок – ось времени и по одному столбцу на переменную. Значения квантуются
+в целые числа (value × COLUMNAR_SCALE), а ось времени и столбцы кодируются
+разностями соседних элементов: почасовая ось превращается в [t0, 3600, 3600, ...],
+плавно меняющиеся концентрации – в короткие целые. Отсутствующие значения – null;
+разность после null считается от последнего известного значения.
+
+После первого снимка клиенту отправляются только изменения (diff):
+  {"type": "diff", "drop": k, "times": [...], "columns": {var: {"set": [[i, q], ...], "extend": [...]}}}
+  - drop – сколько точек удалить с начала оси (данные сдвинулись во времени);
+  - times – разности новых точек, продолжающие ось от её последней точки;
+  - set – изменившиеся квантованные значения в сохранённой части оси (индексы – после drop);
+  - extend – значения новых точек, закодированные разностями от последнего известного значения.
+Если набор переменных изменился или новая ось не продолжает прежнюю, отправляется полный снимок.
+"""
+
+from .const import COLUMNAR_SCALE
+
+
+def quantize(value):
+    """Квантованное значение (int) или None для NaN."""
+    if value != value:
+        return None
+    return int(round(value * COLUMNAR_SCALE))
+
+
+def delta_encode(values, previous=0):
+    """Кодирует последовательность целых (или None) разностями от последнего известного значения."""
+    encoded = []
+    for value in values:
+        if value is None:
+            encoded.append(None)
+            continue
+        encoded.append(value - previous)
+        previous = value
+    return encoded
+
+
+def last_known(values, default=0):
+    """Последнее значение последовательности, отличное от None."""
+    for value in reversed(values):
+        if value is not None:
+            return value
+    return default
+
+
+class ColumnarSnapshot:
+    """Квантованный снимок ряда: ось времени и столбцы, как их видит клиент."""
+
+    __slots__ = ("times", "columns", "units")
+
+    def __init__(self, times, columns, units):
+        self.times = times
+        self.columns = columns
+        self.units = units
+
+    @classmethod
+    def from_series(cls, series, variables=None):
+        """Строит снимок из ForecastSeries; variables ограничивает набор столбцов."""
+        if series is None:
+            return cls([], {}, {})
+        names = [var for var in series.values if variables is None or var in variables]
+        return cls(
+            list(series.times),
+            {var: [quantize(value) for value in series.values[var]] for var in names},
+            {var: series.units.get(var) for var in names},
+        )
+
+    def full_message(self) -> dict:
+        """Полный снимок с разностным кодированием оси и столбцов."""
+        return {
+            "type": "full",
+            "scale": COLUMNAR_SCALE,
+            "times": delta_encode(self.times),
+            "units": self.units,
+            "columns": {var: delta_encode(column) for var, column in self.columns.items()},
+        }
+
+    def diff_message(self, previous: "ColumnarSnapshot"):
+        """
+        Изменения относительно previous; None, если изменений нет.
+        Возвращает полный снимок, если изменения нельзя выразить разностью.
+        """
+        if list(self.columns) != list(previous.columns) or self.units != previous.units:
+            return self.full_message()
+        old_times, new_times = previous.times, self.times
+        if not old_times or not new_times:
+            return self.full_message() if old_times != new_times else None
+        # Ось должна продолжать прежнюю: новые точки – сдвиг старой оси плюс хвост
+        try:
+            drop = old_times.index(new_times[0])
+        except ValueError:
+            return self.full_message()
+        kept = len(old_times) - drop
+        if new_times[:kept] != old_times[drop:]:
+            return self.full_message()
+        columns = {}
+        for var, column in self.columns.items():
+            old_column = previous.columns[var]
+            changes = {}
+            changed = [
+                [i, column[i]]
+                for i in range(min(kept, len(column)))
+                if column[i] != old_column[drop + i]
+            ]
+            if changed:
+                changes["set"] = changed
+            if len(column) > kept:
+                changes["extend"] = delta_encode(column[kept:], last_known(column[:kept]))
+            if changes:
+                columns[var] = changes
+        tail = new_times[kept:]
+        if not drop and not tail and not columns:
+            return None
+        return {
+            "type": "diff",
+            "drop": drop,
+            "times": delta_encode(tail, new_times[kept - 1]) if tail else [],
+            "columns": columns,
+        }
@@ -8,6 +8,8 @@ import logging
 from homeassistant import config_entries
 from homeassistant.core import callback
 from homeassistant.helpers.selector import (
+    EntitySelector,
+    EntitySelectorConfig,
     LocationSelector,
     LocationSelectorConfig,
     SelectSelector,
@@ -17,9 +19,24 @@ from .const import (
     DOMAIN,
     DEFAULT_UPDATE_INTERVAL,
     DEFAULT_ALTITUDE,
+    DEFAULT_MOVEMENT_THRESHOLD,
+    DEFAULT_FORECAST_WINDOW,
+    DEFAULT_FORECAST_STEP,
+    DEFAULT_THRESHOLD_LOOKAHEAD,
+    DEFAULT_FORECAST_HOURS,
+    DEFAULT_MAX_RESPONSE_MB,
+    MAX_RESPONSE_MB,
+    DEFAULT_MEMORY_BUDGET_MB,
+    MIN_MEMORY_BUDGET_MB,
+    MAX_MEMORY_BUDGET_MB,
+    MAX_FORECAST_HOURS,
     BASE_URL_V5_9_1,
     BASE_URL_V6_0,
+    VAR_OPTIONS,
+    CASSETTE_MODES,
 )
+from .capabilities import async_get_capabilities
+from .data_processing import profile_altitudes
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -48,6 +65,8 @@ class SilamPollenConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         default_altitude = getattr(self.hass.config, "elevation", DEFAULT_ALTITUDE)
         # Create a list of options from the zones dictionary [org ru]
         zone_options = [{"value": zone_id, "label": name} for zone_id, name in zones.items()]
+        # Allergens published by the default dataset; the static list is used if it cannot be described
+        capabilities = await async_get_capabilities(self.hass, BASE_URL_V6_0)
         data_schema = vol.Schema({
             vol.Required("zone_id", default=default_zone): SelectSelector(
                 SelectSelectorConfig(
@@ -59,15 +78,7 @@ class SilamPollenConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             #vol.Required("altitude", default=default_altitude): vol.Coerce(float),
             vol.Optional("var", default=[]): SelectSelector(
                 SelectSelectorConfig(
-                    options=[
-                        "alder_m22",
-                        "birch_m22",
-                        "grass_m32",
-                        "hazel_m23",
-                        "mugwort_m18",
-                        "olive_m28",
-                        "ragweed_m18"
-                    ],
+                    options=_allergen_options(capabilities),
                     multiple=True,
                     mode="dropdown",
                     translation_key="config_pollen"
@@ -174,11 +185,20 @@ class SilamPollenConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         Helper method to check API availability using the entered coordinates. [org ru]
         First tries a request to BASE_URL_V5_9_1, if the status is not 200 – it queries BASE_URL_V6_0. [org ru]
         If one of the base URLs returns status 200, the method returns True, None, and the chosen URL. [org ru]
+        A dataset whose cached description has a bounding box is checked against it instead of being queried.
         """
         urls = [BASE_URL_V5_9_1, BASE_URL_V6_0]
         last_response = ""
         chosen_url = None
         for url in urls:
+            # The cached dataset description answers coverage without a trial request
+            capabilities = await async_get_capabilities(self.hass, url)
+            if capabilities is not None and capabilities.bbox is not None:
+                if capabilities.covers(latitude, longitude):
+                    return True, None, url
+                last_response = f"{url}: coordinates outside the dataset area"
+                _LOGGER.debug("Coordinates %s, %s are outside the dataset %s", latitude, longitude, url)
+                continue
             test_url = url + f"?var=POLI&latitude={latitude}&longitude={longitude}&time=present&accept=xml"
             try:
                 async with aiohttp.ClientSession() as session:
@@ -203,6 +223,34 @@ class SilamPollenConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         # Return OptionsFlowHandler without passing config_entry [org ru]
         return OptionsFlowHandler()
 
+def _allergen_options(capabilities, selected=()):
+    """
+    Allergen keys offered in the forms: those published by the dataset, or the static list
+    when its description is unavailable. Already selected allergens are always kept.
+    """
+    if capabilities is None or not capabilities.variables:
+        available = list(VAR_OPTIONS)
+    else:
+        published = capabilities.allergens()
+        # Known allergens keep their usual order, newly published ones follow alphabetically
+        available = [key for key in VAR_OPTIONS if key in published]
+        available += sorted(key for key in published if key not in VAR_OPTIONS)
+    available += [key for key in selected if key not in available]
+    return available
+
+
+def _parse_altitudes(value, main_altitude):
+    """
+    Parses a comma-separated list of altitudes (m) into floats; raises ValueError on bad input.
+    Duplicates and the main altitude are dropped, as the coordinator does.
+    """
+    if isinstance(value, (list, tuple)):
+        altitudes = [float(item) for item in value]
+    else:
+        altitudes = [float(item) for item in str(value).replace(";", ",").split(",") if item.strip()]
+    return profile_altitudes(main_altitude, altitudes)
+
+
 class OptionsFlowHandler(config_entries.OptionsFlow):
     """Options Flow handler for the SILAM Pollen integration."""
 
@@ -217,6 +265,21 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             # Update options
             new_options = dict(self.config_entry.options)
             new_options.update(user_input)
+            # An emptied entity selector is omitted from user_input, so clear the tracked entity explicitly
+            new_options["tracked_entity"] = user_input.get("tracked_entity")
+            # Additional profile altitudes are entered as a comma-separated list
+            try:
+                new_options["altitudes"] = _parse_altitudes(
+                    user_input.get("altitudes", ""),
+                    self.config_entry.data.get("altitude", self.hass.config.elevation),
+                )
+            except ValueError:
+                return self.async_show_form(
+                    step_id="init",
+                    data_schema=await self._async_options_schema(),
+                    errors={"altitudes": "invalid_altitudes"},
+                )
+            user_input["altitudes"] = new_options["altitudes"]
             
             # Update data: base_url is stored in data and used by the coordinator
             new_data = dict(self.config_entry.data)
@@ -229,12 +292,15 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             else:
                 new_data["base_url"] = "unknown"
             
+            # The update listener applies the change: in place when possible, otherwise by reloading the entry
             self.hass.config_entries.async_update_entry(self.config_entry, data=new_data, options=new_options)
-            await self.hass.config_entries.async_reload(self.config_entry.entry_id)
             return self.async_create_entry(title="", data=user_input)
 
-        # If user_input is None – show the form with the pre-set version value.
-        # Determine the value automatically by base_url from the entry.
+        return self.async_show_form(step_id="init", data_schema=await self._async_options_schema())
+
+    async def _async_options_schema(self):
+        """Builds the options form schema with the current values as defaults."""
+        # Determine the pre-set version value automatically by base_url from the entry.
         base_url = self.config_entry.data.get("base_url", "")
         if "silam_europe_pollen" in base_url:
             default_version = "v6_0"
@@ -248,11 +314,15 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         lon = self.config_entry.data.get("longitude")
         device_name = self.config_entry.title  # Device name
         v5_9_1_available = False
-        if lat is not None and lon is not None:
+        regional = await async_get_capabilities(self.hass, BASE_URL_V5_9_1)
+        if lat is not None and lon is not None and regional is not None and regional.bbox is not None:
+            # The cached dataset description covers the check without a trial request
+            v5_9_1_available = regional.covers(lat, lon)
+        elif lat is not None and lon is not None:
+            test_url = BASE_URL_V5_9_1 + f"?var=POLI&latitude={lat}&longitude={lon}&time=present&accept=xml"
             try:
                 async with aiohttp.ClientSession() as session:
                     async with async_timeout.timeout(10):
-                        test_url = BASE_URL_V5_9_1 + f"?var=POLI&latitude={lat}&longitude={lon}&time=present&accept=xml"
                         async with session.get(test_url) as response:
                             if response.status == 200:
                                 v5_9_1_available = True
@@ -266,6 +336,10 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     device_name, test_url, err
                 )
 
+        # Allergens published by the entry's dataset (static list if it cannot be described)
+        selected_allergens = self.config_entry.options.get("var", self.config_entry.data.get("var", []))
+        capabilities = await async_get_capabilities(self.hass, base_url)
+
         # If the v5_9_1 test failed, the only option will be v6_0.
         if v5_9_1_available:
             version_options = [
@@ -284,15 +358,7 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 default=self.config_entry.options.get("var", self.config_entry.data.get("var", []))
             ): SelectSelector(
                 SelectSelectorConfig(
-                    options=[
-                        "alder_m22",
-                        "birch_m22",
-                        "grass_m32",
-                        "hazel_m23",
-                        "mugwort_m18",
-                        "olive_m28",
-                        "ragweed_m18"
-                    ],
+                    options=_allergen_options(capabilities, selected_allergens),
                     multiple=True,
                     mode="dropdown",
                     translation_key="config_pollen"
@@ -302,6 +368,13 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 "update_interval",
                 default=self.config_entry.options.get("update_interval", self.config_entry.data.get("update_interval", DEFAULT_UPDATE_INTERVAL))
             ): vol.All(vol.Coerce(int), vol.Range(min=30)),
+            vol.Optional(
+                "allergen_update_interval",
+                default=self.config_entry.options.get(
+                    "allergen_update_interval",
+                    self.config_entry.options.get("update_interval", self.config_entry.data.get("update_interval", DEFAULT_UPDATE_INTERVAL))
+                )
+            ): vol.All(vol.Coerce(int), vol.Range(min=30)),
             vol.Optional(
                 "version",
                 default=self.config_entry.options.get("version", self.config_entry.data.get("version", default_version))
@@ -316,5 +389,89 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 "forecast",
                 default=self.config_entry.options.get("forecast", self.config_entry.data.get("forecast", False))
             ): bool,
+            vol.Optional(
+                "forecast_hours",
+                default=self.config_entry.options.get("forecast_hours", DEFAULT_FORECAST_HOURS)
+            ): vol.All(vol.Coerce(int), vol.Range(min=12, max=MAX_FORECAST_HOURS)),
+            vol.Optional(
+                "forecast_window",
+                default=self.config_entry.options.get("forecast_window", DEFAULT_FORECAST_WINDOW)
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=24)),
+            vol.Optional(
+                "forecast_step",
+                default=self.config_entry.options.get("forecast_step", DEFAULT_FORECAST_STEP)
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=24)),
+            vol.Optional(
+                "forecast_statistics",
+                default=self.config_entry.options.get("forecast_statistics", self.config_entry.data.get("forecast_statistics", False))
+            ): bool,
+            vol.Optional(
+                "hedge_requests",
+                default=self.config_entry.options.get("hedge_requests", False)
+            ): bool,
+            vol.Optional(
+                "blend_sources",
+                default=self.config_entry.options.get("blend_sources", False)
+            ): bool,
+            vol.Optional(
+                "low_memory",
+                default=self.config_entry.options.get("low_memory", False)
+            ): bool,
+            vol.Optional(
+                "memory_budget",
+                default=self.config_entry.options.get("memory_budget", DEFAULT_MEMORY_BUDGET_MB)
+            ): vol.All(vol.Coerce(float), vol.Range(min=MIN_MEMORY_BUDGET_MB, max=MAX_MEMORY_BUDGET_MB)),
+            vol.Optional(
+                "max_response_size",
+                default=self.config_entry.options.get("max_response_size", DEFAULT_MAX_RESPONSE_MB)
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_RESPONSE_MB)),
+            vol.Optional(
+                "cassette",
+                default=self.config_entry.options.get("cassette", "off")
+            ): SelectSelector(
+                SelectSelectorConfig(
+                    options=list(CASSETTE_MODES),
+                    multiple=False,
+                    mode="dropdown",
+                    translation_key="cassette"
+                )
+            ),
+            vol.Optional(
+                "cassette_speed",
+                default=self.config_entry.options.get("cassette_speed", 1.0)
+            ): vol.All(vol.Coerce(float), vol.Range(min=0, max=1000)),
+            vol.Optional(
+                "tracked_entity",
+                description={"suggested_value": self.config_entry.options.get("tracked_entity")}
+            ): EntitySelector(
+                EntitySelectorConfig(domain=["person", "device_tracker"])
+            ),
+            vol.Optional(
+                "movement_threshold",
+                default=self.config_entry.options.get("movement_threshold", DEFAULT_MOVEMENT_THRESHOLD)
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(
+                "altitudes",
+                default=", ".join(f"{altitude:g}" for altitude in self.config_entry.options.get("altitudes", []))
+            ): str,
+            vol.Optional(
+                "threshold_index",
+                default=self.config_entry.options.get("threshold_index", 0)
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=5)),
+        })
+        # Thresholds for the allergens that are currently selected (0 disables the binary sensor).
+        selected_allergens = self.config_entry.options.get("var", self.config_entry.data.get("var", []))
+        data_schema = data_schema.extend({
+            vol.Optional(
+                f"threshold_{allergen}",
+                default=self.config_entry.options.get(f"threshold_{allergen}", 0)
+            ): vol.All(vol.Coerce(float), vol.Range(min=0))
+            for allergen in selected_allergens
+        })
+        data_schema = data_schema.extend({
+            vol.Optional(
+                "threshold_lookahead",
+                default=self.config_entry.options.get("threshold_lookahead", DEFAULT_THRESHOLD_LOOKAHEAD)
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=72)),
         })
-        return self.async_show_form(step_id="init", data_schema=data_schema)
+        return data_schema
@@ -4,9 +4,37 @@ DEFAULT_UPDATE_INTERVAL = 60  # Default update interval in minutes [org ru]
 DEFAULT_ALTITUDE = 0  # Default altitude in meters [org ru]
 
 # Base URLs for SILAM API requests
-BASE_URL_V6_0 = "https://example.com/api/v6_0" [org ru]
+BASE_URL_V6_0 = "https://example.com/api/v6_0"  # [org ru]
 
-BASE_URL_V5_9_1 = "https://example.com/api/v5_9_1" [org ru]
+BASE_URL_V5_9_1 = "https://example.com/api/v5_9_1"  # [org ru]
+
+# Dataset description (NCSS dataset.xml): variables, levels, time coverage and area of a base URL.
+# Cached in memory and on disk for CAPABILITIES_TTL seconds; failed fetches are retried after CAPABILITIES_RETRY.
+DATASET_DESCRIPTION_PATH = "/dataset.xml"
+CAPABILITIES_TTL = 12 * 3600
+CAPABILITIES_RETRY = 3600
+
+# Response downloads: compressed transfer is negotiated and decoded while the body streams in.
+# Compressed and decompressed response sizes are limited to the maximum payload size (MB, option).
+DEFAULT_MAX_RESPONSE_MB = 8
+MAX_RESPONSE_MB = 64
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Low-memory mode: responses are read, decompressed and parsed in STREAM_CHUNK_SIZE pieces straight
+# into the series buffers; the download, parsing, merging and forecast memory of one refresh must fit
+# the memory budget (MB, option, fractions allowed)
+STREAM_CHUNK_SIZE = 4 * 1024
+DEFAULT_MEMORY_BUDGET_MB = 0.5
+MIN_MEMORY_BUDGET_MB = 0.25
+MAX_MEMORY_BUDGET_MB = 32
+
+# Profiling service: refresh cycles one session may cover
+PROFILE_MAX_CYCLES = 10
+
+# manual_update response projection: sections, variables besides the allergens, value formats
+RESPONSE_SECTIONS = ("now", "hourly_forecast", "twice_daily_forecast", "daily_forecast")
+RESPONSE_VARIABLES = ("index", "temperature")
+RESPONSE_FORMATS = ("raw", "numeric")
 
 # Mapping of pollen types: key – internal name, value – default (English) name
 VAR_OPTIONS = {
@@ -29,6 +57,84 @@ URL_VAR_MAPPING = {
     "ragweed_m18": "cnc_POLLEN_RAGWEED_m18"
 }
 
+# Hedged requests: alternate dataset of each base URL and the per-variable name mapping between
+# the versions: {variable of the base URL: variable of the alternate}. Both versions publish the
+# index, its source, temperature and the allergen concentrations under the same names. Variables
+# without an entry (allergens discovered in a dataset description) are hedged only if the alternate
+# dataset description lists them; queries for variables missing from it are not hedged.
+ALTERNATE_VARIABLES = {
+    "POLI": "POLI",
+    "POLISRC": "POLISRC",
+    "temp_2m": "temp_2m",
+    "cnc_POLLEN_ALDER_m22": "cnc_POLLEN_ALDER_m22",
+    "cnc_POLLEN_BIRCH_m22": "cnc_POLLEN_BIRCH_m22",
+    "cnc_POLLEN_GRASS_m32": "cnc_POLLEN_GRASS_m32",
+    "cnc_POLLEN_HAZEL_m23": "cnc_POLLEN_HAZEL_m23",
+    "cnc_POLLEN_MUGWORT_m18": "cnc_POLLEN_MUGWORT_m18",
+    "cnc_POLLEN_OLIVE_m28": "cnc_POLLEN_OLIVE_m28",
+    "cnc_POLLEN_RAGWEED_m18": "cnc_POLLEN_RAGWEED_m18",
+}
+ALTERNATE_DATASETS = {
+    BASE_URL_V6_0: (BASE_URL_V5_9_1, ALTERNATE_VARIABLES),
+    BASE_URL_V5_9_1: (BASE_URL_V6_0, {alt: var for var, alt in ALTERNATE_VARIABLES.items()}),
+}
+# The alternate request is sent when the primary has not answered within the p95 of its last
+# HEDGE_LATENCY_SAMPLES response times (HEDGE_DEFAULT_DELAY seconds until HEDGE_MIN_SAMPLES are known)
+HEDGE_LATENCY_SAMPLES = 20
+HEDGE_MIN_SAMPLES = 5
+HEDGE_DEFAULT_DELAY = 3.0
+HEDGE_MIN_DELAY = 0.5
+
+# Record/replay debug mode: rotating archive of raw responses under <config>/silam_pollen/cassettes/<entry_id>;
+# a new file is started at CASSETTE_MAX_BYTES and only the newest CASSETTE_MAX_FILES files are kept
+CASSETTE_MAX_BYTES = 5 * 1024 * 1024
+CASSETTE_MAX_FILES = 5
+CASSETTE_MODES = ("off", "record", "replay")
+
+# Location-following mode (tracked entity with latitude/longitude attributes)
+DEFAULT_MOVEMENT_THRESHOLD = 5.0  # Distance in km that triggers a refetch within one grid cell
+MOVEMENT_DEBOUNCE_SECONDS = 60  # Cooldown between position changes and the refetch
+LOCATION_CACHE_SIZE = 8  # Number of recently visited grid cells kept in memory
+# Approximate grid step (degrees) of the SILAM datasets, keyed by version from the base URL
+GRID_RESOLUTION = {
+    "6_0": 0.1,
+    "5_9_1": 0.025,
+}
+DEFAULT_GRID_RESOLUTION = 0.1
+
+# Approximate mid-heights (m) of the lowest SILAM model levels used for vertical profiles.
+# Requested altitudes are interpolated locally between the bracketing levels.
+MODEL_LEVELS = (12.5, 50.0, 125.0, 275.0, 575.0, 1150.0, 2250.0)
+
+# Upstream feeds with separate refresh schedules: the index (POLI, POLISRC, temp_2m)
+# and the selected allergens (including vertical profile levels)
+FEED_INDEX = "index"
+FEED_MAIN = "main"
+FEEDS = (FEED_INDEX, FEED_MAIN)
+# A feed whose refresh fails keeps serving its cached response for this many of its intervals
+FEED_STALENESS_INTERVALS = 3
+
+# Hourly forecast aggregation: sliding window size and step (hours) and forecast depth
+DEFAULT_FORECAST_WINDOW = 3
+DEFAULT_FORECAST_STEP = 3
+HOURLY_FORECAST_HOURS = 24
+# Forecast horizon (hours) requested from SILAM for the twice-daily and daily forecasts;
+# the datasets publish about five days ahead
+DEFAULT_FORECAST_HOURS = 36
+MAX_FORECAST_HOURS = 120
+
+# Threshold binary sensors: how far ahead (hours) an exceedance switches the sensor on
+DEFAULT_THRESHOLD_LOOKAHEAD = 12
+
+# Ring buffer of past model runs: number of runs, hours kept per run and the near-term
+# outlook (hours) used for revision and trend metrics
+RUN_HISTORY_SIZE = 8
+RUN_HISTORY_HOURS = 120
+RUN_OUTLOOK_HOURS = 24
+
+# Websocket columnar forecast: values are sent as integers value × COLUMNAR_SCALE
+COLUMNAR_SCALE = 100
+
 INDEX_MAPPING = {
     1: "very_low",
     2: "low",
@@ -5,21 +5,78 @@ coordinator.py
 Использует DataUpdateCoordinator для обновления данных для всех сенсоров интеграции.
 """
 
+import asyncio
 import logging
+import os
 import re
-import aiohttp
+import time
 import async_timeout
 import xml.etree.ElementTree as ET
+from collections import OrderedDict
 from datetime import timedelta
+from homeassistant.core import callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from .const import URL_VAR_MAPPING, BASE_URL_V6_0  # Импортируем маппинг для преобразования переменных
+from homeassistant.util import dt as dt_util
+from homeassistant.util.location import distance as location_distance
+from .const import (  # Импортируем маппинг для преобразования переменных
+    DOMAIN,
+    URL_VAR_MAPPING,
+    BASE_URL_V6_0,
+    DEFAULT_MOVEMENT_THRESHOLD,
+    MOVEMENT_DEBOUNCE_SECONDS,
+    LOCATION_CACHE_SIZE,
+    GRID_RESOLUTION,
+    DEFAULT_GRID_RESOLUTION,
+    MODEL_LEVELS,
+    DEFAULT_FORECAST_WINDOW,
+    DEFAULT_FORECAST_STEP,
+    DEFAULT_THRESHOLD_LOOKAHEAD,
+    DEFAULT_FORECAST_HOURS,
+    MAX_FORECAST_HOURS,
+    ALTERNATE_DATASETS,
+    FEED_INDEX,
+    FEED_MAIN,
+    FEEDS,
+    DEFAULT_MAX_RESPONSE_MB,
+    DEFAULT_MEMORY_BUDGET_MB,
+    DOWNLOAD_CHUNK_SIZE,
+    STREAM_CHUNK_SIZE,
+)
+from .data_processing import (
+    add_columns,
+    as_series,
+    build_forecasts,
+    combine_series,
+    main_series,
+    plan_levels,
+    profile_altitudes,
+    profile_key,
+)
+from .records import MergedData
+from .recorder_statistics import StatisticsPublisher
+from .thresholds import compute_crossings, threshold_column
+from .exposure import build_exposure, exposure_summary
+from .run_history import STORAGE_VERSION, RunHistory
+from .capabilities import async_get_capabilities
+from .hedging import LatencyTracker, alternate_url, async_hedged, source_name
+from .feeds import Feed
+from .download import ACCEPT_ENCODING, client_session, async_read_xml
 
 _LOGGER = logging.getLogger(__name__)
 
 class SilamCoordinator(DataUpdateCoordinator):
     """Координатор для интеграции SILAM Pollen."""
 
-    def __init__(self, hass, base_device_name, var_list, manual_coordinates, manual_latitude, manual_longitude, desired_altitude, update_interval, base_url, forecast=False):
+    def __init__(self, hass, base_device_name, var_list, manual_coordinates, manual_latitude, manual_longitude, desired_altitude, update_interval, base_url, forecast=False, entry_id=None, forecast_statistics=False,
+                 tracked_entity=None, movement_threshold=DEFAULT_MOVEMENT_THRESHOLD, extra_altitudes=None,
+                 forecast_window=DEFAULT_FORECAST_WINDOW, forecast_step=DEFAULT_FORECAST_STEP,
+                 thresholds=None, threshold_lookahead=DEFAULT_THRESHOLD_LOOKAHEAD,
+                 forecast_hours=DEFAULT_FORECAST_HOURS, hedging=False, allergen_update_interval=None,
+                 max_response_size=DEFAULT_MAX_RESPONSE_MB, blending=False, low_memory=False,
+                 memory_budget=DEFAULT_MEMORY_BUDGET_MB):
         """
         Инициализирует координатор.
 
@@ -30,9 +87,27 @@ class SilamCoordinator(DataUpdateCoordinator):
         :param manual_latitude: ручная широта.
         :param manual_longitude: ручная долгота.
         :param desired_altitude: высота над уровнем моря, заданная пользователем.
-        :param update_interval: интервал обновления (в минутах).
+        :param update_interval: интервал обновления фида index (в минутах).
         :param base_url: базовый URL для запросов.
         :param forecast: включает режим прогноза (определяет длительность запроса).
+        :param entry_id: идентификатор config entry (используется для долгосрочных статистик).
+        :param forecast_statistics: публиковать ли прогнозный ряд во внешние статистики.
+        :param tracked_entity: сущность с атрибутами latitude/longitude (person.*, device_tracker.*),
+                               за которой следует координатор; None – фиксированные координаты.
+        :param movement_threshold: расстояние (км), при превышении которого данные загружаются заново.
+        :param extra_altitudes: дополнительные высоты вертикального профиля (м); значения на них
+                                интерполируются между уровнями модели.
+        :param forecast_window: размер окна агрегации почасового прогноза (часы).
+        :param forecast_step: шаг окон почасового прогноза (часы).
+        :param thresholds: пороги превышения {"index" или аллерген: значение} для бинарных сенсоров.
+        :param threshold_lookahead: горизонт (часы), в котором бинарный сенсор ожидает превышение.
+        :param forecast_hours: глубина запрашиваемого прогноза (часы), до MAX_FORECAST_HOURS.
+        :param hedging: дублировать медленные или неудачные запросы в альтернативный набор данных (hedging.py).
+        :param allergen_update_interval: интервал обновления фида main (в минутах); None – как у index.
+        :param max_response_size: наибольший размер ответа API (МБ) до и после распаковки.
+        :param blending: загружать фиды из основного и альтернативного наборов параллельно и смешивать ряды (blending.py).
+        :param low_memory: режим низкого потребления памяти – потоковый разбор ответов в буферы рядов (streaming.py).
+        :param memory_budget: бюджет памяти одного обновления (МБ, допускаются доли) в режиме низкого потребления памяти.
         """
         self._base_device_name = base_device_name
         self._var_list = var_list
@@ -40,8 +115,16 @@ class SilamCoordinator(DataUpdateCoordinator):
         self._manual_latitude = manual_latitude
         self._manual_longitude = manual_longitude
         self._desired_altitude = desired_altitude
+        # Высоты профиля: основная высота и дополнительные (без повторов)
+        self.altitudes = [float(desired_altitude), *profile_altitudes(desired_altitude, extra_altitudes)]
         self._base_url = base_url
+        self._entry_id = entry_id
         self._forecast_enabled = forecast
+        self._forecast_window = forecast_window
+        self._forecast_step = forecast_step
+        self._forecast_hours = min(int(forecast_hours), MAX_FORECAST_HOURS)
+        self.thresholds = dict(thresholds or {})
+        self.threshold_lookahead = threshold_lookahead
         # Извлекаем версию SILAM из BASE_URL
         match = re.search(r"pollen_v(\d+_\d+)", self._base_url)
         if match:
@@ -49,14 +132,83 @@ class SilamCoordinator(DataUpdateCoordinator):
         else:
             self.silam_version = "unknown"
 
+        # Описание набора данных (capabilities.py): переменные, уровни, покрытие; None – неизвестно
+        self.capabilities = None
+        # Хеджирование запросов: задержки ответов по базовым URL и набор, ответивший на каждый запрос
+        self.hedging = hedging
+        self._latency = {}
+        self._alternate = None  # описание альтернативного набора, если он покрывает точку
+        self.sources = {}  # {метка запроса: имя набора}
+        # Смешивание наборов: число точек ряда, обслуженных каждым набором, по фидам и переменным
+        self.blending = blending
+        self._provenance = {}  # {фид: {переменная: {имя набора: число точек}}}
+        # Режим отладки: запись ответов в архив или их воспроизведение (cassette.py); None – выключен
+        self.cassette = None
+        # Загрузка ответов (download.py): предел размера и объём последнего ответа по меткам запросов
+        self.max_response_bytes = int(max_response_size * 1024 * 1024)
+        self.transfers = {}  # {метка запроса: TransferStats}
+        # Режим низкого потребления памяти: бюджет обновления (байты), учёт текущего обновления
+        # (streaming.MemoryBudget) и наибольший учтённый объём буферов последнего обновления
+        self.low_memory = low_memory
+        self.memory_budget_bytes = int(memory_budget * 1024 * 1024)
+        self._memory = None
+        self.memory_peak = None
+        # Сессия профилирования циклов обновления (profiling.py, служба profile); None – выключено
+        self.profiler = None
+        # Ответы пакетной загрузки (prefetch.py) для первого обновления: {URL: (время записи, тело)}
+        self._prefetch_pending = True
+        self._prefetched = None
+        self._prefetch_ages = {}  # {фид: возраст (с) использованного ответа}
+
+        # Фиды index и main: кешированные ряды и собственные интервалы обновления (feeds.py).
+        # Координатор срабатывает с наименьшим интервалом и загружает только фиды, интервал которых истёк.
+        self._feeds = {
+            FEED_INDEX: Feed(FEED_INDEX, timedelta(minutes=update_interval)),
+            FEED_MAIN: Feed(FEED_MAIN, timedelta(minutes=allergen_update_interval or update_interval)),
+        }
+        # Фиды, данные которых изменились при последнем обновлении (для подписок сущностей)
+        self.changed_feeds = set(FEEDS)
+        # Следующее обновление загружает все фиды (ручное обновление, смена опций или местоположения)
+        self._refresh_all = False
+
         # Инициализируем merged_data (будет заполняться после обновления)
-        self.merged_data = {}
+        self.merged_data = MergedData()
+        # Координаты последнего успешного запроса
+        self._last_location = None
+        # Колбэк платформы sensor для добавления сенсоров новых аллергенов (устанавливается в sensor.py)
+        self.async_add_allergen_sensors = None
+
+        # Режим следования за сущностью: порог перемещения, подписка и LRU-кеш ячеек сетки
+        # {ячейка: (monotonic-время загрузки, MergedData)}
+        self._tracked_entity = tracked_entity
+        self._movement_threshold = movement_threshold
+        self._unsub_tracking = None
+        self._cell_cache = OrderedDict()
+        self._movement_debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=MOVEMENT_DEBOUNCE_SECONDS,
+            immediate=False,
+            function=self._async_handle_movement,
+        )
+
+        # Публикация наблюдаемых (и прогнозных) значений во внешние долгосрочные статистики
+        self._statistics = None
+        if entry_id is not None:
+            self._statistics = StatisticsPublisher(hass, entry_id, base_device_name, forecast_statistics)
+
+        # Кольцевой буфер последних прогонов модели (пересмотр и тренд прогноза),
+        # сохраняется в хранилище Home Assistant между перезапусками
+        self.run_history = RunHistory()
+        self._history_store = None
+        if entry_id is not None:
+            self._history_store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.runs")
 
         super().__init__(
             hass,
             _LOGGER,
             name=f"SILAM Pollen Coordinator ({base_device_name})",
-            update_interval=timedelta(minutes=update_interval),
+            update_interval=self._tick_interval(),
             always_update=True,
         )
 
@@ -66,8 +218,87 @@ class SilamCoordinator(DataUpdateCoordinator):
         Логирует контекст вызова (например, идентификатор сущности, которая запросила обновление).
         """
         _LOGGER.debug("Запрошено обновление данных. Контекст: %s", context)
+        self._refresh_all = True
         return await super().async_request_refresh()
 
+    async def async_full_refresh(self):
+        """Немедленное обновление всех фидов (без задержки повторных запросов async_request_refresh)."""
+        self._refresh_all = True
+        await self.async_refresh()
+
+    @property
+    def time_zone(self):
+        """Часовой пояс Home Assistant (локальные половины суток и сутки прогноза); None – часовой пояс процесса."""
+        return dt_util.get_time_zone(self.hass.config.time_zone)
+
+    def _tick_interval(self):
+        """Интервал срабатывания координатора: наименьший интервал используемых фидов."""
+        feeds = [self._feeds[FEED_INDEX]]
+        if self._var_list:
+            feeds.append(self._feeds[FEED_MAIN])
+        return min(feed.interval for feed in feeds)
+
+    @callback
+    def async_add_feed_listener(self, feed, update_callback):
+        """
+        Подписка на обновления одного фида: update_callback вызывается, только если данные
+        фида изменились (загружен новый ответ или сдвинулась запись "now", пересчитаны прогнозы).
+        Возвращает функцию отмены подписки.
+        """
+        @callback
+        def feed_listener():
+            if feed in self.changed_feeds:
+                update_callback()
+
+        return self.async_add_listener(feed_listener)
+
+    @callback
+    def async_update_listeners(self):
+        """
+        Уведомляет слушателей, после чего набор изменившихся фидов снова включает все фиды:
+        уведомления вне цикла загрузки (пороги, опции, кеш ячеек) затрагивают все фиды.
+        """
+        super().async_update_listeners()
+        self.changed_feeds = set(FEEDS)
+        if self.profiler is not None:
+            self.profiler.cycle_notified(self._entry_id)
+
+    def _time_duration(self):
+        """
+        Длительность запрашиваемого ряда в формате ISO 8601.
+        Не превышает доступный в наборе данных прогноз, если он известен из описания набора.
+        """
+        if not self._forecast_enabled:
+            return "PT0H"
+        hours = self._forecast_hours
+        available = self.capabilities.forecast_hours() if self.capabilities is not None else None
+        if available:
+            hours = min(hours, available)
+        return f"PT{hours}H"
+
+    def _requested_allergens(self, allergens=None):
+        """
+        Аллергены (по умолчанию – выбранные), которые есть в наборе данных
+        (все, если описание набора неизвестно).
+        """
+        if allergens is None:
+            allergens = self._var_list
+        if self.capabilities is None or not self.capabilities.variables:
+            return allergens
+        requested = []
+        for allergen in allergens:
+            if URL_VAR_MAPPING.get(allergen, allergen) in self.capabilities.variables:
+                requested.append(allergen)
+            else:
+                _LOGGER.debug("Аллерген %s отсутствует в наборе данных %s и не запрашивается", allergen, self._base_url)
+        return requested
+
+    def _model_levels(self):
+        """Уровни модели для вертикального профиля: из описания набора или MODEL_LEVELS."""
+        if self.capabilities is not None and self.capabilities.levels:
+            return self.capabilities.levels
+        return MODEL_LEVELS
+
     def _build_index_url(self, latitude, longitude):
         """
         Формирует URL для запроса данных для сенсора index.
@@ -77,10 +308,10 @@ class SilamCoordinator(DataUpdateCoordinator):
           var=temp_2m
           latitude, longitude
           time_start=present
-          time_duration=<значение из параметра self._forecast_enabled>
+          time_duration=<PT{forecast_hours}H при включённом прогнозе, иначе PT0H>
           accept=xml
         """
-        time_duration = "PT36H" if self._forecast_enabled else "PT0H"
+        time_duration = self._time_duration()
         query_params = [
             "var=POLI",
             "var=POLISRC",
@@ -94,98 +325,725 @@ class SilamCoordinator(DataUpdateCoordinator):
         url = self._base_url + "?" + "&".join(query_params)
         return url
 
-    def _build_main_url(self, latitude, longitude):
+    def _build_main_url(self, latitude, longitude, var_list=None, vert_coord=None):
         """
         Формирует URL для запроса данных для сенсоров main.
-        Для каждого выбранного аллергена добавляется параметр var с преобразованием через URL_VAR_MAPPING.
+        Для каждого выбранного аллергена (или каждого из var_list, если он передан)
+        добавляется параметр var с преобразованием через URL_VAR_MAPPING.
         Плюс общие параметры:
           latitude, longitude
           time_start=present
-          time_duration=<значение из параметра self._forecast_enabled>
-          vertCoord=<desired_altitude>
+          time_duration=<PT{forecast_hours}H при включённом прогнозе, иначе PT0H>
+          vertCoord=<vert_coord или desired_altitude>
           accept=xml
         """
         # Определяем длительность прогноза
-        time_duration = "PT36H" if self._forecast_enabled else "PT0H"
+        time_duration = self._time_duration()
     
         query_params = []
-        if self._var_list:
-            for allergen in self._var_list:
+        if var_list is None:
+            var_list = self._var_list
+        if var_list:
+            for allergen in var_list:
                 full_allergen = URL_VAR_MAPPING.get(allergen, allergen)
                 query_params.append(f"var={full_allergen}")
         query_params.append(f"latitude={latitude}")
         query_params.append(f"longitude={longitude}")
         query_params.append("time_start=present")
         query_params.append(f"time_duration={time_duration}")  # Добавляем параметр времени прогноза
-        query_params.append(f"vertCoord={self._desired_altitude}")
+        query_params.append(f"vertCoord={self._desired_altitude if vert_coord is None else vert_coord}")
         query_params.append("accept=xml")
         
         url = self._base_url + "?" + "&".join(query_params)
         return url
 
-    async def _async_update_data(self):
+    def _resolve_location(self):
         """
-        Асинхронно обновляет данные через два HTTP-запроса:
-          - Для сенсора index с использованием _build_index_url.
-          - Для сенсоров main с использованием _build_main_url (если var_list не пуст).
-        Возвращает словарь с ключами 'index' и 'main' (если применимо).
+        Определяет координаты запроса: в режиме следования – координаты отслеживаемой сущности
+        (или последние известные, если сущность недоступна); если используются ручные координаты,
+        то берем их, иначе извлекаем координаты из зоны 'home'.
         """
-        # Определяем координаты: если используются ручные координаты, то берем их,
-        # иначе извлекаем координаты из зоны 'home'.
+        if self._tracked_entity:
+            location = self._entity_location(self.hass.states.get(self._tracked_entity))
+            if location is not None:
+                return location
+            if self._last_location is not None:
+                return self._last_location
+            raise UpdateFailed(f"Сущность {self._tracked_entity} не содержит координат")
         if self._manual_coordinates and self._manual_latitude is not None and self._manual_longitude is not None:
-            latitude = self._manual_latitude
-            longitude = self._manual_longitude
+            return self._manual_latitude, self._manual_longitude
+        zone = self.hass.states.get("zone.home")
+        if zone is None:
+            raise UpdateFailed("Зона 'home' не найдена")
+        return zone.attributes.get("latitude"), zone.attributes.get("longitude")
+
+    @staticmethod
+    def _entity_location(state):
+        """Возвращает (latitude, longitude) из атрибутов состояния или None."""
+        if state is None:
+            return None
+        latitude = state.attributes.get("latitude")
+        longitude = state.attributes.get("longitude")
+        if latitude is None or longitude is None:
+            return None
+        return latitude, longitude
+
+    def _grid_cell(self, latitude, longitude):
+        """Возвращает ключ ячейки сетки SILAM, содержащей точку."""
+        step = GRID_RESOLUTION.get(self.silam_version, DEFAULT_GRID_RESOLUTION)
+        return round(float(latitude) / step), round(float(longitude) / step)
+
+    def _cache_cell(self, location, merged):
+        """Сохраняет данные ячейки в LRU-кеш ограниченного размера."""
+        cell = self._grid_cell(*location)
+        self._cell_cache[cell] = (time.monotonic(), merged)
+        self._cell_cache.move_to_end(cell)
+        while len(self._cell_cache) > LOCATION_CACHE_SIZE:
+            self._cell_cache.popitem(last=False)
+
+    @callback
+    def async_start_tracking(self):
+        """Подписывается на перемещения отслеживаемой сущности (если она задана)."""
+        self.async_stop_tracking()
+        if self._tracked_entity:
+            self._unsub_tracking = async_track_state_change_event(
+                self.hass, [self._tracked_entity], self._async_tracked_entity_changed
+            )
+
+    @callback
+    def async_stop_tracking(self):
+        """Отменяет подписку на перемещения и отложенное обновление."""
+        if self._unsub_tracking is not None:
+            self._unsub_tracking()
+            self._unsub_tracking = None
+        self._movement_debouncer.async_cancel()
+
+    async def async_set_blending(self, blending):
+        """Включает или выключает смешивание наборов; ряды фидов загружаются заново."""
+        if blending == self.blending:
+            return
+        self.blending = blending
+        await self.async_request_refresh()
+
+    async def async_set_tracking(self, tracked_entity, movement_threshold):
+        """Меняет отслеживаемую сущность и порог перемещения без перезагрузки записи."""
+        self._movement_threshold = movement_threshold
+        if tracked_entity == self._tracked_entity:
+            return
+        self._tracked_entity = tracked_entity
+        self.async_start_tracking()
+        await self.async_request_refresh()
+
+    @callback
+    def _async_tracked_entity_changed(self, event):
+        """
+        Обрабатывает перемещение сущности: обновление планируется (с задержкой debounce),
+        только если сущность сменила ячейку сетки или удалилась дальше порога.
+        """
+        location = self._entity_location(event.data.get("new_state"))
+        if location is None:
+            return
+        if self._last_location is not None:
+            same_cell = self._grid_cell(*location) == self._grid_cell(*self._last_location)
+            moved = location_distance(*self._last_location, *location) or 0
+            if same_cell and moved < self._movement_threshold * 1000:
+                return
+        self.hass.async_create_task(self._movement_debouncer.async_call())
+
+    async def _async_handle_movement(self):
+        """Переключается на данные новой ячейки: из кеша, если они свежие, иначе загружает заново."""
+        try:
+            location = self._resolve_location()
+        except UpdateFailed as err:
+            _LOGGER.debug("Перемещение не обработано: %s", err)
+            return
+        cached = self._cell_cache.get(self._grid_cell(*location))
+        if cached is not None and time.monotonic() - cached[0] < self.update_interval.total_seconds():
+            _LOGGER.debug("Используются кешированные данные ячейки для координат %s", location)
+            self._cell_cache.move_to_end(self._grid_cell(*location))
+            self._last_location = location
+            # Кешированные ответы фидов относятся к прежней ячейке: следующее обновление загружает все фиды
+            for feed in self._feeds.values():
+                feed.clear()
+            self.merged_data = self._build_indexes(cached[1])
+            self.async_update_listeners()
+            return
+        await self.async_request_refresh()
+
+    async def _async_request_xml(self, session, url, label):
+        """
+        Выполняет GET-запрос и возвращает корень XML-дерева ответа.
+        В режиме записи ответ добавляется в архив, в режиме воспроизведения берётся из архива (cassette.py).
+        """
+        _LOGGER.debug("Вызов API для %s: %s", label, url)
+        cassette = self.cassette
+        if cassette is not None and cassette.replaying:
+            status, body = await cassette.async_replay(url, label)
         else:
-            zone = self.hass.states.get("zone.home")
-            if zone is None:
-                raise UpdateFailed("Зона 'home' не найдена")
-            latitude = zone.attributes.get("latitude")
-            longitude = zone.attributes.get("longitude")
+            started, started_monotonic = time.time(), time.monotonic()
+            async with session.get(url, headers={"Accept-Encoding": ACCEPT_ENCODING}) as response:
+                status = response.status
+                _LOGGER.debug("Ответ для %s с кодом %s", label, status)
+                if status != 200 and cassette is None:
+                    raise UpdateFailed(f"HTTP error ({label}): {status}")
+                # Тело разбирается по мере загрузки; целиком оно сохраняется только для записи в архив
+                root = stats = None
+                async with async_timeout.timeout(10):
+                    if status == 200:
+                        root, stats, body = await async_read_xml(
+                            response, self.max_response_bytes, keep_body=cassette is not None,
+                            parser=self._response_parser(), chunk_size=self._chunk_size(), budget=self._memory,
+                        )
+                    else:
+                        body = await response.read()
+                if cassette is not None:
+                    cassette.record(
+                        url, label, status, dict(response.headers), started, time.monotonic() - started_monotonic,
+                        body.decode("utf-8", "replace"), stats.as_dict() if stats is not None else None
+                    )
+            if status != 200:
+                raise UpdateFailed(f"HTTP error ({label}): {status}")
+            self.transfers[label] = stats
+            _LOGGER.debug("Получен ответ для %s: %s", label, stats)
+            return root
+        _LOGGER.debug("Ответ для %s с кодом %s", label, status)
+        if status != 200:
+            raise UpdateFailed(f"HTTP error ({label}): {status}")
+        return self._parse_body(body)
+
+    def _chunk_size(self):
+        """Размер частей загрузки, распаковки и разбора: меньше в режиме низкого потребления памяти."""
+        return STREAM_CHUNK_SIZE if self._memory is not None else DOWNLOAD_CHUNK_SIZE
 
-        index_url = self._build_index_url(latitude, longitude)
-        _LOGGER.debug("Вызов API для index: %s", index_url)
+    def _response_parser(self):
+        """
+        Разборщик ответа: ET.XMLParser (корень XML-дерева) или, в режиме низкого потребления памяти,
+        потоковый разбор в буферы ряда с учётом в бюджете обновления (streaming.py).
+        """
+        if self._memory is None:
+            return ET.XMLParser()
+        from .streaming import SeriesParser
 
-        data = {}
+        hours = re.match(r"PT(\d+)H", self._time_duration())
+        return SeriesParser(int(hours.group(1)) + 1 if hours else 1, self._memory)
 
+    def _parse_body(self, body):
+        """
+        Разбирает тело ответа из архива или пакетной загрузки (в формате архива, cassette.py) тем же
+        разборщиком, что и ответы сети: тело распаковывается и разбирается частями, без строки со всем телом.
+        """
+        from .cassette import iter_body
+
+        parser = self._response_parser()
+        for piece in iter_body(body, self._chunk_size()):
+            if self._memory is not None:
+                self._memory.allocate(len(piece))
+            try:
+                parser.feed(piece)
+            finally:
+                if self._memory is not None:
+                    self._memory.release(len(piece))
+        return parser.close()
+
+    async def _async_load_prefetched(self, latitude, longitude):
+        """Ответы пакетной загрузки для точки (prefetch.py) или None, если их нет."""
+        from .prefetch import load_prefetched, prefetch_path
+
+        path = prefetch_path(self.hass, latitude, longitude)
+        if not await self.hass.async_add_executor_job(os.path.isdir, path):
+            return None
         try:
-            async with aiohttp.ClientSession() as session:
-                # Запрос для index
-                async with session.get(index_url) as response:
-                    _LOGGER.debug("Ответ для index с кодом %s", response.status)
-                    if response.status != 200:
-                        raise UpdateFailed(f"HTTP error (index): {response.status}")
-                    async with async_timeout.timeout(10):
-                        text = await response.text()
-                        _LOGGER.debug("Получен ответ для index: %s", text[:200])
-                        data["index"] = ET.fromstring(text)
-
-                # Если var_list задан, выполняем запрос для main
-                if self._var_list:
-                    main_url = self._build_main_url(latitude, longitude)
-                    _LOGGER.debug("Вызов API для main: %s", main_url)
-                    async with session.get(main_url) as response:
-                        _LOGGER.debug("Ответ для main с кодом %s", response.status)
-                        if response.status != 200:
-                            raise UpdateFailed(f"HTTP error (main): {response.status}")
-                        async with async_timeout.timeout(10):
-                            text = await response.text()
-                            _LOGGER.debug("Получен ответ для main: %s", text[:200])
-                            data["main"] = ET.fromstring(text)
+            responses = await self.hass.async_add_executor_job(load_prefetched, path)
         except Exception as err:
+            _LOGGER.warning("Не удалось прочитать предварительно загруженные ответы %s: %s", path, err)
+            return None
+        _LOGGER.debug("Предварительно загруженных ответов для точки: %s (%s)", len(responses), path)
+        return responses or None
+
+    def _take_prefetched(self, url, label):
+        """
+        Тело предварительно загруженного ответа на url (в формате архива, см. _parse_body),
+        если он моложе интервала фида; иначе None.
+        """
+        if not self._prefetched:
+            return None
+        item = self._prefetched.pop(url, None)
+        if item is None:
+            return None
+        recorded, body = item
+        feed = self._feeds[label.split("@")[0]]
+        age = max(time.time() - recorded, 0)
+        if age > feed.interval.total_seconds():
+            _LOGGER.debug("Предварительно загруженный ответ для %s устарел (%.0f мин)", label, age / 60)
+            return None
+        _LOGGER.debug("Используется предварительно загруженный ответ для %s (%.0f мин назад)", label, age / 60)
+        self._prefetch_ages[feed.name] = max(self._prefetch_ages.get(feed.name, 0), age)
+        return body
+
+    def _latency_tracker(self, base_url):
+        tracker = self._latency.get(base_url)
+        if tracker is None:
+            tracker = self._latency[base_url] = LatencyTracker()
+        return tracker
+
+    async def _async_timed_request(self, session, base_url, url, label):
+        """
+        Запрос с учётом задержки в выборке набора base_url. Учитываются и ошибки, и отмена
+        проигравшего хеджирование запроса (время до отмены, см. LatencyTracker).
+        """
+        started = time.monotonic()
+        try:
+            return await self._async_request_xml(session, url, label)
+        finally:
+            self._latency_tracker(base_url).add(time.monotonic() - started)
+
+    async def _async_fetch_xml(self, session, url, label):
+        """
+        Загружает XML-ответ запроса url. При включённом хеджировании запрос дублируется
+        в альтернативный набор, если основной не ответил за p95 своей задержки или ответил ошибкой.
+        Набор, ответивший на запрос, сохраняется в sources[label].
+        При первом обновлении вместо запроса может использоваться ответ пакетной загрузки (prefetch.py).
+        """
+        prefetched = self._take_prefetched(url, label)
+        if prefetched is not None:
+            self.sources[label] = source_name(self._base_url)
+            return self._parse_body(prefetched)
+        alternate = None
+        # При смешивании альтернативный набор и так загружается параллельно
+        if self.hedging and not self.blending and self._alternate is not None:
+            alternate = alternate_url(url, self._base_url, self._alternate)
+        if alternate is None:
+            root = await self._async_timed_request(session, self._base_url, url, label)
+            self.sources[label] = source_name(self._base_url)
+            return root
+        alternate_base, hedge_url = alternate
+        root, hedged = await async_hedged(
+            lambda: self._async_timed_request(session, self._base_url, url, label),
+            lambda: self._async_timed_request(session, alternate_base, hedge_url, f"{label} (hedge)"),
+            self._latency_tracker(self._base_url).hedge_delay(),
+        )
+        if hedged:
+            _LOGGER.debug("Запрос %s обслужен альтернативным набором %s", label, alternate_base)
+        self.sources[label] = source_name(alternate_base if hedged else self._base_url)
+        return root
+
+    async def _async_prepare_alternate(self, session, latitude, longitude):
+        """
+        Определяет альтернативный набор для хеджирования или смешивания:
+        только если его описание известно и покрывает точку.
+        """
+        self._alternate = None
+        if not (self.hedging or self.blending):
+            return
+        alternate = ALTERNATE_DATASETS.get(self._base_url)
+        if alternate is None:
+            return
+        capabilities = await async_get_capabilities(self.hass, alternate[0], session, budget=self._memory)
+        if capabilities is not None and capabilities.bbox is not None and capabilities.covers(latitude, longitude):
+            self._alternate = capabilities
+        else:
+            _LOGGER.debug("Альтернативный набор %s не покрывает точку или недоступен и не используется", alternate[0])
+
+    async def async_set_cassette(self, mode, speed=1.0):
+        """Включает запись ("record") или воспроизведение ("replay") ответов либо выключает режим ("off")."""
+        from .cassette import Cassette, cassette_path
+
+        current = self.cassette
+        if (current.mode if current is not None else "off") == mode and (current is None or current.speed == speed):
+            return
+        if mode not in ("record", "replay") or self._entry_id is None:
+            self.cassette = None
+            return
+        cassette = Cassette(self.hass, cassette_path(self.hass, self._entry_id), mode, speed)
+        await cassette.async_load()
+        self.cassette = cassette
+        _LOGGER.info("Режим %s ответов SILAM включён: %s", mode, cassette.path)
+
+    def source(self, kind, var=None):
+        """
+        Набор данных, обслуживший последнее обновление запросов вида kind ("index" или "main").
+        Для вертикального профиля перечисляются все наборы, ответившие на запросы уровней.
+        При смешивании наборов для переменной var перечисляются наборы, обслужившие её значения,
+        начиная с обслужившего больше точек.
+        """
+        counts = self._provenance.get(kind, {}).get(var)
+        if counts:
+            return ", ".join(sorted(counts, key=counts.get, reverse=True))
+        names = sorted({
+            name for label, name in self.sources.items()
+            if label == kind or label.startswith(f"{kind}@")
+        })
+        return ", ".join(names) if names else None
+
+    async def _async_fetch_feed(self, session, name, latitude, longitude, allergens):
+        """Загружает ряд фида; при смешивании наборов – смесь рядов основного и альтернативного наборов."""
+        if self.blending and self._alternate is not None:
+            return await self._async_fetch_blended(session, name, latitude, longitude, allergens)
+        self._provenance.pop(name, None)
+        return await self._async_fetch_feed_from(session, name, latitude, longitude, allergens, self._async_fetch_xml)
+
+    async def _async_fetch_alternate_xml(self, session, url, label):
+        """Тот же запрос к альтернативному набору (смешивание наборов)."""
+        alternate = alternate_url(url, self._base_url, self._alternate)
+        if alternate is None:
+            raise UpdateFailed(f"Альтернативный набор не содержит переменных запроса {label}")
+        alternate_base, alternate_request = alternate
+        return await self._async_timed_request(
+            session, alternate_base, alternate_request, f"{label} ({source_name(alternate_base)})"
+        )
+
+    async def _async_fetch_blended(self, session, name, latitude, longitude, allergens):
+        """
+        Загружает фид из основного и альтернативного наборов параллельно и смешивает ряды за один
+        проход (blending.py): значение берётся из набора с более мелкой сеткой, если оно есть
+        в этой точке времени, иначе из другого. Если один из наборов не ответил, фид обслуживает другой.
+        """
+        from .blending import blend_series, preferred_first, primary_names
+
+        alternate_base = ALTERNATE_DATASETS[self._base_url][0]
+        own, other = await asyncio.gather(
+            self._async_fetch_feed_from(session, name, latitude, longitude, allergens, self._async_fetch_xml),
+            self._async_fetch_feed_from(session, name, latitude, longitude, allergens, self._async_fetch_alternate_xml),
+            return_exceptions=True,
+        )
+        # gather возвращает и CancelledError (BaseException): отмена – не отказ набора, она пробрасывается
+        for result in (own, other):
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        if isinstance(own, BaseException):
+            if isinstance(other, BaseException):
+                raise own
+            _LOGGER.warning("Фид %s обслуживается только альтернативным набором %s: %s", name, alternate_base, own)
+            own = None
+        elif isinstance(other, BaseException):
+            _LOGGER.debug("Фид %s: альтернативный набор %s не используется: %s", name, alternate_base, other)
+            other = None
+        if other is not None:
+            other = primary_names(self._base_url, other)
+        own_name, other_name = source_name(self._base_url), source_name(alternate_base)
+        if preferred_first(self._base_url, alternate_base):
+            series, provenance = blend_series(own, other, (own_name, other_name))
+        else:
+            series, provenance = blend_series(other, own, (other_name, own_name))
+        self._provenance[name] = provenance
+        # Источник фида – все наборы, обслужившие его значения
+        names = {source for counts in provenance.values() for source in counts}
+        self.sources = {label: source for label, source in self.sources.items() if label.split("@")[0] != name}
+        self.sources[name] = ", ".join(sorted(names)) if names else own_name
+        return series
+
+    async def _async_fetch_feed_from(self, session, name, latitude, longitude, allergens, fetch):
+        """
+        Загружает и разбирает ответ фида: ряд index или ряд main (уровни вертикального профиля).
+        fetch(session, url, label) загружает XML-ответ запроса к основному или альтернативному набору.
+        """
+        if name == FEED_INDEX:
+            return as_series(await fetch(session, self._build_index_url(latitude, longitude), "index"))
+        if len(self.altitudes) > 1:
+            # Вертикальный профиль: минимальный набор уровней модели загружается параллельно
+            levels = plan_levels(self.altitudes, self._model_levels())
+            responses = await asyncio.gather(*(
+                fetch(
+                    session, self._build_main_url(latitude, longitude, allergens, vert_coord=level), f"main@{level:g}m"
+                )
+                for level in levels
+            ))
+            return main_series(profile=dict(zip(levels, responses)), altitudes=self.altitudes)
+        return main_series(await fetch(session, self._build_main_url(latitude, longitude, allergens), "main"))
+
+    async def _async_update_data(self):
+        """
+        Асинхронно обновляет фиды, интервал которых истёк (все – при первом и ручном обновлении
+        или смене ячейки сетки):
+          - index – запрос _build_index_url;
+          - main – запрос _build_main_url (если есть аллергены для запроса).
+        Фид, который не удалось обновить, используется из кеша в пределах бюджета устаревания.
+        Ряды фидов объединяются и кешируются в merged_data.
+        """
+        if self.profiler is not None:
+            self.profiler.cycle_started(self._entry_id)
+        latitude, longitude = self._resolve_location()
+        location = (latitude, longitude)
+        started = time.monotonic()
+        relocated = self._last_location is None or self._grid_cell(*location) != self._grid_cell(*self._last_location)
+        refresh_all = self._refresh_all or relocated
+        self._refresh_all = False
+        # При ошибке обновления слушатели уведомляются о всех фидах
+        self.changed_feeds = set(FEEDS)
+        fetched = set()
+        if self._prefetch_pending:
+            # Первое обновление: ответы пакетной загрузки для этой точки (не в режиме записи или воспроизведения)
+            self._prefetch_pending = False
+            if self.cassette is None:
+                self._prefetched = await self._async_load_prefetched(latitude, longitude)
+        self._prefetch_ages = {}
+        self._memory = None
+        if self.low_memory:
+            from .streaming import MemoryBudget
+
+            # Бюджет действует до конца построения прогнозов
+            self._memory = MemoryBudget(self.memory_budget_bytes)
+
+        try:
+            async with client_session() as session:
+                # Описание набора данных (из кеша; загружается не чаще раза в CAPABILITIES_TTL)
+                if self.cassette is None or not self.cassette.replaying:
+                    # Описание, покрытие которого короче горизонта прогноза, обновляется раньше срока
+                    until = time.time() + self._forecast_hours * 3600 if self._forecast_enabled else None
+                    self.capabilities = await async_get_capabilities(
+                        self.hass, self._base_url, session, until, self._memory
+                    )
+                    await self._async_prepare_alternate(session, latitude, longitude)
+                else:
+                    # Воспроизведение не обращается к сети: запросы строятся без описания набора
+                    self.capabilities = None
+                    self._alternate = None
+                allergens = self._requested_allergens()
+                if not allergens:
+                    self._feeds[FEED_MAIN].clear()
+                    self.sources = {label: source for label, source in self.sources.items() if label == FEED_INDEX}
+                for name in FEEDS:
+                    feed = self._feeds[name]
+                    if (name == FEED_MAIN and not allergens) or not (refresh_all or feed.due(started)):
+                        continue
+                    # Источники фида (метки name и name@<уровень>) определяются заново
+                    kept = {label: source for label, source in self.sources.items() if label.split("@")[0] == name}
+                    self.sources = {label: source for label, source in self.sources.items() if label not in kept}
+                    try:
+                        series = await self._async_fetch_feed(session, name, latitude, longitude, allergens)
+                    except Exception as err:
+                        if relocated or not feed.usable(started):
+                            raise
+                        _LOGGER.warning(
+                            "Не удалось обновить фид %s, используется ответ %.0f мин назад: %s",
+                            name, feed.age(started) / 60, err,
+                        )
+                        self.sources.update(kept)
+                        continue
+                    # Ответ пакетной загрузки старше текущего момента: расписание фида считается от его времени
+                    feed.store(series, started - self._prefetch_ages.get(name, 0))
+                    fetched.add(name)
+        except UpdateFailed:
+            self._close_memory_budget()
+            raise
+        except Exception as err:
+            self._close_memory_budget()
             raise UpdateFailed(f"Ошибка при получении или обработке XML: {err}")
+        finally:
+            self._prefetched = None
+        self._last_location = location
 
-        # Объединяем данные один раз и кешируем в merged_data,
-        # при этом оригинальный словарь data возвращается как есть для совместимости
+        # Объединяем ряды фидов и кешируем в merged_data (ответы фидов разбираются только при загрузке)
+        previous = self.merged_data
         try:
-            from .data_processing import merge_station_features
-            merged = merge_station_features(
-                data.get("index"),
-                data.get("main"),
-                forecast_enabled=self._forecast_enabled,
-                selected_allergens=self._var_list
+            index_feed, main_feed = self._feeds[FEED_INDEX], self._feeds[FEED_MAIN]
+            present = [feed for feed in (index_feed, main_feed) if feed.series is not None and len(feed.series)]
+            start = None
+            if any(feed.name not in fetched for feed in present):
+                # Ответ из кеша начинается раньше текущего момента: ось начинается с самого раннего нового ответа
+                start = min((feed.series.times[0] for feed in present if feed.name in fetched), default=None)
+            series = combine_series(
+                index_feed.series, main_feed.series, start=start,
+                align_to_index=len(self.altitudes) > 1 and main_feed.series is not None,
             )
-            _LOGGER.debug("Сформированные объединённые данные: %s", merged)
-            self.merged_data = {**merged}
+            if self._memory is not None:
+                from .streaming import copied_size
+
+                self._memory.allocate(copied_size(series, index_feed.series, main_feed.series))
+            merged = build_forecasts(
+                series, self._forecast_enabled and index_feed.series is not None, self._var_list,
+                self._forecast_window, self._forecast_step, forecast_hours=self._forecast_hours,
+                time_zone=self.time_zone, budget=self._memory,
+            )
+            _LOGGER.debug("Сформированные объединённые данные: %s (загружены фиды: %s)", merged, sorted(fetched))
+            self.merged_data = self._build_indexes(merged, previous)
+            self._cache_cell(self._last_location, merged)
+            self._record_run(merged)
+            # Прогнозы объединяют оба фида и пересчитываются при каждом обновлении;
+            # без них данные фида меняются, только если он загружен или сдвинулась запись "now"
+            if not self._forecast_enabled and previous and previous.now_time == merged.now_time:
+                self.changed_feeds = fetched
         except Exception as err:
+            if self._memory is not None:
+                from .streaming import MemoryBudgetExceeded
+
+                if isinstance(err, MemoryBudgetExceeded):
+                    # Превышение бюджета – ошибка обновления: прежние данные сохраняются
+                    raise UpdateFailed(f"Ошибка при построении прогнозов: {err}") from err
             _LOGGER.error("Ошибка при объединении или обработке прогнозных данных: %s", err)
-            self.merged_data = {}
\ No newline at end of file
+            self.merged_data = MergedData()
+        finally:
+            self._close_memory_budget()
+
+        self._publish_statistics()
+
+    def _close_memory_budget(self):
+        """Завершает учёт памяти обновления (режим низкого потребления памяти): сохраняет наибольший объём."""
+        if self._memory is None:
+            return
+        self.memory_peak = self._memory.peak
+        _LOGGER.debug("Память обновления: наибольший объём %s байт из бюджета %s", self.memory_peak, self._memory.limit)
+        self._memory = None
+
+    def _build_indexes(self, merged, previous=None):
+        """
+        Один раз за обновление строит индексы по загруженному ряду:
+        пересечения порогов (thresholds.py) и префиксные суммы экспозиции (exposure.py).
+        Префиксные суммы столбцов, не изменившихся с прошлого обновления (previous), переиспользуются.
+        """
+        merged.crossings = compute_crossings(merged.series, self.thresholds)
+        merged.exposure = build_exposure(merged.series, previous.exposure if previous else None)
+        return merged
+
+    async def async_load_history(self):
+        """Загружает буфер прогонов из хранилища (вызывается до первого обновления)."""
+        if self._history_store is None:
+            return
+        try:
+            data = await self._history_store.async_load()
+        except Exception as err:
+            _LOGGER.warning("Не удалось загрузить историю прогонов: %s", err)
+            return
+        if data:
+            self.run_history.load(data)
+            _LOGGER.debug("Загружено прогонов из хранилища: %s", len(self.run_history))
+
+    def _record_run(self, merged):
+        """Добавляет прогон в кольцевой буфер и откладывает сохранение, если данные модели обновились."""
+        if merged.now_time is None:
+            return
+        variables = ["POLI", *(URL_VAR_MAPPING.get(allergen, allergen) for allergen in self._var_list)]
+        cell = self._grid_cell(*self._last_location)
+        if self.run_history.push(merged.now_time, merged.series, variables, cell):
+            _LOGGER.debug("Новый прогон добавлен в историю (%s в буфере)", len(self.run_history))
+            if self._history_store is not None:
+                self._history_store.async_delay_save(self.run_history.as_dict, 60)
+
+    def run_metrics(self, var):
+        """Метрики пересмотра и тренда прогноза для полного имени переменной или None."""
+        return self.run_history.metrics.get(var)
+
+    def exposure(self, key, start=None, end=None, window_hours=None):
+        """
+        Сводка экспозиции по аллергену (или "index") на интервале [start, end] (секунды эпохи).
+        Возвращает None, если данных по переменной нет.
+        """
+        merged = self.merged_data
+        if not merged:
+            return None
+        column = threshold_column(key)
+        index = merged.exposure.get(column)
+        if index is None:
+            return None
+        return exposure_summary(index, merged.series.units.get(column), start, end, window_hours)
+
+    @callback
+    def async_set_thresholds(self, thresholds, threshold_lookahead):
+        """Меняет значения порогов на лету и пересчитывает индексы без загрузки данных."""
+        self.thresholds = dict(thresholds or {})
+        self.threshold_lookahead = threshold_lookahead
+        if self.merged_data:
+            self.merged_data.crossings = compute_crossings(self.merged_data.series, self.thresholds)
+            self.async_update_listeners()
+
+    def _publish_statistics(self):
+        """Пакетный импорт долгосрочных статистик (один пакет на переменную за обновление)."""
+        if self._statistics is not None:
+            try:
+                self._statistics.async_publish(self.merged_data, self._var_list)
+            except Exception as err:
+                _LOGGER.warning("Ошибка при импорте долгосрочных статистик: %s", err)
+
+    async def async_reconfigure(self, var_list, update_interval, forecast_statistics=None,
+                                forecast_window=None, forecast_step=None, forecast_hours=None,
+                                allergen_update_interval=None):
+        """
+        Применяет новые опции без перезагрузки записи.
+
+        Интервалы обновления фидов, окна агрегации и горизонт прогноза меняются на лету. Для аллергенов, которые уже были выбраны,
+        используются ранее загруженные данные; загружаются только новые аллергены,
+        после чего прогнозы пересчитываются из общего хранилища.
+        Возвращает список добавленных аллергенов.
+        """
+
+        var_list = list(var_list or [])
+        added = [allergen for allergen in var_list if allergen not in self._var_list]
+        removed = [allergen for allergen in self._var_list if allergen not in var_list]
+        self._var_list = var_list
+
+        if forecast_statistics is not None and self._statistics is not None:
+            self._statistics.forecast_statistics = forecast_statistics
+        if forecast_window is not None:
+            self._forecast_window = forecast_window
+        if forecast_step is not None:
+            self._forecast_step = forecast_step
+        # Более длинный горизонт требует новой загрузки, более короткий – только пересчёта прогнозов
+        horizon_extended = False
+        if forecast_hours is not None:
+            forecast_hours = min(int(forecast_hours), MAX_FORECAST_HOURS)
+            horizon_extended = forecast_hours > self._forecast_hours
+            self._forecast_hours = forecast_hours
+            if horizon_extended:
+                # Данные ячеек загружены с прежним, более коротким горизонтом
+                self._cell_cache.clear()
+
+        self._feeds[FEED_INDEX].interval = timedelta(minutes=update_interval)
+        self._feeds[FEED_MAIN].interval = timedelta(minutes=allergen_update_interval or update_interval)
+        new_interval = self._tick_interval()
+        if new_interval != self.update_interval:
+            _LOGGER.debug("Интервал обновления изменён: %s -> %s", self.update_interval, new_interval)
+            self.update_interval = new_interval
+            self._schedule_refresh()
+
+        # Для вертикального профиля новые аллергены нужны на всех уровнях, при смешивании наборов –
+        # из обоих наборов, а удлинённый горизонт отсутствует в загруженных данных – в этих случаях
+        # выполняем полное обновление
+        if (not self.merged_data or self._last_location is None
+                or (added and (len(self.altitudes) > 1 or self.blending))
+                or (horizon_extended and self._forecast_enabled)):
+            await self.async_request_refresh()
+            return added
+
+        # Данные других ячеек содержат прежний набор аллергенов
+        self._cell_cache.clear()
+        # Кешированный ряд фида main меняется вместе с объединённым рядом
+        series = self.merged_data.series
+        main_feed = self._feeds[FEED_MAIN]
+        for allergen in removed:
+            full_var = URL_VAR_MAPPING.get(allergen, allergen)
+            for target in (series, main_feed.series):
+                if target is None:
+                    continue
+                target.remove_column(full_var)
+                for altitude in self.altitudes[1:]:
+                    target.remove_column(profile_key(full_var, altitude))
+        if not var_list:
+            main_feed.clear()
+
+        # Аллергены, которых нет в наборе данных, не запрашиваются: такой запрос заведомо неудачен
+        fetched = self._requested_allergens(added)
+        if fetched:
+            latitude, longitude = self._last_location
+            try:
+                async with client_session() as session:
+                    main_xml = await self._async_fetch_xml(
+                        session, self._build_main_url(latitude, longitude, fetched), "main"
+                    )
+                added_series = main_series(main_xml)
+                add_columns(series, added_series)
+                if main_feed.series is None:
+                    main_feed.store(added_series, time.monotonic())
+                else:
+                    add_columns(main_feed.series, added_series)
+            except Exception as err:
+                _LOGGER.warning("Не удалось загрузить новые аллергены %s, выполняется полное обновление: %s", fetched, err)
+                await self.async_request_refresh()
+                return added
+
+        self.merged_data = self._build_indexes(build_forecasts(
+            series, self._forecast_enabled, self._var_list, self._forecast_window, self._forecast_step,
+            forecast_hours=self._forecast_hours, time_zone=self.time_zone
+        ))
+        self._cache_cell(self._last_location, self.merged_data)
+        self.async_update_listeners()
+        return added
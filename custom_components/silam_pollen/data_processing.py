@@ -1,231 +1,480 @@
 import xml.etree.ElementTree as ET
-import statistics
 import math
-from datetime import datetime, timedelta, timezone
-from .const import INDEX_MAPPING, URL_VAR_MAPPING
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from .const import (
+    INDEX_MAPPING,
+    URL_VAR_MAPPING,
+    DEFAULT_FORECAST_WINDOW,
+    DEFAULT_FORECAST_STEP,
+    HOURLY_FORECAST_HOURS,
+    DEFAULT_FORECAST_HOURS,
+)
+from .records import (
+    BLANK,
+    NAN,
+    ForecastEntry,
+    ForecastSeries,
+    MergedData,
+    StationInfo,
+    intern_str,
+    parse_epoch,
+)
 
-def merge_station_features(index_xml: ET.Element, main_xml: ET.Element = None, forecast_enabled: bool = False, selected_allergens: list = None) -> dict:
+# Оценки памяти построения прогнозов для бюджета обновления (build_forecasts):
+# значение рабочего списка (ссылка и объект числа), запись прогноза и аллерген записи
+FORECAST_VALUE_SIZE = 32
+ENTRY_SIZE = 160
+ENTRY_ALLERGEN_SIZE = 72
+
+
+def parse_series(xml_root: ET.Element) -> ForecastSeries:
+    """
+    Парсит XML-дерево одного ответа в ForecastSeries: станция первой записи ответа,
+    столбцы переменных в порядке появления, исходные тексты значений, которые float
+    не воспроизводит (raw_text). Запись с повторяющейся датой замещает прежнюю целиком.
+    """
+    station = None
+    variables = []
+    units = {}
+    names = {}  # {имя из XML: интернированный ключ}
+    rows = {}
+    texts = {}
+    for feature in xml_root.iter("stationFeature"):
+        ts = parse_epoch(feature.get("date"))
+        if station is None:
+            station_elem = feature.find("station")
+            if station_elem is not None:
+                station = StationInfo.from_element(station_elem)
+        if ts in rows:
+            for var_texts in texts.values():
+                var_texts.pop(ts, None)
+        row = rows[ts] = {}
+        for data_elem in feature.findall("data"):
+            name = data_elem.get("name")
+            key = names.get(name)
+            if key is None:
+                key = names[name] = intern_str(name)
+                if key not in units:
+                    variables.append(key)
+                    units[key] = intern_str(data_elem.get("units"))
+            text = data_elem.text
+            if text is None:
+                value = NAN
+            else:
+                try:
+                    value = float(text)
+                except ValueError:
+                    value = NAN
+            row[key] = value
+            # Текст, который format_raw не воспроизводит (см. raw_text)
+            if text is None:
+                texts.setdefault(key, {})[ts] = BLANK
+            elif value != value or repr(value) != text:
+                texts.setdefault(key, {})[ts] = text
+    series = ForecastSeries(station)
+    times = sorted(rows)
+    series.times = array("q", times)
+    for var in variables:
+        series.add_column(var, array("d", (rows[ts].get(var, NAN) for ts in times)), units[var], texts.get(var))
+    return series
+
+
+def build_series(index_xml: ET.Element = None, main_xml: ET.Element = None) -> ForecastSeries:
+    """
+    Объединяет ответы 'index' и 'main' в одно колоночное хранилище по временным меткам (см. combine_series).
+    """
+    return combine_series(
+        parse_series(index_xml) if index_xml is not None else None,
+        parse_series(main_xml) if main_xml is not None else None,
+    )
+
+
+def as_series(response) -> ForecastSeries:
+    """Ряд одного ответа: XML-дерево разбирается parse_series, ряд потокового разбора (streaming.py) возвращается как есть."""
+    if isinstance(response, ForecastSeries):
+        return response
+    return parse_series(response)
+
+
+def profile_key(var: str, altitude: float) -> str:
+    """Имя столбца переменной на дополнительной высоте вертикального профиля, например cnc_POLLEN_BIRCH_m22@50m."""
+    return intern_str(f"{var}@{altitude:g}m")
+
+
+def profile_altitudes(main_altitude, altitudes) -> list:
+    """Дополнительные высоты профиля (м) в порядке ввода: без повторов и без основной высоты."""
+    main = float(main_altitude)
+    extra = []
+    for altitude in altitudes or []:
+        altitude = float(altitude)
+        if altitude != main and altitude not in extra:
+            extra.append(altitude)
+    return extra
+
+
+def plan_levels(altitudes, model_levels) -> list:
+    """
+    Возвращает минимальный набор уровней модели, достаточный для интерполяции всех высот:
+    совпадающий уровень либо пара соседних уровней, ограничивающих высоту.
     """
-    Объединяет данные из XML-ответов для 'index' и 'main' по атрибуту date и формирует итоговый словарь.
+    levels = sorted(model_levels)
+    needed = set()
+    for altitude in altitudes:
+        if altitude in levels or altitude <= levels[0] or altitude >= levels[-1]:
+            needed.add(min(levels, key=lambda level: abs(level - altitude)))
+        else:
+            needed.add(max(level for level in levels if level < altitude))
+            needed.add(min(level for level in levels if level > altitude))
+    return sorted(needed)
+
+
+def interpolate_profile(level_series: dict, altitudes) -> ForecastSeries:
+    """
+    Строит столбцы на заданных высотах линейной интерполяцией между уровнями модели.
+
+    level_series – {высота уровня: ForecastSeries}. Первая высота из altitudes
+    сохраняет исходные имена переменных, остальные получают имена profile_key().
+    Ниже нижнего и выше верхнего уровня берётся значение крайнего уровня.
+    """
+    levels = sorted(level_series)
+    base = level_series[levels[0]]
+    result = ForecastSeries(base.station)
+    result.times = array("q", base.times)
+    positions = {
+        level: {ts: i for i, ts in enumerate(series.times)} for level, series in level_series.items()
+    }
+
+    def level_value(level, var, ts):
+        column = level_series[level].values.get(var)
+        i = positions[level].get(ts)
+        return NAN if column is None or i is None else column[i]
+
+    for index, altitude in enumerate(altitudes):
+        lower = max((level for level in levels if level <= altitude), default=levels[0])
+        upper = min((level for level in levels if level >= altitude), default=levels[-1])
+        weight = 0.0 if upper == lower else (altitude - lower) / (upper - lower)
+        for var in base.values:
+            key = var if index == 0 else profile_key(var, altitude)
+            column = array("d", (
+                level_value(lower, var, ts) + (level_value(upper, var, ts) - level_value(lower, var, ts)) * weight
+                if weight else level_value(lower, var, ts)
+                for ts in result.times
+            ))
+            # Значения на самом уровне модели сохраняют исходные тексты
+            texts = level_series[lower].texts.get(var) if not weight else None
+            result.add_column(key, column, base.units.get(var), texts)
+    if base.station is not None:
+        result.station = StationInfo(base.station.name, base.station.latitude, base.station.longitude, f"{altitudes[0]:g}")
+    return result
+
+
+def forecast_key(allergen: str) -> str:
+    """
+    Ключ аллергена в прогнозе: "pollen_<имя>" (часть ключа до "_").
+    Для переменных, выбранных по описанию набора (cnc_POLLEN_<ИМЯ>_m<размер>), имя берётся из переменной.
+    """
+    if allergen.startswith("cnc_POLLEN_"):
+        return "pollen_" + allergen.split('_')[2].lower()
+    return "pollen_" + allergen.split('_')[0].lower()
+
+
+def projection_fields(variables) -> tuple:
+    """
+    Переменные ряда и ключи записей прогнозов для проекции ответа службы (MergedData.project).
+    variables – "index", "temperature" и ключи аллергенов; None – все (возвращает (None, None)).
+    """
+    if variables is None:
+        return None, None
+    columns = set()
+    keys = set()
+    for variable in variables:
+        if variable == "index":
+            columns.update(("POLI", "POLISRC"))
+            keys.update(("pollen_index", "condition"))
+        elif variable == "temperature":
+            columns.add("temp_2m")
+            keys.update(("temperature", "native_temperature", "native_templow", "native_temperature_unit"))
+        else:
+            columns.add(URL_VAR_MAPPING.get(variable, variable))
+            keys.add(forecast_key(variable))
+    return columns, keys
+
+
+def merge_station_features(index_xml: ET.Element, main_xml: ET.Element = None, forecast_enabled: bool = False, selected_allergens: list = None,
+                           profile: dict = None, altitudes: list = None,
+                           window: int = DEFAULT_FORECAST_WINDOW, step: int = DEFAULT_FORECAST_STEP,
+                           forecast_hours: int = DEFAULT_FORECAST_HOURS, time_zone=None) -> MergedData:
+    """
+    Объединяет данные из XML-ответов для 'index' и 'main' по атрибуту date и формирует итоговую структуру.
     
     Если forecast_enabled=True, дополнительно производится агрегация прогнозных данных.
     Если selected_allergens задан, для каждого выбранного аллергена (например, ['alder_m22', 'birch_m22'])
     рассчитываются агрегированные значения и сразу встраиваются в прогнозы.
     
-    Итоговая структура:
+    Результат – MergedData, который ведёт себя как словарь:
       {
          "now": { ... },                  # Запись с самой ранней датой (текущая)
          "hourly_forecast": [ ... ],      # Почасовой прогноз с дополнительно добавленными ключами аллергенов
-         "twice_daily_forecast": [ ... ]  # Прогноз два раза в день с дополнительно добавленными ключами аллергенов
+         "twice_daily_forecast": [ ... ], # Прогноз два раза в день с дополнительно добавленными ключами аллергенов
+         "daily_forecast": [ ... ]        # Суточный прогноз по локальным календарным суткам
       }
     :param index_xml: XML-дерево, полученное из data["index"]
     :param main_xml: XML-дерево, полученное из data["main"] (может быть None)
     :param forecast_enabled: Флаг, указывающий, нужно ли выполнять агрегацию прогнозных данных.
     :param selected_allergens: Список выбранных аллергенов (например, ['alder_m22', 'birch_m22']).
-    :return: Итоговый словарь агрегированных данных.
-    """
-    def parse_features(xml_root: ET.Element) -> dict:
-        """
-        Парсит XML-дерево и формирует словарь с данными для каждой станции по дате.
-        """
-        features = {}
-        for feature in xml_root.findall(".//stationFeature"):
-            date = feature.get("date")
-            # Извлекаем информацию о станции
-            station_elem = feature.find("station")
-            station_data = {}
-            if station_elem is not None:
-                station_data = {
-                    "name": station_elem.get("name"),
-                    "latitude": station_elem.get("latitude"),
-                    "longitude": station_elem.get("longitude"),
-                    "altitude": station_elem.get("altitude")
-                }
-            # Извлекаем все элементы <data> и их значения
-            data_elements = {}
-            for data_elem in feature.findall("data"):
-                key = data_elem.get("name")
-                data_elements[key] = {
-                    "value": data_elem.text,
-                    "units": data_elem.get("units")
-                }
-            features[date] = {
-                "station": station_data,
-                "data": data_elements
-            }
-        return features
-
-    def parse_iso(date_str: str) -> datetime:
-        """
-        Преобразует строку даты в объект datetime, удаляя завершающую "Z", если она присутствует.
-        """
-        return datetime.fromisoformat(date_str.rstrip("Z"))
-    
-    # Парсим XML-деревья для index и main (если задано)
-    index_features = parse_features(index_xml) if index_xml is not None else {}
-    main_features = parse_features(main_xml) if main_xml is not None else {}
-
-    # Объединяем данные по датам из index и main
-    raw_merged = {}
-    all_dates = set(index_features.keys()) | set(main_features.keys())
-    for date in all_dates:
-        station_index = index_features.get(date, {}).get("station", {})
-        station_main = main_features.get(date, {}).get("station", {})
-        # Если в main указана ненулевая высота, отдаём ей предпочтение
-        station = station_main if station_main.get("altitude") not in (None, "0", 0) else station_index
-        data_index = index_features.get(date, {}).get("data", {})
-        data_main = main_features.get(date, {}).get("data", {})
-        combined_data = {**data_index, **data_main}
-        raw_merged[date] = {
-            "station": station,
-            "data": combined_data
-        }
-    
-    # Выбираем запись "now" – с самой ранней датой
-    now_record = {}
-    if raw_merged:
-        try:
-            sorted_dates = sorted(raw_merged.keys(), key=lambda d: parse_iso(d))
-        except Exception:
-            sorted_dates = list(raw_merged.keys())
-        earliest = sorted_dates[0]
-        now_record = raw_merged[earliest]
-        now_record["date"] = earliest
+    :param profile: Ответы 'main' по уровням модели {высота уровня: XML} для вертикального профиля
+                    (используется вместо main_xml).
+    :param altitudes: Высоты профиля; первая – основная, остальные добавляются столбцами profile_key().
+    :param window: Размер окна почасового прогноза (часы).
+    :param step: Шаг окон почасового прогноза (часы).
+    :param forecast_hours: Глубина прогнозов дважды в день и суточного (часы).
+    :param time_zone: Часовой пояс локальных половин суток и суток (None – часовой пояс процесса).
+    :return: MergedData с колоночным хранилищем и агрегированными прогнозами.
+    """
+    if profile:
+        series = build_series(index_xml, None)
+        level_series = {level: parse_series(xml) for level, xml in profile.items()}
+        profile_series = interpolate_profile(level_series, altitudes)
+        add_columns(series, profile_series)
+        if profile_series.station is not None:
+            series.station = profile_series.station
     else:
-        earliest = None
+        series = build_series(index_xml, main_xml)
+    return build_forecasts(
+        series, forecast_enabled and index_xml is not None, selected_allergens, window, step,
+        forecast_hours=forecast_hours, time_zone=time_zone,
+    )
+
+
+def add_columns(series: ForecastSeries, extra: ForecastSeries) -> ForecastSeries:
+    """
+    Добавляет в series столбцы из extra, выравнивая их по временной оси series.
+    Точки extra, отсутствующие в series, отбрасываются; недостающие значения – NaN.
+    """
+    positions = {ts: i for i, ts in enumerate(extra.times)}
+    for var, column in extra.values.items():
+        series.add_column(
+            var,
+            array("d", (column[positions[ts]] if ts in positions else NAN for ts in series.times)),
+            extra.units.get(var),
+            extra.texts.get(var),
+        )
+    return series
+
+
+def main_series(main_xml: ET.Element = None, profile: dict = None, altitudes: list = None) -> ForecastSeries:
+    """
+    Ряд фида main: ответ main_xml или, для вертикального профиля, столбцы на высотах altitudes,
+    интерполированные по ответам уровней модели profile {высота уровня: XML}.
+    Ответы могут быть и готовыми рядами потокового разбора (as_series).
+    """
+    if profile:
+        return interpolate_profile({level: as_series(xml) for level, xml in profile.items()}, altitudes)
+    return as_series(main_xml)
+
+
+def combine_series(index_series: ForecastSeries = None, main: ForecastSeries = None,
+                   start: int = None, align_to_index: bool = False) -> ForecastSeries:
+    """
+    Объединяет ряды ответов (фидов) index и main в новый ряд: общая ось времени, столбцы main
+    замещают одноимённые столбцы index. Станция – как у записи "now" (первой точки) в исходном
+    формате: станция main, если main содержит эту точку и у неё ненулевая высота, иначе станция
+    index, если он содержит эту точку. Исходные ряды не изменяются; столбцы на той же оси
+    времени используются без копирования.
+
+    :param start: точки раньше start отбрасываются (ряд фида из прошлого обновления
+                  начинается раньше текущего момента).
+    :param align_to_index: ось времени index, столбцы main выравниваются по ней, а станция main
+                           используется, если она есть (вертикальный профиль, как в merge_station_features).
+    """
+    parts = [part for part in (index_series, main) if part is not None]
+    if align_to_index and index_series is not None:
+        times = index_series.times
+    else:
+        times = sorted(set().union(*(part.times for part in parts)))
+    series = ForecastSeries()
+    series.times = array("q", (ts for ts in times if start is None or ts >= start))
+    if align_to_index and index_series is not None:
+        series.station = (main.station if main is not None else None) or index_series.station
+    elif len(series):
+        series.station = _first_station(index_series, main, series.times[0])
+    for part in parts:
+        if part.times == series.times:
+            positions = None
+        else:
+            positions = {ts: i for i, ts in enumerate(part.times)}
+        for var, column in part.values.items():
+            if part is index_series and main is not None and var in main.values:
+                continue
+            if positions is not None:
+                column = array("d", (column[positions[ts]] if ts in positions else NAN for ts in series.times))
+            series.add_column(var, column, part.units.get(var), part.texts.get(var))
+    return series
+
+
+def _first_station(index_series: ForecastSeries, main: ForecastSeries, ts: int):
+    """Станция точки ts объединённого ряда (None, если ни один ответ её не задаёт)."""
+    if main is not None and main.station is not None and main.station.altitude not in (None, "0", 0) and _has_time(main, ts):
+        return main.station
+    if index_series is not None and _has_time(index_series, ts):
+        return index_series.station
+    return None
+
+
+def _has_time(series: ForecastSeries, ts: int) -> bool:
+    i = bisect_left(series.times, ts)
+    return i < len(series.times) and series.times[i] == ts
+
+
+def build_forecasts(series: ForecastSeries, forecast_enabled: bool = False, selected_allergens: list = None,
+                    window: int = DEFAULT_FORECAST_WINDOW, step: int = DEFAULT_FORECAST_STEP,
+                    horizon_hours: int = HOURLY_FORECAST_HOURS,
+                    forecast_hours: int = DEFAULT_FORECAST_HOURS, time_zone=None, budget=None) -> MergedData:
+    """
+    Формирует MergedData из готового колоночного хранилища: запись "now"
+    и (при forecast_enabled) агрегированные почасовой, дважды-в-день и суточный прогнозы.
+    Позволяет пересчитать прогнозы без повторной загрузки и разбора XML.
+
+    Все три прогноза строятся за один проход по горизонту: значения каждой точки
+    преобразуются один раз, а половины суток и сутки всех точек определяются по кешированному
+    локальному календарю (local_calendar.py).
+
+    :param window: размер окна почасового прогноза (в точках ряда, т.е. часах).
+    :param step: шаг окон почасового прогноза; step < window даёт перекрывающиеся окна.
+    :param horizon_hours: глубина почасового прогноза от текущего момента.
+    :param forecast_hours: глубина прогнозов дважды в день и суточного от текущего момента.
+    :param time_zone: часовой пояс (tzinfo) локальных половин суток и суток; None – часовой пояс процесса.
+    :param budget: бюджет памяти обновления (streaming.MemoryBudget) или None: рабочие списки
+                   учитываются на время построения, записи прогнозов – как результат.
+    """
+    # Запись "now" – самая ранняя дата, т.е. первая точка отсортированного ряда
+    if not len(series):
+        return MergedData(series)
 
-    # Инициализируем списки агрегированных прогнозов
     hourly_forecast = []
     twice_daily_forecast = []
+    daily_forecast = []
 
-    if forecast_enabled and index_xml is not None:
-        current_time = datetime.utcnow()
-        # Собираем "сырые" данные из raw_merged с предварительным сохранением объекта datetime и значений аллергенов
-        raw_all = []
-        for date_str, entry in raw_merged.items():
-            dt_obj = parse_iso(date_str)
-            # Вычисляем температуру (перевод из Кельвина в Цельсий)
-            temp_value = None
-            if "temp_2m" in entry["data"] and entry["data"]["temp_2m"]["value"] is not None:
-                try:
-                    temp_value = float(entry["data"]["temp_2m"]["value"]) - 273.15
-                except (ValueError, TypeError):
-                    temp_value = None
-            # Индекс пыльцы для общего поля POLI
-            pollen_index = None
-            if "POLI" in entry["data"] and entry["data"]["POLI"]["value"] is not None:
-                try:
-                    pollen_index = int(float(entry["data"]["POLI"]["value"]))
-                except (ValueError, TypeError):
-                    pollen_index = None
-            # Если выбраны отдельные аллергены, пытаемся извлечь их значения
-            allergens_values = {}
-            if selected_allergens:
-                for orig_allergen in selected_allergens:
-                    real_key = URL_VAR_MAPPING.get(orig_allergen, orig_allergen)
-                    forecast_key = "pollen_" + orig_allergen.split('_')[0].lower()
-                    if real_key in entry["data"] and entry["data"][real_key]["value"] is not None:
-                        try:
-                            allergens_values[forecast_key] = int(float(entry["data"][real_key]["value"]))
-                        except (ValueError, TypeError):
-                            allergens_values[forecast_key] = None
-                    else:
-                        allergens_values[forecast_key] = None
-
-            raw_all.append({
-                "datetime": date_str,
-                "dt_obj": dt_obj,
-                "temperature": round(temp_value, 1) if temp_value is not None else None,
-                "pollen_index": pollen_index,
-                "allergens": allergens_values  # Словарь с данными по каждому аллергену
-            })
-        try:
-            raw_all.sort(key=lambda item: item["dt_obj"])
-        except Exception:
-            pass
-
-        # Почасовой прогноз – окна по 3 часа (на следующие 24 часа)
-        window_size = 3
-        step = 3
-        raw_hourly = [item for item in raw_all if item["dt_obj"] > current_time and item["dt_obj"] <= current_time + timedelta(hours=24)]
-        for i in range(0, len(raw_hourly) - window_size + 1, step):
-            window = raw_hourly[i:i+window_size]
-            temps = [item["temperature"] for item in window if item["temperature"] is not None]
-            indices = [item["pollen_index"] for item in window if item["pollen_index"] is not None]
-            max_temp = max(temps) if temps else None
-            median_index = statistics.median(indices) if indices else None
-            # Выбираем время репрезентативного окна
-            rep_time = window[1]["datetime"] if len(window) >= 2 else window[0]["datetime"]
-            rep_time_str = parse_iso(rep_time).replace(tzinfo=timezone.utc).isoformat()
+    if forecast_enabled:
+        # Агрегация прогнозов нужна только при включённом прогнозе и загружается при первом использовании
+        import statistics
+        from .local_calendar import local_calendar
+        from .rolling import sliding_windows
+
+        current_ts = datetime.now(timezone.utc).timestamp()
+        times = series.times
+        temp_col = series.values.get("temp_2m")
+        poli_col = series.values.get("POLI")
+        allergen_cols = []
+        if selected_allergens:
+            for orig_allergen in selected_allergens:
+                real_key = URL_VAR_MAPPING.get(orig_allergen, orig_allergen)
+                allergen_cols.append((forecast_key(orig_allergen), series.values.get(real_key)))
+
+        # Единый проход по горизонту (now, now + forecast_hours]: значения каждого столбца преобразуются один раз
+        first = bisect_right(times, current_ts)
+        last = bisect_right(times, current_ts + max(forecast_hours, horizon_hours) * 3600)
+        isfinite = math.isfinite
+
+        def as_ints(column):
+            if column is None:
+                return [None] * (last - first)
+            return [int(value) if isfinite(value) else None for value in column[first:last]]
+
+        # Перевод из Кельвина в Цельсий
+        if temp_col is None:
+            temps = [None] * (last - first)
+        else:
+            temps = [round(value - 273.15, 1) if isfinite(value) else None for value in temp_col[first:last]]
+        indexes = as_ints(poli_col)
+        allergen_values = [as_ints(column) for _, column in allergen_cols]
+        # Рабочие списки: значения столбцов и позиции точек в половинах суток и сутках
+        work_size = (last - first) * FORECAST_VALUE_SIZE * (4 + len(allergen_cols))
+        if budget is not None:
+            budget.allocate(work_size)
+
+        # Локальные половины суток и сутки точек (now, now + forecast_hours]
+        half_days = {}  # {номер половины суток: [позиции]}
+        days = {}  # {номер суток: [позиции]}
+        calendar = None
+        period_end = bisect_right(times, current_ts + forecast_hours * 3600, first, last)
+        if period_end > first:
+            calendar = local_calendar(time_zone, times[first], times[period_end - 1])
+            halves, day_ids = calendar.assign(times, first, period_end)
+            for pos in range(period_end - first):
+                half_days.setdefault(halves[pos], []).append(pos)
+                days.setdefault(day_ids[pos], []).append(pos)
+
+        def aggregate_allergens(group):
+            result = []
+            for (allergen_key, _), column in zip(allergen_cols, allergen_values):
+                values = [column[pos] for pos in group if column[pos] is not None]
+                if values:
+                    result.append((allergen_key, int(math.ceil(statistics.median(values)))))
+            return result
+
+        def period_entry(group, ts, is_daytime=None):
+            """Агрегирует группу точек: максимум/минимум температуры, медианы индекса и аллергенов."""
+            group_temps = [temps[pos] for pos in group if temps[pos] is not None]
+            group_indexes = [indexes[pos] for pos in group if indexes[pos] is not None]
+            if not (group_temps and group_indexes):
+                return None
+            median_index = statistics.median(group_indexes)
+            return ForecastEntry(
+                ts,
+                INDEX_MAPPING.get(int(round(median_index)), "unknown"),
+                round(max(group_temps), 1),
+                int(math.ceil(median_index)),
+                templow=round(min(group_temps), 1),
+                is_daytime=is_daytime,
+                allergens=aggregate_allergens(group),
+            )
+
+        # Почасовой прогноз – скользящие окна window часов с шагом step (на следующие horizon_hours часов).
+        # Все агрегаты поддерживаются инкрементально за один проход по оси времени.
+        hourly_count = bisect_right(times, current_ts + horizon_hours * 3600) - first
+        columns = {
+            "temperature": (temps, ("max",)),
+            "pollen_index": (indexes, ("median",)),
+        }
+        for (allergen_key, _), values in zip(allergen_cols, allergen_values):
+            columns[allergen_key] = (values, ("median",))
+        for start, aggregates in sliding_windows(columns, hourly_count, window, step):
+            max_temp = aggregates["temperature"]["max"]
+            median_index = aggregates["pollen_index"]["median"]
+            # Выбираем время репрезентативного окна (центральная точка)
+            rep_ts = times[first + start + window // 2]
             condition = INDEX_MAPPING.get(int(round(median_index)) if median_index is not None else None, "unknown")
-            forecast_entry = {
-                "datetime": rep_time_str,
-                "condition": condition,
-                "native_temperature": round(max_temp, 1) if max_temp is not None else None,
-                "native_temperature_unit": "°C",
-                "pollen_index": int(math.ceil(median_index)) if median_index is not None else None,
-                "temperature": round(max_temp, 1) if max_temp is not None else None
-            }
-            # Встроенная агрегация данных по аллергенам для данного окна
-            if selected_allergens:
-                for orig_allergen in selected_allergens:
-                    forecast_key = "pollen_" + orig_allergen.split('_')[0].lower()
-                    allergen_values = [item["allergens"].get(forecast_key) for item in window if item["allergens"].get(forecast_key) is not None]
-                    if allergen_values:
-                        forecast_entry[forecast_key] = int(math.ceil(statistics.median(allergen_values)))
-            hourly_forecast.append(forecast_entry)
-
-        # Прогноз дважды в день – интервалы по 12 часов (на следующие 36 часов)
-        raw_twice = [item for item in raw_all if item["dt_obj"] > current_time and item["dt_obj"] <= current_time + timedelta(hours=36)]
-        interval_hours = 12
-        aggregated_twice = []
-        local_tz = datetime.now().astimezone().tzinfo
-        for i in range(0, 36, interval_hours):
-            start = current_time + timedelta(hours=i)
-            end = current_time + timedelta(hours=i + interval_hours)
-            group = [item for item in raw_twice if start < item["dt_obj"] <= end]
-            if group:
-                temps = [item["temperature"] for item in group if item["temperature"] is not None]
-                indices = [item["pollen_index"] for item in group if item["pollen_index"] is not None]
-                if temps and indices:
-                    max_temp = max(temps)
-                    min_temp = min(temps)
-                    median_index = statistics.median(indices)
-                    group_sorted = sorted(group, key=lambda x: x["dt_obj"])
-                    rep_dt = group_sorted[len(group_sorted) // 2]["datetime"]
-                    local_rep_dt = parse_iso(rep_dt).replace(tzinfo=timezone.utc).astimezone(local_tz)
-                    if 6 <= local_rep_dt.hour < 18:
-                        fixed_local_dt = local_rep_dt.replace(hour=12, minute=0, second=0, microsecond=0)
-                    else:
-                        if local_rep_dt.hour >= 18:
-                            fixed_local_dt = (local_rep_dt + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-                        else:
-                            fixed_local_dt = local_rep_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-                    fixed_dt_str = fixed_local_dt.astimezone(timezone.utc).isoformat()
-                    condition = INDEX_MAPPING.get(int(round(median_index)), "unknown")
-                    forecast_entry = {
-                        "datetime": fixed_dt_str,
-                        "is_daytime": (6 <= fixed_local_dt.hour < 18),
-                        "condition": condition,
-                        "native_temperature": round(max_temp, 1) if max_temp is not None else None,
-                        "native_templow": round(min_temp, 1) if min_temp is not None else None,
-                        "pollen_index": int(math.ceil(median_index)) if median_index is not None else None,
-                        "temperature": round(max_temp, 1) if max_temp is not None else None
-                    }
-                    # Встроенная агрегация данных по аллергенам для данного интервала
-                    if selected_allergens:
-                        for orig_allergen in selected_allergens:
-                            forecast_key = "pollen_" + orig_allergen.split('_')[0].lower()
-                            allergen_values = [item["allergens"].get(forecast_key) for item in group if item["allergens"].get(forecast_key) is not None]
-                            if allergen_values:
-                                forecast_entry[forecast_key] = int(math.ceil(statistics.median(allergen_values)))
-                    aggregated_twice.append(forecast_entry)
-        aggregated_twice.sort(key=lambda x: x["datetime"])
-        twice_daily_forecast = aggregated_twice
-
-    result = {
-        "now": now_record,
-        "hourly_forecast": hourly_forecast,
-        "twice_daily_forecast": twice_daily_forecast
-    }
-    return result
\ No newline at end of file
+            allergens = [
+                (allergen_key, int(math.ceil(aggregates[allergen_key]["median"])))
+                for allergen_key, _ in allergen_cols
+                if aggregates[allergen_key]["median"] is not None
+            ]
+            hourly_forecast.append(ForecastEntry(
+                rep_ts,
+                condition,
+                round(max_temp, 1) if max_temp is not None else None,
+                int(math.ceil(median_index)) if median_index is not None else None,
+                allergens=allergens,
+            ))
+
+        # Прогноз дважды в день – локальные день (06:00–18:00, время записи 12:00) и ночь (18:00–06:00, полночь)
+        for half, group in sorted(half_days.items()):
+            entry = period_entry(group, calendar.half_times[half], calendar.half_daytime[half])
+            if entry is not None:
+                twice_daily_forecast.append(entry)
+
+        # Суточный прогноз – локальные календарные сутки (время записи – локальная полночь)
+        for day, group in sorted(days.items()):
+            entry = period_entry(group, calendar.day_times[day])
+            if entry is not None:
+                daily_forecast.append(entry)
+
+        if budget is not None:
+            budget.release(work_size)
+            entries = len(hourly_forecast) + len(twice_daily_forecast) + len(daily_forecast)
+            budget.allocate(entries * (ENTRY_SIZE + ENTRY_ALLERGEN_SIZE * len(allergen_cols)))
+
+    return MergedData(series, hourly_forecast, twice_daily_forecast, daily=daily_forecast)
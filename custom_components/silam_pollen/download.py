@@ -0,0 +1,169 @@
+"""
+download.py
+
+Потоковая загрузка ответов SILAM.
+
+Запрос объявляет поддержку сжатия (Accept-Encoding: gzip, deflate); сессии интеграции
+не распаковывают ответы сами (auto_decompress=False), поэтому тело распаковывается здесь
+по частям по мере поступления и сразу передаётся потребителю (инкрементальному разборщику XML)
+без промежуточной строки со всем ответом. Размер сжатого и распакованного тела ограничен:
+при превышении загрузка прерывается ошибкой PayloadTooLarge.
+
+В режиме низкого потребления памяти тело читается и распаковывается частями меньшего размера,
+а часть тела, распакованная часть и состояние распаковщика учитываются в бюджете памяти
+обновления (streaming.MemoryBudget).
+"""
+
+import zlib
+import xml.etree.ElementTree as ET
+
+import aiohttp
+
+from .const import DEFAULT_MAX_RESPONSE_MB, DOWNLOAD_CHUNK_SIZE
+
+ACCEPT_ENCODING = "gzip, deflate"
+DEFAULT_MAX_RESPONSE_BYTES = DEFAULT_MAX_RESPONSE_MB * 1024 * 1024
+# Память распаковщика zlib: структура inflate (около 7 КБ) и окно 32 КБ
+DECOMPRESSOR_SIZE = 40 * 1024
+# Потоковый разбор XML (XMLPullParser): состояние разборщика (expat, TreeBuilder и незавершённые
+# элементы между частями) и элементы дерева и события одной части до их чтения – байт на байт XML
+# (измерено tracemalloc: 7–10)
+PARSER_SIZE = 32 * 1024
+PARSER_OVERHEAD = 10
+
+
+class PayloadTooLarge(Exception):
+    """Ответ больше допустимого размера."""
+
+
+class TransferStats:
+    """Объём одного ответа: байты по сети (compressed) и после распаковки (uncompressed)."""
+
+    __slots__ = ("encoding", "compressed", "uncompressed")
+
+    def __init__(self, encoding: str = "identity"):
+        self.encoding = encoding
+        self.compressed = 0
+        self.uncompressed = 0
+
+    def as_dict(self) -> dict:
+        return {"encoding": self.encoding, "compressed": self.compressed, "uncompressed": self.uncompressed}
+
+    def __repr__(self) -> str:
+        return f"{self.compressed} B {self.encoding} -> {self.uncompressed} B"
+
+
+def client_session():
+    """Сессия для запросов интеграции: сжатые ответы распаковываются потоково (async_stream)."""
+    return aiohttp.ClientSession(auto_decompress=False)
+
+
+def _decompressor(encoding: str, first: bytes):
+    """Распаковщик для Content-Encoding или None (тело не сжато)."""
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        # deflate обычно передаётся в обёртке zlib, но некоторые серверы отдают "сырой" поток
+        zlib_header = len(first) >= 2 and first[0] & 0x0F == 8 and (first[0] << 8 | first[1]) % 31 == 0
+        return zlib.decompressobj(zlib.MAX_WBITS if zlib_header else -zlib.MAX_WBITS)
+    if encoding in ("", "identity"):
+        return None
+    raise ValueError(f"Неподдерживаемое сжатие ответа: {encoding}")
+
+
+async def async_stream(response, consume, max_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+                       chunk_size: int = DOWNLOAD_CHUNK_SIZE, budget=None) -> TransferStats:
+    """
+    Читает тело ответа по частям, распаковывает его и передаёт распакованные части в consume(bytes).
+    Возвращает TransferStats; поднимает PayloadTooLarge, если сжатое или распакованное тело больше max_bytes.
+
+    :param chunk_size: наибольший размер части тела и распакованной части.
+    :param budget: бюджет памяти обновления (MemoryBudget) или None. Часть тела с остатком
+                   распаковки и распакованная часть учитываются, пока обрабатываются,
+                   состояние распаковщика – до конца загрузки.
+    """
+    encoding = response.headers.get("Content-Encoding", "identity").strip().lower()
+    stats = TransferStats(encoding)
+    length = response.headers.get("Content-Length")
+    if length is not None and length.isdigit() and int(length) > max_bytes:
+        raise PayloadTooLarge(f"Ответ {length} байт больше допустимых {max_bytes}")
+
+    decompressor = None
+    held = 0  # байты бюджета, учтённые до конца загрузки
+
+    def allocate(size: int) -> None:
+        if budget is not None:
+            budget.allocate(size)
+
+    def release(size: int) -> None:
+        if budget is not None:
+            budget.release(size)
+
+    def emit(data: bytes) -> None:
+        stats.uncompressed += len(data)
+        if stats.uncompressed > max_bytes:
+            raise PayloadTooLarge(f"Распакованный ответ больше допустимых {max_bytes} байт")
+        if data:
+            allocate(len(data))
+            try:
+                consume(data)
+            finally:
+                release(len(data))
+
+    try:
+        async for chunk in response.content.iter_chunked(chunk_size):
+            stats.compressed += len(chunk)
+            if stats.compressed > max_bytes:
+                raise PayloadTooLarge(f"Ответ больше допустимых {max_bytes} байт")
+            if decompressor is None:
+                decompressor = _decompressor(encoding, chunk) or False
+                if decompressor:
+                    allocate(DECOMPRESSOR_SIZE)
+                    held += DECOMPRESSOR_SIZE
+            if decompressor is False:
+                emit(chunk)
+                continue
+            # Распаковка идёт частями не больше chunk_size и ограничена остатком лимита:
+            # сильно сжатое тело не раскрывается в память целиком. Часть и её остаток
+            # (unconsumed_tail – копия) учитываются вместе.
+            allocate(2 * len(chunk))
+            try:
+                data = chunk
+                while data:
+                    emit(decompressor.decompress(data, min(max_bytes - stats.uncompressed + 1, chunk_size)))
+                    data = decompressor.unconsumed_tail
+            finally:
+                release(2 * len(chunk))
+        if decompressor:
+            emit(decompressor.flush())
+    finally:
+        release(held)
+    return stats
+
+
+async def async_read_xml(response, max_bytes: int = DEFAULT_MAX_RESPONSE_BYTES, keep_body: bool = False, parser=None,
+                         chunk_size: int = DOWNLOAD_CHUNK_SIZE, budget=None):
+    """
+    Разбирает XML-ответ по мере загрузки.
+    Возвращает (корень XML, TransferStats, распакованное тело в bytes, если keep_body, иначе None).
+    parser – разборщик с интерфейсом feed/close (по умолчанию ET.XMLParser); первым элементом
+    возвращается результат его close(), например ряд потокового разбора (streaming.py).
+    chunk_size и budget – как у async_stream.
+    """
+    parser = parser if parser is not None else ET.XMLParser()
+    chunks = [] if keep_body else None
+
+    def consume(data: bytes) -> None:
+        parser.feed(data)
+        if chunks is not None:
+            chunks.append(data)
+
+    stats = await async_stream(response, consume, max_bytes, chunk_size, budget)
+    return parser.close(), stats, b"".join(chunks) if chunks is not None else None
+
+
+async def async_read_body(response, max_bytes: int = DEFAULT_MAX_RESPONSE_BYTES):
+    """Распакованное тело ответа целиком (bytes) и TransferStats – для ответов, которые не разбираются."""
+    chunks = []
+    stats = await async_stream(response, chunks.append, max_bytes)
+    return b"".join(chunks), stats
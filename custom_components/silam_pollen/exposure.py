@@ -0,0 +1,235 @@
+"""
+exposure.py
+
+Индексы накопленной дозы (экспозиции) для SILAM Pollen.
+
+Каждая точка ряда считается постоянной на интервале до следующей точки
+(последняя – на интервале, равном предыдущему шагу), как и в thresholds.py.
+Для каждой переменной один раз за обновление строятся префиксные суммы дозы
+и покрытия данными, поэтому интеграл и среднее на произвольном интервале считаются
+за O(log n) (поиск границ на отсортированной оси времени). Разреженная таблица
+для максимума (O(1) на запрос) и таблицы для поиска окна с наименьшей дозой
+строятся по требованию – при первом запросе – и кэшируются до следующего обновления:
+обновление не тратит на них время и память, если экспозиция не запрашивается.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .records import epoch_to_utc_isoformat
+
+INF = float("inf")
+
+
+class SparseTable:
+    """Индекс наилучшего (минимального или максимального) значения на отрезке за O(1)."""
+
+    __slots__ = ("_values", "_levels", "_better")
+
+    def __init__(self, values, maximum: bool = False):
+        self._values = values
+        self._better = (lambda a, b: a > b) if maximum else (lambda a, b: a < b)
+        # Уровни – компактные массивы индексов
+        level = array("l", range(len(values)))
+        self._levels = [level]
+        width = 1
+        while 2 * width <= len(values):
+            previous = level
+            level = array("l", (
+                self._pick(previous[i], previous[i + width])
+                for i in range(len(previous) - width)
+            ))
+            self._levels.append(level)
+            width *= 2
+
+    def _pick(self, i: int, j: int) -> int:
+        return j if self._better(self._values[j], self._values[i]) else i
+
+    def query(self, lo: int, hi: int) -> int:
+        """Индекс наилучшего значения на отрезке [lo, hi] (включительно)."""
+        k = (hi - lo + 1).bit_length() - 1
+        level = self._levels[k]
+        return self._pick(level[lo], level[hi - (1 << k) + 1])
+
+
+class ExposureIndex:
+    """
+    Префиксные суммы одной переменной: доза (значение·секунды) и покрытие (секунды с данными).
+
+    Все запросы принимают секунды эпохи UTC; доза возвращается в единицах переменной·час.
+    """
+
+    __slots__ = ("times", "values", "end", "_dose", "_covered", "_max_table", "_windows")
+
+    def __init__(self, times, column):
+        self.times = times
+        self.values = column
+        length = len(times)
+        if length > 1:
+            last_span = times[-1] - times[-2]
+        else:
+            last_span = 3600
+        self.end = times[-1] + last_span if length else None
+        dose = array("d", [0.0])
+        covered = array("d", [0.0])
+        for i in range(length):
+            span = (times[i + 1] if i + 1 < length else self.end) - times[i]
+            value = column[i]
+            if value == value:
+                dose.append(dose[-1] + value * span)
+                covered.append(covered[-1] + span)
+            else:
+                dose.append(dose[-1])
+                covered.append(covered[-1])
+        self._dose = dose
+        self._covered = covered
+        self._max_table = None  # SparseTable максимума, строится при первом запросе
+        # {длительность окна (с): (значения окон, SparseTable минимума)}
+        self._windows = {}
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def _clamp(self, ts: float) -> float:
+        return min(max(ts, self.times[0]), self.end)
+
+    def _segment(self, ts: float) -> int:
+        """Номер интервала, содержащего момент ts (ts уже ограничен горизонтом)."""
+        return min(max(bisect_right(self.times, ts) - 1, 0), len(self.times) - 1)
+
+    def _cumulative(self, ts: float):
+        """Доза и покрытие от начала ряда до момента ts."""
+        ts = self._clamp(ts)
+        k = self._segment(ts)
+        offset = ts - self.times[k]
+        value = self.values[k]
+        if value == value:
+            return self._dose[k] + value * offset, self._covered[k] + offset
+        return self._dose[k], self._covered[k]
+
+    def bounds(self, start=None, end=None):
+        """Ограничивает интервал горизонтом ряда; возвращает (start, end) или None, если он пуст."""
+        if not len(self.times):
+            return None
+        start = self.times[0] if start is None else self._clamp(start)
+        end = self.end if end is None else self._clamp(end)
+        if end <= start:
+            return None
+        return start, end
+
+    def integral(self, start: float, end: float) -> float:
+        """Накопленная доза на интервале [start, end) в единицах переменной·час."""
+        dose_start, _ = self._cumulative(start)
+        dose_end, _ = self._cumulative(end)
+        return (dose_end - dose_start) / 3600
+
+    def covered_hours(self, start: float, end: float) -> float:
+        """Часы интервала, для которых есть данные."""
+        _, covered_start = self._cumulative(start)
+        _, covered_end = self._cumulative(end)
+        return (covered_end - covered_start) / 3600
+
+    def mean(self, start: float, end: float):
+        """Среднее значение по часам с данными или None."""
+        hours = self.covered_hours(start, end)
+        if hours <= 0:
+            return None
+        return self.integral(start, end) / hours
+
+    def maximum(self, start: float, end: float):
+        """Максимум на интервале [start, end): (значение, время точки) или (None, None)."""
+        lo = self._segment(self._clamp(start))
+        hi = max(bisect_left(self.times, self._clamp(end)) - 1, lo)
+        if self._max_table is None:
+            self._max_table = SparseTable(
+                array("d", (value if value == value else -INF for value in self.values)), maximum=True
+            )
+        best = self._max_table.query(lo, hi)
+        value = self.values[best]
+        if value != value:
+            return None, None
+        return value, self.times[best]
+
+    def _window_table(self, duration: int):
+        cached = self._windows.get(duration)
+        if cached is None:
+            sums = []
+            for ts in self.times:
+                if ts + duration > self.end:
+                    break
+                dose_start, covered_start = self._cumulative(ts)
+                dose_end, covered_end = self._cumulative(ts + duration)
+                # Окна с пропусками данных не рассматриваются
+                sums.append((dose_end - dose_start) / 3600 if covered_end - covered_start >= duration else INF)
+            cached = (sums, SparseTable(sums) if sums else None)
+            self._windows[duration] = cached
+        return cached
+
+    def lowest_window(self, start: float, end: float, hours: float):
+        """
+        Непрерывное окно длительностью hours с наименьшей дозой внутри [start, end].
+
+        Окна начинаются в точках ряда. Возвращает (начало, конец, доза) или None.
+        """
+        duration = int(hours * 3600)
+        if duration <= 0:
+            return None
+        sums, table = self._window_table(duration)
+        lo = bisect_left(self.times, start)
+        hi = min(bisect_right(self.times, end - duration), len(sums)) - 1
+        if table is None or lo > hi:
+            return None
+        best = table.query(lo, hi)
+        if sums[best] == INF:
+            return None
+        return self.times[best], self.times[best] + duration, sums[best]
+
+
+def build_exposure(series, previous: dict = None) -> dict:
+    """
+    Возвращает {переменная: ExposureIndex} для всех столбцов ряда.
+    Индексы прошлого обновления (previous) переиспользуются для столбцов, которые не изменились:
+    тот же массив значений на той же оси времени (фид, не загружавшийся в этом обновлении).
+    """
+    if series is None or not len(series):
+        return {}
+    previous = previous or {}
+    exposure = {}
+    for var, column in series.values.items():
+        index = previous.get(var)
+        if index is None or index.values is not column or index.times != series.times:
+            index = ExposureIndex(series.times, column)
+        exposure[var] = index
+    return exposure
+
+
+def exposure_summary(index: ExposureIndex, units=None, start=None, end=None, window_hours=None):
+    """
+    Формирует ответ службы: доза, среднее и максимум на интервале и, если задана
+    длительность window_hours, окно с наименьшей дозой. None – интервал вне горизонта.
+    """
+    bounds = index.bounds(start, end)
+    if bounds is None:
+        return None
+    start, end = bounds
+    peak, peak_time = index.maximum(start, end)
+    summary = {
+        "start": epoch_to_utc_isoformat(start),
+        "end": epoch_to_utc_isoformat(end),
+        "units": units,
+        "integral": index.integral(start, end),
+        "integral_units": f"{units}·h" if units else None,
+        "covered_hours": index.covered_hours(start, end),
+        "mean": index.mean(start, end),
+        "max": peak,
+        "max_time": epoch_to_utc_isoformat(peak_time) if peak_time is not None else None,
+    }
+    if window_hours:
+        window = index.lowest_window(start, end, window_hours)
+        summary["lowest_window"] = {
+            "start": epoch_to_utc_isoformat(window[0]),
+            "end": epoch_to_utc_isoformat(window[1]),
+            "integral": window[2],
+            "mean": window[2] / window_hours,
+        } if window else None
+    return summary
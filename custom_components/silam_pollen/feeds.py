@@ -0,0 +1,49 @@
+"""
+feeds.py
+
+Источники данных (фиды) SILAM Pollen с независимым расписанием обновления.
+
+Фид index (POLI, POLISRC, temp_2m) и фид main (выбранные аллергены, в том числе
+уровни вертикального профиля) загружаются отдельными запросами. Каждый фид хранит
+разобранный ряд последнего ответа и обновляется, только когда истёк его интервал;
+объединённые данные координатора собираются из рядов фидов (data_processing.combine_series).
+
+Если обновление фида не удалось, его ряд используется дальше, пока возраст ответа
+не превысил бюджет устаревания – FEED_STALENESS_INTERVALS интервалов фида.
+"""
+
+from datetime import timedelta
+
+from .const import FEED_STALENESS_INTERVALS
+
+
+class Feed:
+    """Кеш и расписание одного фида."""
+
+    __slots__ = ("name", "interval", "series", "fetched")
+
+    def __init__(self, name: str, interval: timedelta):
+        self.name = name
+        self.interval = interval
+        self.series = None  # ForecastSeries последнего ответа или None
+        self.fetched = None  # monotonic-время начала загрузки последнего ответа
+
+    def age(self, now: float):
+        """Возраст кешированного ответа (секунды) или None, если ответа нет."""
+        return None if self.fetched is None else now - self.fetched
+
+    def due(self, now: float) -> bool:
+        """Нужна ли загрузка: ответа нет или истёк интервал фида."""
+        return self.series is None or self.age(now) >= self.interval.total_seconds()
+
+    def usable(self, now: float) -> bool:
+        """Можно ли использовать кешированный ответ при неудачном обновлении (бюджет устаревания)."""
+        return self.series is not None and self.age(now) <= self.interval.total_seconds() * FEED_STALENESS_INTERVALS
+
+    def store(self, series, started: float) -> None:
+        self.series = series
+        self.fetched = started
+
+    def clear(self) -> None:
+        self.series = None
+        self.fetched = None
@@ -0,0 +1,120 @@
+"""
+hedging.py
+
+Хеджирование запросов между версиями наборов данных SILAM.
+
+Если основной набор (base_url записи) не ответил за наблюдаемый 95-й перцентиль
+своей задержки, тот же логический запрос отправляется в альтернативный набор,
+покрывающий точку (ALTERNATE_DATASETS); используется первый корректный ответ,
+второй запрос отменяется. Ошибка основного набора сразу переключает запрос
+на альтернативный (переключение при отказе).
+"""
+
+import asyncio
+import re
+from collections import deque
+
+from .const import (
+    ALTERNATE_DATASETS,
+    HEDGE_DEFAULT_DELAY,
+    HEDGE_LATENCY_SAMPLES,
+    HEDGE_MIN_DELAY,
+    HEDGE_MIN_SAMPLES,
+)
+
+
+class LatencyTracker:
+    """
+    Скользящая выборка задержек ответов одного набора данных.
+
+    В выборку попадают и неудачные, и отменённые запросы. Для основного запроса, проигравшего
+    хеджирование, записывается время до отмены (цензурированная выборка: настоящая задержка
+    не меньше), иначе медленные ответы выпадали бы из выборки и p95 смещался бы вниз.
+    """
+
+    __slots__ = ("_samples",)
+
+    def __init__(self, size: int = HEDGE_LATENCY_SAMPLES):
+        self._samples = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float):
+        """Перцентиль выборки (ближайший ранг) или None, если выборка пуста."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def hedge_delay(self) -> float:
+        """Задержка перед хеджирующим запросом: p95 или HEDGE_DEFAULT_DELAY, пока выборка мала."""
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(self.percentile(0.95), HEDGE_MIN_DELAY)
+
+
+def source_name(base_url: str) -> str:
+    """Короткое имя набора для атрибутов (v6_0, v5_9_1) или сам URL."""
+    match = re.search(r"v(\d+(?:_\d+)+)", base_url or "")
+    return f"v{match.group(1)}" if match else base_url
+
+
+def alternate_url(url: str, base_url: str, capabilities=None):
+    """
+    Тот же запрос к альтернативному набору: базовый URL заменяется, переменные переводятся
+    через таблицу соответствия версий. Возвращает (альтернативный базовый URL, URL запроса)
+    или None, если альтернативы нет или какая-либо переменная в ней недоступна: её нет
+    в описании альтернативного набора, а без описания – в таблице соответствия.
+    """
+    alternate = ALTERNATE_DATASETS.get(base_url)
+    if alternate is None or not url.startswith(base_url + "?"):
+        return None
+    alternate_base, var_mapping = alternate
+    params = []
+    for param in url[len(base_url) + 1:].split("&"):
+        name, _, value = param.partition("=")
+        if name == "var":
+            known = capabilities is not None and capabilities.variables
+            if value in var_mapping:
+                value = var_mapping[value]
+            elif not known:
+                return None
+            if known and value not in capabilities.variables:
+                return None
+        params.append(f"{name}={value}")
+    return alternate_base, alternate_base + "?" + "&".join(params)
+
+
+async def async_hedged(primary, alternate, delay: float):
+    """
+    Выполняет primary(); если он не завершился за delay секунд или завершился ошибкой,
+    запускает alternate() и возвращает первый успешный результат: (результат, True – ответил alternate).
+    Проигравший запрос отменяется. Если оба запроса неудачны, поднимается ошибка основного.
+    """
+    primary_task = asyncio.ensure_future(primary())
+    tasks = {primary_task}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if primary_task in done and primary_task.exception() is None:
+            return primary_task.result(), False
+        alternate_task = asyncio.ensure_future(alternate())
+        tasks.add(alternate_task)
+        error = primary_task.exception() if primary_task in done else None
+        pending = tasks - done
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Основной запрос проверяется первым, если оба завершились одновременно
+            for task in sorted(done, key=lambda task: task is alternate_task):
+                if task.exception() is None:
+                    return task.result(), task is alternate_task
+                if error is None or task is primary_task:
+                    error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
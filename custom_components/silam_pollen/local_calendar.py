@@ -0,0 +1,103 @@
+"""
+local_calendar.py
+
+Календарные интервалы прогнозов SILAM Pollen в локальном времени.
+
+Прогноз дважды в день делится на половины суток: день – с 06:00 до 18:00 (время записи 12:00),
+ночь – с 18:00 до 06:00 следующих суток (время записи – полночь между ними). Суточный прогноз
+делится на календарные сутки (время записи – локальная полночь).
+
+Границы интервалов вычисляются один раз для часового пояса и диапазона дат (с учётом
+переходов на летнее время) и кешируются; отнесение всех точек ряда к интервалам выполняется
+одним проходом по отсортированной оси времени.
+"""
+
+from array import array
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+
+# Начала половин суток (локальный час) и признак дня
+HALF_DAY_STARTS = ((6, True), (18, False))
+
+
+def _epoch(day, hour: int, time_zone) -> float:
+    """Момент локального времени day hour:00 (None – часовой пояс процесса)."""
+    return datetime.combine(day, time(hour), tzinfo=time_zone).timestamp()
+
+
+class LocalCalendar:
+    """Границы локальных половин суток и суток для часового пояса на диапазоне дат."""
+
+    __slots__ = ("time_zone", "first_day", "last_day", "bounds", "half_ids", "day_ids",
+                 "half_times", "half_daytime", "day_times")
+
+    def __init__(self, time_zone, first_day, last_day):
+        self.time_zone = time_zone
+        self.first_day = first_day
+        self.last_day = last_day
+        # Отрезки между соседними границами (00:00, 06:00, 18:00 каждых суток) и их интервалы
+        self.bounds = array("d")  # начала отрезков
+        self.half_ids = array("l")  # номер половины суток отрезка
+        self.day_ids = array("l")  # номер суток отрезка
+        self.half_times = array("q")  # время записи половины суток
+        self.half_daytime = []  # признак дня половины суток
+        self.day_times = array("q")  # время записи суток (локальная полночь)
+
+        # Ночь перед first_day начинается в 18:00 предыдущих суток
+        self.half_times.append(int(_epoch(first_day, 0, time_zone)))
+        self.half_daytime.append(False)
+        day = first_day
+        while day <= last_day:
+            midnight = _epoch(day, 0, time_zone)
+            day_id = len(self.day_times)
+            self.day_times.append(int(midnight))
+            self.bounds.append(midnight)
+            self.half_ids.append(len(self.half_times) - 1)
+            self.day_ids.append(day_id)
+            next_day = day + timedelta(days=1)
+            for hour, daytime in HALF_DAY_STARTS:
+                self.bounds.append(_epoch(day, hour, time_zone))
+                self.half_ids.append(len(self.half_times))
+                self.day_ids.append(day_id)
+                self.half_times.append(int(_epoch(day if daytime else next_day, 12 if daytime else 0, time_zone)))
+                self.half_daytime.append(daytime)
+            day = next_day
+        self.bounds.append(_epoch(day, 0, time_zone))  # конец диапазона
+
+    def covers(self, first_ts: float, last_ts: float) -> bool:
+        return self.bounds[0] <= first_ts and last_ts < self.bounds[-1]
+
+    def assign(self, times, start: int, stop: int):
+        """
+        Номера половин суток и суток для точек times[start:stop] (times отсортированы,
+        все точки в пределах диапазона). Один проход по оси времени и границам.
+        """
+        halves = array("l")
+        days = array("l")
+        bounds = self.bounds
+        segment = 0
+        last_segment = len(bounds) - 2
+        for i in range(start, stop):
+            ts = times[i]
+            while segment < last_segment and bounds[segment + 1] <= ts:
+                segment += 1
+            halves.append(self.half_ids[segment])
+            days.append(self.day_ids[segment])
+        return halves, days
+
+
+@lru_cache(maxsize=16)
+def _cached_calendar(time_zone, first_day, last_day) -> LocalCalendar:
+    return LocalCalendar(time_zone, first_day, last_day)
+
+
+def local_calendar(time_zone, first_ts: float, last_ts: float) -> LocalCalendar:
+    """
+    Календарь, покрывающий моменты first_ts..last_ts. Для заданного часового пояса
+    календарь кешируется по диапазону дат; для часового пояса процесса (None) строится заново.
+    """
+    first_day = datetime.fromtimestamp(first_ts, time_zone).date()
+    last_day = datetime.fromtimestamp(last_ts, time_zone).date()
+    if time_zone is None:
+        return LocalCalendar(None, first_day, last_day)
+    return _cached_calendar(time_zone, first_day, last_day)
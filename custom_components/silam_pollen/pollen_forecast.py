@@ -8,45 +8,31 @@ Converts temperature from Kelvin to Celsius.
 """
 
 import logging
-import aiohttp
-import async_timeout
-from datetime import datetime, timezone
 from homeassistant.components.weather import WeatherEntity
+from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 try:
-    from homeassistant.components.weather.const import SUPPORT_FORECAST_HOURLY, SUPPORT_FORECAST_TWICE_DAILY
+    from homeassistant.components.weather.const import (
+        SUPPORT_FORECAST_DAILY,
+        SUPPORT_FORECAST_HOURLY,
+        SUPPORT_FORECAST_TWICE_DAILY,
+    )
 except ImportError:
+    SUPPORT_FORECAST_DAILY = 1
     SUPPORT_FORECAST_HOURLY = 2
     SUPPORT_FORECAST_TWICE_DAILY = 4
 from .const import DOMAIN, RESPONSIBLE_MAPPING
 
 _LOGGER = logging.getLogger(__name__)
 
-async def fetch_pollen_data(latitude, longitude, base_url):
-    """
-    Fetch pollen data from the SILAM API using the provided latitude and longitude. [org ru]
-    """
-    url = f"{base_url}?var=POLI&latitude={latitude}&longitude={longitude}&time=present&accept=xml"
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with async_timeout.timeout(10):
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        return await response.text()
-                    else:
-                        _LOGGER.error("Failed to fetch data: %s", response.status)
-                        return None
-    except Exception as e:
-        _LOGGER.error("Error fetching pollen data: %s", str(e))
-        return None
-
-
 class PollenForecastSensor(CoordinatorEntity, WeatherEntity):
     """Pollen level forecast sensor for SILAM Pollen integration."""
 
-    # Only hourly and twice-daily forecasts are supported
-    _attr_supported_features = SUPPORT_FORECAST_HOURLY | SUPPORT_FORECAST_TWICE_DAILY
+    # Hourly, twice-daily and daily forecasts are derived from the same data store
+    _attr_supported_features = SUPPORT_FORECAST_DAILY | SUPPORT_FORECAST_HOURLY | SUPPORT_FORECAST_TWICE_DAILY
     _attr_native_temperature_unit = "°C"
+    # The primary allergen is derived from the "now" record and has no value in per-state history
+    _unrecorded_attributes = frozenset({"responsible_elevated"})
 
     def __init__(self, coordinator, entry_id: str, base_device_name: str):
         """
@@ -60,14 +46,14 @@ class PollenForecastSensor(CoordinatorEntity, WeatherEntity):
         WeatherEntity.__init__(self)
         self._entry_id = entry_id
         self._base_device_name = base_device_name
-        # Cached hourly forecast and twice-daily forecast,
+        # Cached hourly, twice-daily and daily forecasts,
         # which are already aggregated and saved in merged_data
         self._forecast_hourly = []
         self._forecast_twice_daily = []
+        self._forecast_daily = []
         self._extra_attributes = {}
         self._attr_translation_key = "index_polen_weather"
         self._attr_has_entity_name = True
-        from homeassistant.helpers.device_registry import DeviceInfo
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, self._entry_id)},
         )
@@ -108,7 +94,7 @@ class PollenForecastSensor(CoordinatorEntity, WeatherEntity):
         from the first element of the hourly forecast.
         """
         if self._forecast_hourly:
-            return self._forecast_hourly[0].get("condition")
+            return self._forecast_hourly[0].condition
         return None
 
     async def _handle_coordinator_update(self) -> None:
@@ -118,7 +104,8 @@ class PollenForecastSensor(CoordinatorEntity, WeatherEntity):
         From the merged dictionary:
           - The "hourly_forecast" section is used for hourly forecast data.
           - The "twice_daily_forecast" section is used for twice-daily forecast data.
-          - Additionally, the "now" section is used for attributes.
+          - The "daily_forecast" section is used for daily forecast data.
+          - Additionally, the "now" record is used for attributes.
         """
         _LOGGER.debug("PollenForecastSensor: calling _handle_coordinator_update")
         merged = self.coordinator.merged_data
@@ -127,31 +114,35 @@ class PollenForecastSensor(CoordinatorEntity, WeatherEntity):
             return
 
         # Log the content for debugging
-        _LOGGER.debug("Merged data content: now=%s, hourly_forecast=%s, twice_daily_forecast=%s",
-                      merged.get("now"), merged.get("hourly_forecast"), merged.get("twice_daily_forecast"))
+        _LOGGER.debug("Merged data content: %s", merged)
 
-        # Update hourly forecast
-        self._forecast_hourly = merged.get("hourly_forecast", [])
+        # Update hourly forecast (compact ForecastEntry records, converted to dicts on request)
+        self._forecast_hourly = merged.hourly
         # Update twice-daily forecast
-        self._forecast_twice_daily = merged.get("twice_daily_forecast", [])
+        self._forecast_twice_daily = merged.twice_daily
+        # Update daily forecast
+        self._forecast_daily = merged.daily
 
-        # Update additional attributes from the "now" section, if present
-        now_entry = merged.get("now", {})
-        if now_entry:
-            polisrc_val = now_entry["data"].get("POLISRC", {}).get("value")
+        # Update additional attributes from the "now" record, if present
+        if merged.now_time is not None:
+            polisrc_val = merged.now_value("POLISRC")
             try:
-                re_value = int(float(polisrc_val)) if polisrc_val is not None else None
+                re_value = int(polisrc_val) if polisrc_val is not None else None
             except (ValueError, TypeError):
                 re_value = None
             self._extra_attributes["responsible_elevated"] = RESPONSIBLE_MAPPING.get(re_value, "unknown")
-            # Additional attributes from now_entry can be added here
+            # Additional attributes from the "now" record can be added here
 
         self.async_write_ha_state()
 
     async def async_forecast_hourly(self) -> list[dict] | None:
         """Returns the hourly forecast."""
-        return self._forecast_hourly
+        return [entry.as_dict() for entry in self._forecast_hourly]
+
+    async def async_forecast_daily(self) -> list[dict] | None:
+        """Returns the daily forecast."""
+        return [entry.as_dict() for entry in self._forecast_daily]
 
     async def async_forecast_twice_daily(self) -> list[dict] | None:
         """Returns the twice-daily forecast."""
-        return self._forecast_twice_daily
+        return [entry.as_dict() for entry in self._forecast_twice_daily]
@@ -0,0 +1,40 @@
+"""
+prefetch.py
+
+Предварительно загруженные ответы SILAM для быстрого первого обновления новых записей.
+
+Пакетная загрузка (tools/prefetch.py) сохраняет ответы для списка точек в формате архива
+cassette.py: <config>/silam_pollen/prefetch/<широта>,<долгота>/cassette-*.jsonl. При первом
+обновлении записи координатор читает архив своей точки и использует записанный ответ вместо
+запроса, если URL совпадает (те же координаты, переменные, глубина прогноза и высота) и ответ
+моложе интервала обновления фида. Следующие обновления выполняются как обычно.
+"""
+
+from .cassette import ArchiveReader
+from .const import DOMAIN
+
+
+def location_key(latitude, longitude) -> str:
+    """Имя каталога точки: координаты с точностью 4 знака (около 10 м)."""
+    return f"{float(latitude):.4f},{float(longitude):.4f}"
+
+
+def prefetch_path(hass, latitude, longitude) -> str:
+    """Каталог предварительно загруженных ответов точки в конфигурации Home Assistant."""
+    return hass.config.path(DOMAIN, "prefetch", location_key(latitude, longitude))
+
+
+def load_prefetched(path: str) -> dict:
+    """
+    Последние успешные ответы архива точки по URL: {URL: (время записи, тело в формате архива)}.
+    Блокирующее чтение – вызывать в executor.
+    """
+    responses = {}
+    for records in ArchiveReader(path).records.values():
+        for record in records:
+            if record["status"] != 200:
+                continue
+            previous = responses.get(record["url"])
+            if previous is None or record["time"] >= previous[0]:
+                responses[record["url"]] = (record["time"], record["body"])
+    return responses
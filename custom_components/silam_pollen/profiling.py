@@ -0,0 +1,161 @@
+"""
+profiling.py
+
+Профилирование циклов обновления координаторов по запросу (служба profile).
+
+Сессия профилирования включается для следующих N циклов обновления выбранных записей.
+Цикл начинается в _async_update_data (загрузка, разбор и объединение ответов, прогнозы)
+и заканчивается после уведомления слушателей, когда выполнены созданные ими задачи записи
+состояний сущностей. Используется детерминированный профилировщик cProfile; он включён,
+пока идёт хотя бы один цикл сессии, и учитывает весь код цикла событий за это время.
+
+Результат сохраняется в <config>/silam_pollen/profiles/profile-<время>.prof (формат pstats:
+snakeviz, tuna, flameprof и другие средства строят по нему flame graph), сводка самых
+затратных функций возвращается в ответе службы.
+"""
+
+import asyncio
+import cProfile
+import logging
+import os
+import pstats
+import time
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Одновременно активна только одна сессия: cProfile не допускает нескольких профилировщиков
+_active_session = None
+
+
+def profiles_path(hass) -> str:
+    """Каталог файлов профилей в конфигурации Home Assistant."""
+    return hass.config.path(DOMAIN, "profiles")
+
+
+def hotspots(stats: pstats.Stats, top: int) -> list:
+    """Функции с наибольшим собственным временем: [{function, file, line, calls, self_ms, total_ms}]."""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    return [
+        {
+            "function": function,
+            "file": filename,
+            "line": line,
+            "calls": calls,
+            "self_ms": round(self_time * 1000, 3),
+            "total_ms": round(total_time * 1000, 3),
+        }
+        for (filename, line, function), (_, calls, self_time, total_time, _callers) in rows
+    ]
+
+
+class ProfileSession:
+    """Профиль следующих cycles циклов обновления координаторов {entry_id: координатор}."""
+
+    def __init__(self, hass, coordinators: dict, cycles: int, top: int):
+        self._hass = hass
+        self._coordinators = dict(coordinators)
+        self._remaining = {entry_id: cycles for entry_id in coordinators}
+        self._active = set()  # записи с незавершённым циклом
+        self._profile = cProfile.Profile()
+        self._enabled = False
+        self._elapsed = 0.0
+        self._enabled_at = None
+        self.cycles = cycles
+        self.top = top
+        self.started = time.time()
+        self.path = os.path.join(profiles_path(hass), time.strftime("profile-%Y%m%d-%H%M%S.prof"))
+        self.result = hass.loop.create_future()
+
+    def arm(self) -> None:
+        """Подключает сессию к координаторам; поднимает RuntimeError, если уже идёт другая сессия."""
+        global _active_session
+        if _active_session is not None:
+            raise RuntimeError(f"Профилирование уже выполняется ({_active_session.path})")
+        _active_session = self
+        for coordinator in self._coordinators.values():
+            coordinator.profiler = self
+        _LOGGER.info("Профилирование %s циклов обновления: %s", self.cycles, sorted(self._coordinators))
+
+    def cycle_started(self, entry_id) -> None:
+        """Начало цикла обновления записи (_async_update_data)."""
+        if entry_id not in self._remaining:
+            return
+        self._active.add(entry_id)
+        if not self._enabled:
+            try:
+                self._profile.enable()
+            except ValueError as err:  # профилировщик уже включён вне интеграции
+                _LOGGER.warning("Не удалось включить профилировщик: %s", err)
+                return
+            self._enabled = True
+            self._enabled_at = time.perf_counter()
+
+    def cycle_notified(self, entry_id) -> None:
+        """Слушатели уведомлены: цикл завершается после задач, которые они создали."""
+        if entry_id in self._active:
+            self._hass.async_create_task(self._async_end_cycle(entry_id))
+
+    async def _async_end_cycle(self, entry_id) -> None:
+        # Задачи записи состояний созданы раньше этой задачи и выполняются до неё
+        await asyncio.sleep(0)
+        self._active.discard(entry_id)
+        self._remaining[entry_id] -= 1
+        if not self._remaining[entry_id]:
+            del self._remaining[entry_id]
+            self._coordinators[entry_id].profiler = None
+        if not self._active:
+            self._disable()
+        if not self._remaining:
+            await self._async_finish()
+
+    def _disable(self) -> None:
+        if self._enabled:
+            self._profile.disable()
+            self._enabled = False
+            self._elapsed += time.perf_counter() - self._enabled_at
+
+    def cancel(self) -> None:
+        """Отключает сессию без сохранения профиля (выгрузка записи, ошибка службы)."""
+        global _active_session
+        self._disable()
+        for coordinator in self._coordinators.values():
+            if coordinator.profiler is self:
+                coordinator.profiler = None
+        if _active_session is self:
+            _active_session = None
+        if not self.result.done():
+            self.result.cancel()
+
+    def _write(self) -> dict:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._profile.dump_stats(self.path)
+        stats = pstats.Stats(self._profile)
+        return {
+            "profile": self.path,
+            "entries": sorted(self._coordinators),
+            "cycles": self.cycles,
+            "profiled_ms": round(self._elapsed * 1000, 3),
+            "total_calls": stats.total_calls,
+            "hotspots": hotspots(stats, self.top),
+        }
+
+    async def _async_finish(self) -> None:
+        global _active_session
+        try:
+            summary = await self._hass.async_add_executor_job(self._write)
+        except Exception as err:
+            _LOGGER.error("Не удалось сохранить профиль %s: %s", self.path, err)
+            if not self.result.done():
+                self.result.set_exception(err)
+        else:
+            _LOGGER.info(
+                "Профиль сохранён: %s (%s мс, самые затратные функции: %s)", self.path, summary["profiled_ms"],
+                ", ".join(f"{row['function']} {row['self_ms']} мс" for row in summary["hotspots"][:5]),
+            )
+            if not self.result.done():
+                self.result.set_result(summary)
+        finally:
+            if _active_session is self:
+                _active_session = None
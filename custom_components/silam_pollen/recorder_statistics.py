@@ -0,0 +1,139 @@
+"""
+recorder_statistics.py
+
+Публикация данных SILAM Pollen во внешние долгосрочные статистики recorder.
+
+Вместо истории, накапливаемой из каждой записи состояния сенсоров, координатор
+после каждого обновления одним пакетом на переменную импортирует:
+  - наблюдаемое значение записи "now" (статистика <entry_id>_<переменная>);
+  - при включённой опции – весь прогнозный ряд (статистика <entry_id>_<переменная>_forecast).
+Точки, уже отправленные с тем же значением, повторно не импортируются.
+"""
+
+import logging
+import re
+from datetime import datetime, timezone
+
+from homeassistant.core import callback
+
+from .capabilities import allergen_label
+from .const import DOMAIN, URL_VAR_MAPPING
+
+_LOGGER = logging.getLogger(__name__)
+
+# Ограничение числа запомненных временных меток на одну статистику
+MAX_TRACKED_POINTS = 512
+
+
+def _statistic_id(entry_id: str, suffix: str) -> str:
+    """Формирует идентификатор внешней статистики вида silam_pollen:<entry_id>_<suffix>."""
+    object_id = re.sub(r"[^0-9a-z]+", "_", f"{entry_id}_{suffix}".lower()).strip("_")
+    return f"{DOMAIN}:{object_id}"
+
+
+class StatisticsPublisher:
+    """Формирует и импортирует пакеты внешних статистик для одного координатора."""
+
+    def __init__(self, hass, entry_id: str, device_name: str, forecast_statistics: bool = False):
+        self.hass = hass
+        self._entry_id = entry_id
+        self._device_name = device_name
+        self.forecast_statistics = forecast_statistics
+        # {statistic_id: {секунды эпохи: значение}} – уже отправленные точки
+        self._sent = {}
+
+    def _variables(self, var_list):
+        """Возвращает пары (имя переменной SILAM, суффикс статистики, отображаемое имя)."""
+        variables = [("POLI", "index", "index")]
+        for allergen in var_list or []:
+            # Для аллергенов из описания набора суффикс – имя таксона в нижнем регистре
+            name = allergen_label(allergen)
+            variables.append((URL_VAR_MAPPING.get(allergen, allergen), name, name))
+        return variables
+
+    def _new_points(self, statistic_id: str, points):
+        """Отбрасывает точки, уже импортированные с тем же значением."""
+        sent = self._sent.setdefault(statistic_id, {})
+        fresh = [(ts, value) for ts, value in points if sent.get(ts) != value]
+        for ts, value in fresh:
+            sent[ts] = value
+        if len(sent) > MAX_TRACKED_POINTS:
+            for ts in sorted(sent)[:len(sent) - MAX_TRACKED_POINTS]:
+                del sent[ts]
+        return fresh
+
+    @callback
+    def async_publish(self, merged, var_list) -> None:
+        """Импортирует наблюдаемые и (опционально) прогнозные значения из MergedData."""
+        if not merged or merged.now_time is None:
+            return
+        if "recorder" not in self.hass.config.components:
+            return
+        try:
+            from homeassistant.components.recorder.statistics import async_add_external_statistics
+        except ImportError:
+            _LOGGER.debug("Recorder недоступен, долгосрочные статистики не публикуются")
+            return
+
+        series = merged.series
+        for var, suffix, name in self._variables(var_list):
+            if var not in series.values:
+                continue
+            units = series.units.get(var) or None
+
+            observed = merged.now_value(var)
+            if observed is not None:
+                self._import(
+                    async_add_external_statistics,
+                    _statistic_id(self._entry_id, suffix),
+                    f"{self._device_name} {name}",
+                    units,
+                    [(merged.now_time, observed)],
+                )
+
+            if self.forecast_statistics:
+                column = series.values[var]
+                points = [
+                    (ts, column[i])
+                    for i, ts in enumerate(series.times)
+                    if ts > merged.now_time and column[i] == column[i]
+                ]
+                self._import(
+                    async_add_external_statistics,
+                    _statistic_id(self._entry_id, f"{suffix}_forecast"),
+                    f"{self._device_name} {name} forecast",
+                    units,
+                    points,
+                )
+
+    def _import(self, add_statistics, statistic_id: str, name: str, units, points) -> None:
+        points = self._new_points(statistic_id, points)
+        if not points:
+            return
+        metadata = {
+            "source": DOMAIN,
+            "statistic_id": statistic_id,
+            "name": name,
+            "unit_of_measurement": units,
+            "has_mean": True,
+            "has_sum": False,
+        }
+        try:
+            from homeassistant.components.recorder.models import StatisticMeanType
+        except ImportError:
+            pass
+        else:
+            metadata["mean_type"] = StatisticMeanType.ARITHMETIC
+            # Для концентрации пыльцы и индекса нет конвертера единиц
+            metadata["unit_class"] = None
+        statistics = [
+            {
+                "start": datetime.fromtimestamp(ts - ts % 3600, timezone.utc),
+                "mean": value,
+                "min": value,
+                "max": value,
+            }
+            for ts, value in points
+        ]
+        _LOGGER.debug("Импорт %s точек в статистику %s", len(statistics), statistic_id)
+        add_statistics(self.hass, metadata, statistics)
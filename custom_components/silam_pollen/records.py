@@ -0,0 +1,458 @@
+"""
+records.py
+
+Компактные типизированные записи для объединённых данных SILAM Pollen.
+
+Станция хранится один раз на ответ, временные метки – целые секунды эпохи (UTC),
+значения – массивы float по каждой переменной (NaN означает отсутствие значения),
+единицы измерения интернированы. Исходный текст значения хранится отдельно только тогда,
+когда float его не воспроизводит (пустые, некорректные и неканонические записи вида "12.3000"),
+поэтому запись "now" совпадает с исходным XML. MergedData сохраняет словарный интерфейс прежнего
+формата {"now": ..., "hourly_forecast": [...], "twice_daily_forecast": [...]}
+(дополненного ключом "daily_forecast"), поэтому ответы службы manual_update
+и прогнозы погодной сущности сохраняют прежнюю структуру.
+"""
+
+import math
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+NAN = float("nan")
+
+
+def intern_str(value):
+    """Интернирует строку (None и прочие значения возвращаются как есть)."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def parse_epoch(date_str: str) -> int:
+    """Преобразует дату SILAM вида 2025-04-10T12:00:00Z в секунды эпохи UTC."""
+    try:
+        dt = datetime.fromisoformat(date_str)
+    except ValueError:  # Python < 3.11 не принимает завершающую "Z"
+        dt = datetime.fromisoformat(date_str.rstrip("Z"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def epoch_to_iso(ts: int) -> str:
+    """Возвращает дату в исходном формате SILAM (с завершающей "Z")."""
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def epoch_to_utc_isoformat(ts: int) -> str:
+    """Возвращает дату в формате isoformat() с явным смещением +00:00."""
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def to_float(text) -> float:
+    """Преобразует текстовое значение в float, возвращая NaN для пустых и некорректных значений."""
+    if text is None:
+        return NAN
+    try:
+        return float(text)
+    except (ValueError, TypeError):
+        return NAN
+
+
+def format_raw(value: float):
+    """Возвращает строковое представление значения (None для NaN), как в исходном XML."""
+    if value != value:
+        return None
+    return repr(value)
+
+
+# Текст значения в ForecastSeries.texts для пустого элемента <data/> (в записи "now" – None)
+BLANK = ""
+
+
+def raw_text(text, value: float):
+    """
+    Исходный текст значения, если format_raw(value) его не воспроизводит, иначе None.
+    Пустой элемент <data/> сохраняется как BLANK (переменная есть, значения нет).
+    """
+    if text is None:
+        return BLANK
+    if value == value and repr(value) == text:
+        return None
+    return text
+
+
+class StationInfo:
+    """Атрибуты станции, хранимые один раз на ответ."""
+
+    __slots__ = ("name", "latitude", "longitude", "altitude")
+
+    def __init__(self, name=None, latitude=None, longitude=None, altitude=None):
+        self.name = intern_str(name)
+        self.latitude = intern_str(latitude)
+        self.longitude = intern_str(longitude)
+        self.altitude = intern_str(altitude)
+
+    @classmethod
+    def from_element(cls, elem):
+        """Создаёт StationInfo из XML-элемента <station>."""
+        return cls(
+            elem.get("name"),
+            elem.get("latitude"),
+            elem.get("longitude"),
+            elem.get("altitude"),
+        )
+
+    def get(self, key, default=None):
+        """Словарный доступ к атрибуту станции."""
+        if key in self.__slots__:
+            return getattr(self, key)
+        return default
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "altitude": self.altitude,
+        }
+
+
+class ForecastSeries:
+    """
+    Колоночное хранилище временного ряда одного обновления.
+
+    times  – array('q') с секундами эпохи, отсортированными по возрастанию;
+    values – {переменная: array('d')} одинаковой с times длины;
+    units  – {переменная: интернированная строка единиц измерения};
+    texts  – {переменная: {секунды эпохи: исходный текст}} для значений, которые format_raw
+             не воспроизводит (см. raw_text). NaN без текста означает, что переменной
+             в этой точке ответа не было.
+    """
+
+    __slots__ = ("station", "times", "values", "units", "texts")
+
+    def __init__(self, station=None):
+        self.station = station
+        self.times = array("q")
+        self.values = {}
+        self.units = {}
+        self.texts = {}
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def variables(self):
+        return self.values.keys()
+
+    def add_column(self, var: str, column, units=None, texts=None) -> None:
+        """
+        Добавляет столбец значений переменной (длина должна совпадать с times).
+        texts – исходные тексты значений {секунды эпохи: текст} (см. raw_text).
+        """
+        var = intern_str(var)
+        self.values[var] = column if isinstance(column, array) else array("d", column)
+        self.units[var] = intern_str(units)
+        if texts:
+            self.texts[var] = texts
+        else:
+            self.texts.pop(var, None)
+
+    def remove_column(self, var: str) -> None:
+        """Удаляет столбец переменной (если он есть)."""
+        self.values.pop(var, None)
+        self.units.pop(var, None)
+        self.texts.pop(var, None)
+
+    def has_value(self, var: str, index: int) -> bool:
+        """Была ли переменная в ответе в точке index (в том числе с пустым или некорректным значением)."""
+        value = self.values[var][index]
+        if value == value:
+            return True
+        texts = self.texts.get(var)
+        return texts is not None and self.times[index] in texts
+
+    def raw_value(self, var: str, index: int):
+        """Значение переменной в точке index в исходном текстовом виде (None для пустого значения)."""
+        texts = self.texts.get(var)
+        if texts is not None:
+            text = texts.get(self.times[index])
+            if text is not None:
+                return text if text != BLANK else None
+        return format_raw(self.values[var][index])
+
+    def value(self, var: str, index: int = 0):
+        """Возвращает значение переменной в точке index как float или None."""
+        column = self.values.get(var)
+        if column is None or index >= len(column):
+            return None
+        value = column[index]
+        return None if value != value else value
+
+    def data_view(self, index: int) -> "DataView":
+        return DataView(self, index)
+
+
+class DataView(Mapping):
+    """
+    Словарное представление данных одной временной точки: {var: {"value", "units"}}.
+    Содержит только переменные, которые были в ответе в этой точке; значения – исходный текст.
+    """
+
+    __slots__ = ("_series", "_index")
+
+    def __init__(self, series: ForecastSeries, index: int):
+        self._series = series
+        self._index = index
+
+    def __getitem__(self, var):
+        if var not in self:
+            raise KeyError(var)
+        return {
+            "value": self._series.raw_value(var, self._index),
+            "units": self._series.units.get(var),
+        }
+
+    def __iter__(self):
+        return (var for var in self._series.values if self._series.has_value(var, self._index))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, var) -> bool:
+        return var in self._series.values and self._series.has_value(var, self._index)
+
+    def as_dict(self) -> dict:
+        return {var: self[var] for var in self}
+
+
+class ForecastEntry:
+    """
+    Агрегированная точка прогноза.
+
+    is_daytime равен None для почасового и суточного прогнозов; для прогноза дважды в день
+    это флаг дневного интервала. templow задаётся для суточного прогноза и прогноза
+    дважды в день. allergens – кортеж пар (forecast_key, значение).
+    """
+
+    __slots__ = ("time", "condition", "temperature", "templow", "pollen_index", "is_daytime", "allergens")
+
+    def __init__(self, time, condition, temperature, pollen_index, templow=None, is_daytime=None, allergens=()):
+        self.time = time
+        self.condition = condition
+        self.temperature = temperature
+        self.templow = templow
+        self.pollen_index = pollen_index
+        self.is_daytime = is_daytime
+        self.allergens = tuple(allergens)
+
+    def allergen(self, forecast_key: str):
+        """Возвращает агрегированное значение аллергена по ключу pollen_<имя>."""
+        for key, value in self.allergens:
+            if key == forecast_key:
+                return value
+        return None
+
+    def as_dict(self) -> dict:
+        """Формирует словарь прогноза в формате, ожидаемом WeatherEntity."""
+        if self.is_daytime is None:
+            entry = {
+                "datetime": epoch_to_utc_isoformat(self.time),
+                "condition": self.condition,
+                "native_temperature": self.temperature,
+                "native_temperature_unit": "°C",
+                "pollen_index": self.pollen_index,
+                "temperature": self.temperature,
+            }
+            if self.templow is not None:
+                entry["native_templow"] = self.templow
+        else:
+            entry = {
+                "datetime": epoch_to_utc_isoformat(self.time),
+                "is_daytime": self.is_daytime,
+                "condition": self.condition,
+                "native_temperature": self.temperature,
+                "native_templow": self.templow,
+                "pollen_index": self.pollen_index,
+                "temperature": self.temperature,
+            }
+        for key, value in self.allergens:
+            entry[key] = value
+        return entry
+
+    def project(self, keys=None, numeric: bool = False) -> dict:
+        """
+        as_dict() только с ключами keys (None – все); datetime и is_daytime сохраняются всегда.
+        numeric=True – время записи в секундах эпохи вместо строки ISO.
+        """
+        entry = self.as_dict()
+        if keys is not None:
+            entry = {key: value for key, value in entry.items() if key in keys or key in ENTRY_KEYS}
+        if numeric:
+            entry["datetime"] = self.time
+        return entry
+
+
+# Ключи записи прогноза, которые проекция сохраняет всегда
+ENTRY_KEYS = ("datetime", "is_daytime")
+
+
+def _entry_time(entry: ForecastEntry) -> int:
+    return entry.time
+
+
+class MergedData(Mapping):
+    """
+    Результат merge_station_features.
+
+    Хранит ForecastSeries и списки ForecastEntry; словарные ключи
+    "now", "hourly_forecast", "twice_daily_forecast" и "daily_forecast" материализуются по запросу.
+    Пустой экземпляр (без данных) ложен в булевом контексте, как прежний {}.
+    """
+
+    __slots__ = ("series", "now_index", "hourly", "twice_daily", "daily", "crossings", "exposure")
+
+    _KEYS = ("now", "hourly_forecast", "twice_daily_forecast", "daily_forecast")
+
+    def __init__(self, series: ForecastSeries = None, hourly=None, twice_daily=None, now_index: int = 0, daily=None):
+        self.series = series
+        self.now_index = now_index
+        self.hourly = hourly or []
+        self.twice_daily = twice_daily or []
+        self.daily = daily or []
+        # {ключ порога: CrossingIndex} – заполняется координатором (см. thresholds.py)
+        self.crossings = {}
+        # {переменная: ExposureIndex} – заполняется координатором (см. exposure.py)
+        self.exposure = {}
+
+    def __bool__(self) -> bool:
+        return self.series is not None
+
+    def __getitem__(self, key):
+        if self.series is None:
+            raise KeyError(key)
+        if key == "now":
+            return self.now_record()
+        if key == "hourly_forecast":
+            return [entry.as_dict() for entry in self.hourly]
+        if key == "twice_daily_forecast":
+            return [entry.as_dict() for entry in self.twice_daily]
+        if key == "daily_forecast":
+            return [entry.as_dict() for entry in self.daily]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS if self.series is not None else ())
+
+    def __len__(self) -> int:
+        return len(self._KEYS) if self.series is not None else 0
+
+    def __repr__(self) -> str:
+        if self.series is None:
+            return "MergedData(empty)"
+        return "MergedData(points=%d, variables=%s, hourly=%d, twice_daily=%d, daily=%d)" % (
+            len(self.series), list(self.series.variables), len(self.hourly), len(self.twice_daily), len(self.daily)
+        )
+
+    @property
+    def now_time(self):
+        """Секунды эпохи записи "now" или None."""
+        if self.series is None or not len(self.series):
+            return None
+        return self.series.times[self.now_index]
+
+    def now_value(self, var: str):
+        """Числовое значение переменной в записи "now" (float или None)."""
+        if self.series is None:
+            return None
+        return self.series.value(var, self.now_index)
+
+    def now_units(self, var: str):
+        if self.series is None:
+            return None
+        return self.series.units.get(var)
+
+    def now_record(self) -> dict:
+        """Запись "now" в прежнем формате {"station", "data", "date"}."""
+        series = self.series
+        if series is None or not len(series):
+            return {}
+        return {
+            "station": series.station.as_dict() if series.station is not None else {},
+            "data": series.data_view(self.now_index),
+            "date": epoch_to_iso(series.times[self.now_index]),
+        }
+
+    def as_dict(self) -> dict:
+        """Полностью материализованный словарь (JSON-совместимый) для ответов служб."""
+        return self.project()
+
+    def project(self, sections=None, columns=None, keys=None, start=None, end=None, numeric: bool = False) -> dict:
+        """
+        Проекция для ответов служб: материализуются только выбранные части хранилища.
+
+        :param sections: разделы из "now", "hourly_forecast", "twice_daily_forecast", "daily_forecast" (None – все).
+        :param columns: переменные ряда в записи "now"; столбцы профиля (<переменная>@<высота>)
+                        отбираются по переменной (None – все).
+        :param keys: ключи записей прогнозов (None – все), см. ForecastEntry.project.
+        :param start: начало интервала (секунды эпохи) для записей прогнозов.
+        :param end: конец интервала (включительно) для записей прогнозов.
+        :param numeric: значения "now" и координаты станции – числа (None вместо NaN),
+                        время – секунды эпохи; иначе строки, как в исходном XML.
+        Без аргументов результат совпадает с прежним форматом as_dict().
+        """
+        if self.series is None:
+            return {}
+        result = {}
+        for section in self._KEYS:
+            if sections is not None and section not in sections:
+                continue
+            if section == "now":
+                result[section] = self._project_now(columns, numeric)
+                continue
+            entries = self._entries(section)
+            # Записи прогнозов упорядочены по времени: интервал находится двоичным поиском
+            first = 0 if start is None else bisect_left(entries, start, key=_entry_time)
+            last = len(entries) if end is None else bisect_right(entries, end, key=_entry_time)
+            result[section] = [entries[i].project(keys, numeric) for i in range(first, last)]
+        return result
+
+    def _entries(self, section: str) -> list:
+        if section == "hourly_forecast":
+            return self.hourly
+        if section == "twice_daily_forecast":
+            return self.twice_daily
+        return self.daily
+
+    def _project_now(self, columns, numeric: bool) -> dict:
+        series = self.series
+        if not len(series):
+            return {}
+        index = self.now_index
+        data = {}
+        for var, column in series.values.items():
+            if columns is not None and var.split("@")[0] not in columns:
+                continue
+            if not series.has_value(var, index):
+                continue
+            data[var] = {
+                "value": _nan_to_none(column[index]) if numeric else series.raw_value(var, index),
+                "units": series.units.get(var),
+            }
+        station = series.station.as_dict() if series.station is not None else {}
+        if numeric:
+            station = {key: value if key == "name" else _nan_to_none(to_float(value)) for key, value in station.items()}
+        return {
+            "station": station,
+            "data": data,
+            "date": series.times[index] if numeric else epoch_to_iso(series.times[index]),
+        }
+
+
+def _nan_to_none(value: float):
+    return None if value != value else value
+
+
+def is_finite(value) -> bool:
+    return value is not None and math.isfinite(value)
@@ -0,0 +1,198 @@
+"""
+rolling.py
+
+Скользящие окна для агрегации прогнозов SILAM Pollen.
+
+Агрегаты каждого окна поддерживаются инкрементально:
+  - медиана – две кучи с отложенным удалением (O(log w) на добавление/удаление);
+  - максимум и минимум – монотонные деки (амортизированно O(1)).
+Все столбцы обслуживаются за один проход по оси времени. Неперекрывающиеся окна
+(step >= window) агрегируются напрямую: инкрементальное состояние в них не окупается.
+Отсутствующие значения (None) в агрегаты не попадают.
+"""
+
+import heapq
+from collections import Counter, deque
+
+
+class SlidingMedian:
+    """Медиана мультимножества с добавлением и удалением за O(log n)."""
+
+    __slots__ = ("_low", "_high", "_delayed", "_low_size", "_high_size")
+
+    def __init__(self):
+        self._low = []  # max-куча (значения со знаком минус) – нижняя половина
+        self._high = []  # min-куча – верхняя половина
+        self._delayed = Counter()  # значения, ожидающие удаления из куч
+        self._low_size = 0
+        self._high_size = 0
+
+    def __len__(self) -> int:
+        return self._low_size + self._high_size
+
+    def _prune(self, heap, sign):
+        while heap and self._delayed[sign * heap[0]]:
+            value = sign * heapq.heappop(heap)
+            self._delayed[value] -= 1
+            if not self._delayed[value]:
+                del self._delayed[value]
+
+    def _rebalance(self):
+        if self._low_size > self._high_size + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+            self._low_size -= 1
+            self._high_size += 1
+            self._prune(self._low, -1)
+        elif self._low_size < self._high_size:
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+            self._high_size -= 1
+            self._low_size += 1
+            self._prune(self._high, 1)
+
+    def add(self, value) -> None:
+        if not self._low or value <= -self._low[0]:
+            heapq.heappush(self._low, -value)
+            self._low_size += 1
+        else:
+            heapq.heappush(self._high, value)
+            self._high_size += 1
+        self._rebalance()
+
+    def remove(self, value) -> None:
+        self._delayed[value] += 1
+        if value <= -self._low[0]:
+            self._low_size -= 1
+            if value == -self._low[0]:
+                self._prune(self._low, -1)
+        else:
+            self._high_size -= 1
+            if self._high and value == self._high[0]:
+                self._prune(self._high, 1)
+        self._rebalance()
+
+    def median(self):
+        """Медиана в смысле statistics.median (среднее двух центральных при чётном числе) или None."""
+        if not len(self):
+            return None
+        if self._low_size > self._high_size:
+            return -self._low[0]
+        return (-self._low[0] + self._high[0]) / 2
+
+
+class MonotonicExtreme:
+    """Максимум (или минимум) скользящего окна на монотонной деке индексов."""
+
+    __slots__ = ("_items", "_sign")
+
+    def __init__(self, maximum: bool = True):
+        self._items = deque()  # пары (индекс, значение)
+        self._sign = 1 if maximum else -1
+
+    def add(self, index: int, value) -> None:
+        keyed = self._sign * value
+        while self._items and self._sign * self._items[-1][1] <= keyed:
+            self._items.pop()
+        self._items.append((index, value))
+
+    def evict(self, start: int) -> None:
+        """Удаляет элементы с индексом меньше start."""
+        while self._items and self._items[0][0] < start:
+            self._items.popleft()
+
+    def value(self):
+        return self._items[0][1] if self._items else None
+
+
+class ColumnWindow:
+    """Агрегаты одного столбца в текущем окне: подмножество из "median", "max", "min"."""
+
+    __slots__ = ("values", "median", "maximum", "minimum")
+
+    def __init__(self, values, kinds):
+        self.values = values
+        self.median = SlidingMedian() if "median" in kinds else None
+        self.maximum = MonotonicExtreme(True) if "max" in kinds else None
+        self.minimum = MonotonicExtreme(False) if "min" in kinds else None
+
+    def add(self, index: int) -> None:
+        value = self.values[index]
+        if value is None:
+            return
+        if self.median is not None:
+            self.median.add(value)
+        if self.maximum is not None:
+            self.maximum.add(index, value)
+        if self.minimum is not None:
+            self.minimum.add(index, value)
+
+    def remove(self, index: int) -> None:
+        if self.median is not None and self.values[index] is not None:
+            self.median.remove(self.values[index])
+
+    def evict(self, start: int) -> None:
+        if self.maximum is not None:
+            self.maximum.evict(start)
+        if self.minimum is not None:
+            self.minimum.evict(start)
+
+    def result(self) -> dict:
+        result = {}
+        if self.median is not None:
+            result["median"] = self.median.median()
+        if self.maximum is not None:
+            result["max"] = self.maximum.value()
+        if self.minimum is not None:
+            result["min"] = self.minimum.value()
+        return result
+
+
+def window_aggregates(values, kinds, start: int, end: int) -> dict:
+    """Агрегаты kinds значений values[start:end] без инкрементального состояния (как ColumnWindow.result)."""
+    present = sorted(value for value in values[start:end] if value is not None) if values is not None else []
+    result = {}
+    if "median" in kinds:
+        middle = len(present) // 2
+        if not present:
+            result["median"] = None
+        elif len(present) % 2:
+            result["median"] = present[middle]
+        else:
+            result["median"] = (present[middle - 1] + present[middle]) / 2
+    if "max" in kinds:
+        result["max"] = present[-1] if present else None
+    if "min" in kinds:
+        result["min"] = present[0] if present else None
+    return result
+
+
+def sliding_windows(columns: dict, length: int, window: int, step: int):
+    """
+    Проходит окнами размера window с шагом step по оси длины length.
+
+    columns – {имя: (список значений или None, набор агрегатов)}.
+    Возвращает генератор пар (start, {имя: {агрегат: значение}}) для каждого полного окна.
+    Окна могут перекрываться (step < window) или идти с пропусками (step > window).
+    """
+    if window < 1 or step < 1:
+        raise ValueError("window and step must be positive")
+    if step >= window:
+        for start in range(0, length - window + 1, step):
+            yield start, {
+                name: window_aggregates(values, kinds, start, start + window)
+                for name, (values, kinds) in columns.items()
+            }
+        return
+    states = {name: ColumnWindow(values, kinds) for name, (values, kinds) in columns.items()}
+    low = high = 0
+    for start in range(0, length - window + 1, step):
+        end = start + window
+        for index in range(max(high, start), end):
+            for state in states.values():
+                state.add(index)
+        for index in range(low, min(high, start)):
+            for state in states.values():
+                state.remove(index)
+        for state in states.values():
+            state.evict(start)
+        low, high = start, end
+        yield start, {name: state.result() for name, state in states.items()}
@@ -0,0 +1,254 @@
+"""
+run_history.py
+
+Кольцевой буфер последних прогонов модели SILAM для одной записи.
+
+Каждый прогон хранится как почасовая сетка фиксированной длины (RUN_HISTORY_HOURS),
+привязанная к времени первой точки ответа; значения всех прогонов одной переменной
+лежат в одном заранее выделенном массиве array('d') размером capacity × hours,
+поэтому объём памяти не растёт со временем.
+
+При добавлении прогона инкрементально обновляются метрики:
+  - revision – среднее изменение (новый прогон − предыдущий) значений ближайших
+    RUN_OUTLOOK_HOURS часов в совпадающие моменты времени;
+  - trend – наклон (в сутки) линейной регрессии среднего за ближайшие RUN_OUTLOOK_HOURS
+    часов по всем прогонам в буфере; суммы регрессии поддерживаются при добавлении
+    и вытеснении прогонов без повторного прохода по буферу.
+"""
+
+from array import array
+
+from .const import RUN_HISTORY_HOURS, RUN_HISTORY_SIZE, RUN_OUTLOOK_HOURS
+from .records import NAN
+
+# Версия формата, сохраняемого в хранилище Home Assistant
+STORAGE_VERSION = 1
+
+
+class RunMetrics:
+    """Метрики последнего прогона для одной переменной."""
+
+    __slots__ = ("revision", "revised_hours", "trend", "outlook")
+
+    def __init__(self, revision=None, revised_hours=0, trend=None, outlook=None):
+        self.revision = revision
+        self.revised_hours = revised_hours
+        self.trend = trend
+        self.outlook = outlook
+
+
+class RunHistory:
+    """Кольцевой буфер прогонов с фиксированной ёмкостью и метриками пересмотра прогноза."""
+
+    __slots__ = (
+        "capacity",
+        "hours",
+        "cell",
+        "run_times",
+        "count",
+        "_head",
+        "_columns",
+        "_outlooks",
+        "_sums",
+        "_origin",
+        "metrics",
+    )
+
+    def __init__(self, capacity: int = RUN_HISTORY_SIZE, hours: int = RUN_HISTORY_HOURS):
+        self.capacity = capacity
+        self.hours = hours
+        self.clear()
+
+    def clear(self, cell=None) -> None:
+        """Очищает буфер (например, при переходе в другую ячейку сетки)."""
+        self.cell = cell
+        self.run_times = array("q", [0] * self.capacity)
+        self.count = 0
+        self._head = 0  # позиция, в которую будет записан следующий прогон
+        self._columns = {}  # {переменная: array('d') размером capacity × hours}
+        self._outlooks = {}  # {переменная: array('d') размером capacity} – среднее ближайших часов прогона
+        self._sums = {}  # {переменная: [n, Σx, Σy, Σxy, Σx²]} для наклона тренда
+        self._origin = None  # начало отсчёта оси x (часы) для сумм регрессии
+        self.metrics = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def variables(self):
+        return self._columns.keys()
+
+    def _slot(self, age: int) -> int:
+        """Позиция прогона в кольце: age=0 – последний, age=1 – предыдущий и т. д."""
+        return (self._head - 1 - age) % self.capacity
+
+    def _set_variables(self, variables) -> None:
+        for var in list(self._columns):
+            if var not in variables:
+                del self._columns[var]
+                del self._outlooks[var]
+                del self._sums[var]
+                self.metrics.pop(var, None)
+        for var in variables:
+            if var not in self._columns:
+                self._columns[var] = array("d", [NAN]) * (self.capacity * self.hours)
+                self._outlooks[var] = array("d", [NAN]) * self.capacity
+                self._sums[var] = [0, 0.0, 0.0, 0.0, 0.0]
+
+    def _grid(self, run_time: int, times, column) -> array:
+        """Раскладывает столбец ряда по почасовой сетке прогона."""
+        row = array("d", [NAN]) * self.hours
+        for i, ts in enumerate(times):
+            offset = ts - run_time
+            if offset < 0 or offset % 3600:
+                continue
+            slot = offset // 3600
+            if slot >= self.hours:
+                break
+            row[slot] = column[i]
+        return row
+
+    def _row(self, var: str, age: int):
+        start = self._slot(age) * self.hours
+        return self._columns[var][start:start + self.hours]
+
+    def _is_repeat(self, run_time: int, rows: dict) -> bool:
+        """
+        Совпадает ли новый прогон с последним во всех общих моментах времени (тот же прогон модели).
+
+        Сравниваются только часы, для которых есть данные в обоих прогонах: ежечасное
+        обновление сдвигает горизонт, и его последние часы приходятся на пустые ячейки
+        сетки предыдущего прогона. Без единого общего значения повтор не признаётся.
+        """
+        if not self.count:
+            return False
+        shift = (run_time - self.run_times[self._slot(0)]) // 3600
+        if shift < 0 or shift >= self.hours:
+            return False
+        compared = 0
+        for var, row in rows.items():
+            if var not in self._columns:
+                return False
+            previous = self._row(var, 0)
+            for j in range(self.hours - shift):
+                new, old = row[j], previous[j + shift]
+                if new != new or old != old:
+                    continue
+                if new != old:
+                    return False
+                compared += 1
+        return compared > 0
+
+    def push(self, run_time: int, series, variables, cell=None) -> bool:
+        """
+        Добавляет прогон из ForecastSeries (переменные variables).
+        Возвращает False, если прогон повторяет последний (данные модели не обновились).
+        """
+        if cell != self.cell:
+            self.clear(cell)
+        rows = {
+            var: self._grid(run_time, series.times, series.values[var])
+            for var in variables
+            if var in series.values
+        }
+        if self._is_repeat(run_time, rows):
+            return False
+        self._append(run_time, rows)
+        return True
+
+    def _append(self, run_time: int, rows: dict) -> None:
+        self._set_variables(rows)
+        if self._origin is None:
+            self._origin = run_time
+        evicted = self.count == self.capacity
+        previous_time = self.run_times[self._slot(0)] if self.count else None
+        x = (run_time - self._origin) / 3600
+        for var, row in rows.items():
+            column = self._columns[var]
+            outlooks = self._outlooks[var]
+            sums = self._sums[var]
+            # Пересмотр относительно предыдущего прогона в совпадающие моменты времени
+            revision, revised_hours = None, 0
+            if previous_time is not None and run_time >= previous_time:
+                shift = (run_time - previous_time) // 3600
+                base = self._slot(0) * self.hours
+                total = 0.0
+                for j in range(min(RUN_OUTLOOK_HOURS, self.hours - shift)):
+                    new, old = row[j], column[base + j + shift]
+                    if new == new and old == old:
+                        total += new - old
+                        revised_hours += 1
+                if revised_hours:
+                    revision = total / revised_hours
+            # Вытеснение самого старого прогона из сумм регрессии
+            if evicted:
+                old_outlook = outlooks[self._head]
+                if old_outlook == old_outlook:
+                    old_x = (self.run_times[self._head] - self._origin) / 3600
+                    sums[0] -= 1
+                    sums[1] -= old_x
+                    sums[2] -= old_outlook
+                    sums[3] -= old_x * old_outlook
+                    sums[4] -= old_x * old_x
+            # Запись прогона в кольцо
+            start = self._head * self.hours
+            column[start:start + self.hours] = row
+            finite = [value for value in row[:RUN_OUTLOOK_HOURS] if value == value]
+            outlook = sum(finite) / len(finite) if finite else NAN
+            outlooks[self._head] = outlook
+            if outlook == outlook:
+                sums[0] += 1
+                sums[1] += x
+                sums[2] += outlook
+                sums[3] += x * outlook
+                sums[4] += x * x
+            self.metrics[var] = RunMetrics(
+                revision=revision,
+                revised_hours=revised_hours,
+                trend=_slope(sums),
+                outlook=outlook if outlook == outlook else None,
+            )
+        self.run_times[self._head] = run_time
+        self._head = (self._head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def as_dict(self) -> dict:
+        """Сериализует буфер (от старого прогона к новому) для хранилища Home Assistant."""
+        runs = []
+        for age in range(self.count - 1, -1, -1):
+            runs.append({
+                "time": self.run_times[self._slot(age)],
+                "values": {
+                    var: [value if value == value else None for value in self._row(var, age)]
+                    for var in self._columns
+                },
+            })
+        return {
+            "cell": list(self.cell) if self.cell is not None else None,
+            "hours": self.hours,
+            "runs": runs,
+        }
+
+    def load(self, data: dict) -> None:
+        """Восстанавливает буфер из as_dict(); прогоны сверх ёмкости отбрасываются."""
+        cell = data.get("cell")
+        self.clear(tuple(cell) if cell is not None else None)
+        if data.get("hours") != self.hours:
+            return
+        for run in data.get("runs", [])[-self.capacity:]:
+            rows = {
+                var: array("d", [NAN if value is None else value for value in values[:self.hours]])
+                for var, values in run.get("values", {}).items()
+            }
+            self._append(int(run["time"]), rows)
+
+
+def _slope(sums):
+    """Наклон линейной регрессии по накопленным суммам (в единицах переменной в сутки) или None."""
+    n, sx, sy, sxy, sxx = sums
+    if n < 2:
+        return None
+    denominator = n * sxx - sx * sx
+    if abs(denominator) < 1e-9:
+        return None
+    return (n * sxy - sx * sy) / denominator * 24
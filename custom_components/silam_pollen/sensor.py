@@ -2,8 +2,8 @@
 sensor.py для интеграции SILAM Pollen в Home Assistant.
 
 Реализует:
-  - Централизованное обновление данных через SilamCoordinator, который объединяет данные из двух
-    источников (index и main) один раз за цикл обновления и сохраняет их в атрибуте merged_data.
+  - Централизованное обновление данных через SilamCoordinator, который объединяет данные двух
+    фидов (index и main) с собственными интервалами обновления и сохраняет их в атрибуте merged_data.
   - Использование объединённых (кэшированных) данных для обновления состояний сенсоров.
   
 Создаются два типа сенсоров:
@@ -19,9 +19,13 @@ from datetime import timedelta
 import xml.etree.ElementTree as ET
 
 from homeassistant.components.sensor import SensorEntity
+from homeassistant.core import callback
 from homeassistant.helpers.device_registry import DeviceInfo, DeviceEntryType
-from .const import DOMAIN, VAR_OPTIONS, INDEX_MAPPING, RESPONSIBLE_MAPPING, URL_VAR_MAPPING
+from .const import DOMAIN, VAR_OPTIONS, INDEX_MAPPING, RESPONSIBLE_MAPPING, URL_VAR_MAPPING, FEED_INDEX, FEED_MAIN
 from .coordinator import SilamCoordinator  # Импорт координатора интеграции
+from .capabilities import allergen_label
+from .data_processing import forecast_key, profile_key
+from .records import epoch_to_iso
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -73,26 +77,38 @@ async def async_setup_entry(hass, entry, async_add_entities):
         )
     )
     # Если выбраны конкретные аллергены, создаём сенсоры типа "main" для каждого из них
-    if var_list:
-        for pollen in var_list:
-            translation_key = VAR_OPTIONS.get(pollen, pollen)
-            sensors.append(
-                SilamPollenSensor(
-                    sensor_name=f"{base_device_name} {translation_key}",
-                    base_device_name=base_device_name,
-                    coordinator=coordinator,
-                    var=pollen,  # Для main передаётся конкретный аллерген
-                    entry_id=entry.entry_id,
-                    sensor_type="main",
-                    desired_altitude=altitude,
-                    manual_coordinates=manual_coordinates,
-                    manual_latitude=manual_latitude,
-                    manual_longitude=manual_longitude,
-                )
+    # Для дополнительных высот вертикального профиля создаются отдельные сенсоры
+    def build_main_sensors(allergens):
+        return [
+            SilamPollenSensor(
+                sensor_name=f"{base_device_name} {allergen_label(pollen)}",
+                base_device_name=base_device_name,
+                coordinator=coordinator,
+                var=pollen,  # Для main передаётся конкретный аллерген
+                entry_id=entry.entry_id,
+                sensor_type="main",
+                desired_altitude=altitude,
+                manual_coordinates=manual_coordinates,
+                manual_latitude=manual_latitude,
+                manual_longitude=manual_longitude,
+                profile_altitude=profile_altitude,
             )
+            for pollen in allergens
+            for profile_altitude in [None, *coordinator.altitudes[1:]]
+        ]
+
+    if var_list:
+        sensors.extend(build_main_sensors(var_list))
 
     async_add_entities(sensors, True)
 
+    # Позволяет координатору добавлять сенсоры новых аллергенов при изменении опций без перезагрузки записи
+    @callback
+    def async_add_allergen_sensors(allergens):
+        async_add_entities(build_main_sensors(allergens), True)
+
+    coordinator.async_add_allergen_sensors = async_add_allergen_sensors
+
 class SilamPollenSensor(SensorEntity):
     """
     Класс сенсора SILAM Pollen.
@@ -100,15 +116,32 @@ class SilamPollenSensor(SensorEntity):
     Различают два типа сенсоров:
       - "index": отображает общий индекс пыльцы, используя данные из ключа "now" объединённого словаря.
       - "main": отображает значение для конкретного аллергена, используя данные из ключа "now".
+
+    Служебные и прогнозные атрибуты не сохраняются recorder'ом в истории состояний:
+    история значений публикуется координатором во внешние долгосрочные статистики.
+    unit_of_measurement записывается всегда: по нему recorder строит графики истории и статистики.
+
+    Сенсор не опрашивается: он подписан на фид, из которого читает данные (index или main),
+    и пересчитывает состояние, только когда данные этого фида изменились.
     """
+
+    _attr_should_poll = False
+
+    _unrecorded_attributes = frozenset({
+        "date", "altitude", "index_tomorrow", "tomorrow", "vertical_profile",
+        "forecast_revision", "forecast_trend", "source",
+    })
+
     def __init__(self, sensor_name, base_device_name, coordinator, var, entry_id, sensor_type, desired_altitude,
-                 manual_coordinates, manual_latitude, manual_longitude):
+                 manual_coordinates, manual_latitude, manual_longitude, profile_altitude=None):
         self._base_device_name = base_device_name
         self.coordinator = coordinator
         self._var = var
         self._entry_id = entry_id
         self._sensor_type = sensor_type
         self._desired_altitude = desired_altitude
+        # Дополнительная высота вертикального профиля (None – основная высота записи)
+        self._profile_altitude = profile_altitude
         self._state = None
         self._extra_attributes = {}
         self._unit_of_measurement = None
@@ -149,9 +182,6 @@ class SilamPollenSensor(SensorEntity):
             configuration_url=f"https://silam.fmi.fi/pollen.html?region={dataset}"
         )
 
-        # Регистрируем слушатель обновлений для автоматического обновления состояния сенсора
-        self.async_on_remove(self.coordinator.async_add_listener(self.async_write_ha_state))
-
         # Настраиваем перевод и имя сущности в зависимости от типа сенсора
         if self._sensor_type == "index":
             self._attr_translation_key = "index"
@@ -159,15 +189,33 @@ class SilamPollenSensor(SensorEntity):
         elif self._sensor_type == "main":
             self._attr_translation_key = VAR_OPTIONS.get(self._var, self._var)
             self._attr_has_entity_name = True
+            if self._profile_altitude is not None:
+                self._attr_name = f"{allergen_label(self._var).capitalize()} {self._profile_altitude:g} m"
+            elif self._var not in VAR_OPTIONS:
+                # Аллерген из описания набора данных, для которого нет перевода
+                self._attr_name = allergen_label(self._var).capitalize()
         else:
             self._attr_translation_key = None
             self._attr_has_entity_name = False
             self._attr_name = sensor_name
 
+    async def async_added_to_hass(self):
+        """Подписывает сенсор на обновления его фида."""
+        await super().async_added_to_hass()
+        feed = FEED_INDEX if self._sensor_type == "index" else FEED_MAIN
+        self.async_on_remove(self.coordinator.async_add_feed_listener(feed, self._handle_feed_update))
+
+    @callback
+    def _handle_feed_update(self):
+        """Пересчитывает состояние из обновлённых данных и записывает его."""
+        self.async_schedule_update_ha_state(True)
+
     @property
     def unique_id(self):
         if self._sensor_type == "index":
             return f"{self._entry_id}_index"
+        if self._profile_altitude is not None:
+            return f"{self._entry_id}_main_{self._var}_{self._profile_altitude:g}m"
         return f"{self._entry_id}_main_{self._var}"
         
     @property
@@ -195,88 +243,109 @@ class SilamPollenSensor(SensorEntity):
         Обновляет состояние сенсора, используя данные из объединённого словаря, сохранённого в self.coordinator.merged_data.
 
         Для сенсора "index":
-          - Из раздела "now" объединённого словаря извлекается значение "POLI" и "POLISRC".
+          - Из записи "now" объединённых данных извлекается значение "POLI" и "POLISRC".
           - Состояние определяется через INDEX_MAPPING, а дополнительные атрибуты сохраняются.
         
         Для сенсора "main":
-          - Из раздела "now" извлекается элемент с именем параметра (определяемым через URL_VAR_MAPPING).
+          - Из записи "now" извлекается значение параметра (определяемого через URL_VAR_MAPPING).
           - Значение преобразуется в число, а единицы измерения и другие атрибуты сохраняются.
           - Если включён прогноз, добавляется атрибут "tomorrow", в котором хранится агрегированное значение прогноза пыльцы для завтрашнего дня.
         """
         merged = self.coordinator.merged_data
-        if not merged or "now" not in merged:
+        if not merged or merged.now_time is None:
             _LOGGER.error("Объединённые данные отсутствуют или не содержат ключ 'now'")
             return
 
-        # Используем раздел "now" для получения данных
-        entry = merged["now"]
-
         if self._sensor_type == "index":
-            self._extra_attributes["date"] = entry.get("date")
-            poli_raw = entry["data"].get("POLI", {}).get("value")
+            self._extra_attributes["date"] = epoch_to_iso(merged.now_time)
+            poli_raw = merged.now_value("POLI")
             try:
-                index_value = int(float(poli_raw))
+                index_value = int(poli_raw)
             except (ValueError, TypeError):
                 index_value = None
             self._state = INDEX_MAPPING.get(index_value, "unknown")
 
-            polisrc_raw = entry["data"].get("POLISRC", {}).get("value")
+            polisrc_raw = merged.now_value("POLISRC")
             try:
-                re_value = int(float(polisrc_raw))
+                re_value = int(polisrc_raw)
             except (ValueError, TypeError):
                 re_value = None
             self._extra_attributes["responsible_elevated"] = RESPONSIBLE_MAPPING.get(re_value, "unknown")
             # Добавляем новый атрибут "index_tomorrow" только если включён прогноз
             if self.coordinator._forecast_enabled:
-                twice_daily = merged.get("twice_daily_forecast", [])
-                condition_tomorrow = None
-                if twice_daily:
-                    # Если первый прогноз дневной, берем третий (если он есть и тоже дневной)
-                    if twice_daily[0].get("is_daytime"):
-                        if len(twice_daily) >= 3 and twice_daily[2].get("is_daytime"):
-                            condition_tomorrow = twice_daily[2].get("condition")
-                    # Если первый прогноз ночной, то берем второй (если он дневной)
-                    else:
-                        if len(twice_daily) >= 2 and twice_daily[1].get("is_daytime"):
-                            condition_tomorrow = twice_daily[1].get("condition")
-                if condition_tomorrow is not None:
-                    self._extra_attributes["index_tomorrow"] = condition_tomorrow
+                tomorrow = _tomorrow_entry(merged.twice_daily)
+                if tomorrow is not None and tomorrow.condition is not None:
+                    self._extra_attributes["index_tomorrow"] = tomorrow.condition
+            self._extra_attributes["source"] = self.coordinator.source("index", "POLI")
+            self._update_run_metrics("POLI")
 
         elif self._sensor_type == "main":
             full_var = URL_VAR_MAPPING.get(self._var, self._var)
-            data_element = entry["data"].get(full_var)
+            if self._profile_altitude is not None:
+                full_var = profile_key(full_var, self._profile_altitude)
             state_value = None
             main_data = {}
-            if data_element:
-                try:
-                    pollen_val = float(data_element.get("value"))
-                    state_value = int(round(pollen_val))
-                except (ValueError, TypeError):
-                    state_value = None
-                unit = data_element.get("units")
+            if full_var in merged.series.values:
+                pollen_val = merged.now_value(full_var)
+                state_value = int(round(pollen_val)) if pollen_val is not None else None
+                unit = merged.now_units(full_var)
                 if unit:
                     main_data["unit_of_measurement"] = unit
 
-            station = entry.get("station", {})
-            if station:
-                main_data["altitude"] = station.get("altitude")
+            station = merged.series.station
+            if self._profile_altitude is not None:
+                main_data["altitude"] = f"{self._profile_altitude:g}"
+            elif station is not None:
+                main_data["altitude"] = station.altitude
+            # Для основного сенсора добавляем значения на всех высотах профиля
+            if self._profile_altitude is None and len(self.coordinator.altitudes) > 1:
+                profile = {}
+                for index, altitude in enumerate(self.coordinator.altitudes):
+                    value = merged.now_value(full_var if index == 0 else profile_key(full_var, altitude))
+                    profile[f"{altitude:g} m"] = int(round(value)) if value is not None else None
+                main_data["vertical_profile"] = profile
 
             self._state = state_value
             self._extra_attributes.update(main_data)
+            # Набор данных (версия SILAM), ответивший на запрос при последнем обновлении;
+            # при смешивании наборов – наборы, обслужившие значения переменной
+            self._extra_attributes["source"] = self.coordinator.source("main", full_var)
             # Добавляем атрибут "tomorrow" для сенсора main,
             # который содержит прогнозное значение пыльцы (агрегированное по forecast_key)
-            if self.coordinator._forecast_enabled:
-                twice_daily = merged.get("twice_daily_forecast", [])
-                tomorrow_value = None
-                # Ключ для аллергена формируется по схеме "pollen_<имя>", где имя определяется
-                # как часть переменной до символа "_", приведённая к нижнему регистру.
-                forecast_key = "pollen_" + self._var.split('_')[0].lower()
-                if twice_daily:
-                    if twice_daily[0].get("is_daytime"):
-                        if len(twice_daily) >= 3 and twice_daily[2].get("is_daytime"):
-                            tomorrow_value = twice_daily[2].get(forecast_key)
-                    else:
-                        if len(twice_daily) >= 2 and twice_daily[1].get("is_daytime"):
-                            tomorrow_value = twice_daily[1].get(forecast_key)
+            if self.coordinator._forecast_enabled and self._profile_altitude is None:
+                # Ключ для аллергена формируется по схеме "pollen_<имя>" (см. forecast_key)
+                tomorrow = _tomorrow_entry(merged.twice_daily)
+                tomorrow_value = tomorrow.allergen(forecast_key(self._var)) if tomorrow is not None else None
                 if tomorrow_value is not None:
                     self._extra_attributes["tomorrow"] = tomorrow_value
+            if self._profile_altitude is None:
+                self._update_run_metrics(full_var)
+
+    def _update_run_metrics(self, full_var):
+        """
+        Атрибуты пересмотра прогноза между прогонами модели:
+        forecast_revision – среднее изменение ближайших суток относительно предыдущего прогона,
+        forecast_trend – изменение среднего за ближайшие сутки по последним прогонам (в сутки).
+        """
+        metrics = self.coordinator.run_metrics(full_var)
+        if metrics is None:
+            return
+        self._extra_attributes["forecast_revision"] = (
+            round(metrics.revision, 2) if metrics.revision is not None else None
+        )
+        self._extra_attributes["forecast_trend"] = round(metrics.trend, 2) if metrics.trend is not None else None
+
+
+def _tomorrow_entry(twice_daily):
+    """
+    Возвращает дневную запись прогноза дважды в день на завтра или None.
+
+    Если первый прогноз дневной, берём третий (если он есть и тоже дневной);
+    если первый прогноз ночной, берём второй (если он дневной).
+    """
+    if not twice_daily:
+        return None
+    position = 2 if twice_daily[0].is_daytime else 1
+    if len(twice_daily) > position and twice_daily[position].is_daytime:
+        return twice_daily[position]
+    return None
@@ -0,0 +1,217 @@
+"""
+streaming.py
+
+Режим низкого потребления памяти: потоковый разбор ответов SILAM в колоночные буферы.
+
+Ответ разбирается по мере загрузки (XMLPullParser) частями не больше STREAM_CHUNK_SIZE:
+после каждой части каждая завершённая запись <stationFeature> сразу переносится в заранее
+выделенные массивы ForecastSeries (ось времени и столбцы переменных размером в ожидаемое
+число точек ответа) и удаляется из дерева, поэтому ни DOM ответа, ни промежуточные словари
+строк, ни строка со всем телом не создаются, а элементов дерева одновременно существует
+не больше, чем в одной части.
+
+В бюджете памяти обновления (MemoryBudget) учитываются буферы рядов всех ответов, исходные
+тексты значений, состояние разборщика и элементы дерева разбираемой части (оценки
+PARSER_SIZE и PARSER_OVERHEAD, download.py), а также память загрузки и распаковки (download.py),
+разбора описания набора (capabilities.DatasetParser) и построения прогнозов
+(data_processing.build_forecasts). Превышение бюджета прерывает
+обновление ошибкой MemoryBudgetExceeded, наибольший учтённый объём сообщается координатором.
+"""
+
+import xml.etree.ElementTree as ET
+from array import array
+
+import sys
+
+from .const import STREAM_CHUNK_SIZE
+from .download import PARSER_OVERHEAD, PARSER_SIZE
+from .records import NAN, ForecastSeries, StationInfo, intern_str, parse_epoch, raw_text, to_float
+
+# Байт на точку буфера: секунды эпохи (q) и значения (d)
+ITEM_SIZE = 8
+# Запись исходного текста в словаре texts сверх самой строки: ячейка словаря и ключ-метка времени
+TEXT_ENTRY_SIZE = 64
+
+
+class MemoryBudgetExceeded(Exception):
+    """Память обновления больше бюджета."""
+
+
+class MemoryBudget:
+    """Учёт памяти одного обновления: текущий и наибольший объём (байты)."""
+
+    __slots__ = ("limit", "used", "peak")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+
+    def allocate(self, size: int) -> None:
+        self.used += size
+        if self.used > self.peak:
+            self.peak = self.used
+        if self.used > self.limit:
+            raise MemoryBudgetExceeded(f"Память обновления ({self.used} байт) больше бюджета {self.limit} байт")
+
+    def release(self, size: int) -> None:
+        self.used -= size
+
+
+class SeriesParser:
+    """
+    Потоковый разбор одного ответа SILAM прямо в ForecastSeries.
+    Интерфейс как у ET.XMLParser (feed/close), но close() возвращает ForecastSeries,
+    равный parse_series по тому же ответу.
+    """
+
+    def __init__(self, capacity: int, budget: MemoryBudget = None):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._budget = budget
+        self._path = []  # открытые элементы от корня
+        self._capacity = max(int(capacity), 1)
+        self._count = 0
+        self._allocated = 0
+        self._times = self._allocate("q", 0)
+        self._columns = {}
+        self._units = {}
+        self._texts = {}
+        self._station = None
+        self._ordered = True
+        self._account(PARSER_SIZE)
+
+    def _account(self, size: int) -> None:
+        if self._budget is not None:
+            self._budget.allocate(size)
+        self._allocated += size
+
+    def _unaccount(self, size: int) -> None:
+        if self._budget is not None:
+            self._budget.release(size)
+        self._allocated -= size
+
+    def _allocate(self, typecode: str, value):
+        self._account(self._capacity * ITEM_SIZE)
+        return array(typecode, [value]) * self._capacity
+
+    def _grow(self) -> None:
+        """Ответ длиннее ожидаемого: буферы удваиваются."""
+        extra = self._capacity
+        self._account(extra * ITEM_SIZE * (len(self._columns) + 1))
+        self._capacity += extra
+        self._times.extend(array("q", [0]) * extra)
+        for column in self._columns.values():
+            column.extend(array("d", [NAN]) * extra)
+
+    def feed(self, data) -> None:
+        """
+        Разбирает очередную часть тела (bytes или str) частями не больше STREAM_CHUNK_SIZE;
+        события читаются после каждой части. Части bytes передаются без копирования (memoryview).
+        """
+        view = memoryview(data) if isinstance(data, (bytes, bytearray)) else data
+        for start in range(0, len(data), STREAM_CHUNK_SIZE):
+            chunk = view[start:start + STREAM_CHUNK_SIZE]
+            size = len(chunk) * PARSER_OVERHEAD
+            if self._budget is not None:
+                self._budget.allocate(size)
+            try:
+                self._parser.feed(chunk)
+                self._read_events()
+            finally:
+                if self._budget is not None:
+                    self._budget.release(size)
+
+    def _read_events(self) -> None:
+        path = self._path
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                path.append(elem)
+                continue
+            path.pop()
+            if elem.tag == "stationFeature":
+                self._add_feature(elem)
+                # Разобранная запись удаляется из дерева: DOM ответа не накапливается
+                if path:
+                    path[-1].remove(elem)
+
+    def _add_feature(self, feature) -> None:
+        ts = parse_epoch(feature.get("date"))
+        if self._station is None:
+            station = feature.find("station")
+            if station is not None:
+                self._station = StationInfo.from_element(station)
+        count = self._count
+        # Запись с повторяющейся датой замещает прежнюю целиком (как parse_series)
+        for texts in self._texts.values():
+            text = texts.pop(ts, None)
+            if text is not None:
+                self._unaccount(sys.getsizeof(text) + TEXT_ENTRY_SIZE)
+        if count and self._times[count - 1] == ts:
+            index = count - 1
+            for column in self._columns.values():
+                column[index] = NAN
+        else:
+            if count and ts < self._times[count - 1]:
+                self._ordered = False
+            if count == self._capacity:
+                self._grow()
+            index = count
+            self._times[index] = ts
+            self._count += 1
+        for data in feature.iterfind("data"):
+            key = intern_str(data.get("name"))
+            column = self._columns.get(key)
+            if column is None:
+                column = self._columns[key] = self._allocate("d", NAN)
+                self._units[key] = intern_str(data.get("units"))
+            value = column[index] = to_float(data.text)
+            text = raw_text(data.text, value)
+            if text is not None:
+                self._account(sys.getsizeof(text) + TEXT_ENTRY_SIZE)
+                self._texts.setdefault(key, {})[ts] = text
+
+    def close(self) -> ForecastSeries:
+        self._parser.close()
+        self._read_events()
+        self._parser = None
+        self._unaccount(PARSER_SIZE)
+        count = self._count
+        times = self._times
+        columns = self._columns
+        del times[count:]
+        for column in columns.values():
+            del column[count:]
+        if not self._ordered:
+            # Отсортированные копии буферов
+            self._account(count * ITEM_SIZE * (len(columns) + 1))
+            times, columns = _sorted_points(times, columns)
+        series = ForecastSeries(self._station)
+        series.times = times
+        for var, column in columns.items():
+            series.add_column(var, column, self._units[var], self._texts.get(var))
+        return series
+
+
+def copied_size(series: ForecastSeries, *sources) -> int:
+    """Байты оси времени и столбцов series, которые не являются столбцами рядов sources (копии при объединении)."""
+    shared = {id(column) for source in sources if source is not None for column in source.values.values()}
+    copies = sum(1 for column in series.values.values() if id(column) not in shared)
+    return len(series) * ITEM_SIZE * (copies + 1)
+
+
+def _sorted_points(times, columns):
+    """Точки в порядке времени; из точек с повторяющейся меткой остаётся последняя."""
+    order = sorted(range(len(times)), key=times.__getitem__)
+    sorted_times = array("q")
+    positions = []  # позиция каждой исходной точки в отсортированном ряду
+    for i in order:
+        if not sorted_times or sorted_times[-1] != times[i]:
+            sorted_times.append(times[i])
+        positions.append(len(sorted_times) - 1)
+    sorted_columns = {}
+    for var, column in columns.items():
+        result = array("d", [NAN]) * len(sorted_times)
+        for i, position in zip(order, positions):
+            result[position] = column[i]
+        sorted_columns[var] = result
+    return sorted_times, sorted_columns
@@ -0,0 +1,120 @@
+"""
+thresholds.py
+
+Индексы пересечения порогов для SILAM Pollen.
+
+Для каждой переменной с заданным порогом координатор один раз за обновление
+проходит по оси времени и сохраняет готовые ответы: ближайшее время превышения,
+длительность первого эпизода превышения, суммарное время выше порога и пик.
+Бинарные сенсоры и автоматизации читают эти значения за O(1).
+"""
+
+from .const import URL_VAR_MAPPING
+
+# Ключ порога для общего индекса пыльцы (остальные ключи – имена аллергенов, например birch_m22)
+INDEX_THRESHOLD_KEY = "index"
+
+
+def threshold_column(key: str) -> str:
+    """Возвращает имя переменной SILAM для ключа порога."""
+    if key == INDEX_THRESHOLD_KEY:
+        return "POLI"
+    return URL_VAR_MAPPING.get(key, key)
+
+
+class CrossingIndex:
+    """
+    Предвычисленные ответы о превышении порога на загруженном горизонте.
+
+    Времена – секунды эпохи UTC, длительности – часы; None, если превышения нет.
+    """
+
+    __slots__ = (
+        "threshold",
+        "active",
+        "next_exceedance",
+        "episode_end",
+        "episode_hours",
+        "hours_above",
+        "peak_time",
+        "peak_value",
+        "episodes",
+    )
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.active = False
+        self.next_exceedance = None
+        self.episode_end = None
+        self.episode_hours = None
+        self.hours_above = 0.0
+        self.peak_time = None
+        self.peak_value = None
+        # Все эпизоды превышения в виде пар (начало, конец) – по возрастанию времени
+        self.episodes = []
+
+    def upcoming(self, now: float):
+        """Текущий или ближайший будущий эпизод превышения (начало, конец) или None."""
+        for episode in self.episodes:
+            if episode[1] > now:
+                return episode
+        return None
+
+    def exceeds_within(self, now: float, lookahead_hours: float) -> bool:
+        """Ожидается ли превышение в интервале [now, now + lookahead_hours] (или оно уже идёт)."""
+        episode = self.upcoming(now)
+        return episode is not None and episode[0] <= now + lookahead_hours * 3600
+
+
+def crossing_index(times, column, threshold) -> CrossingIndex:
+    """
+    Строит CrossingIndex за один проход по столбцу.
+
+    Каждая точка считается представителем интервала до следующей точки
+    (последняя – интервала, равного предыдущему шагу, по умолчанию 1 час).
+    Отсутствующие значения (NaN) пропускаются и прерывают эпизод превышения.
+    """
+    index = CrossingIndex(threshold)
+    length = len(times)
+    episode_start = None
+    for i in range(length):
+        value = column[i]
+        if value != value:
+            if episode_start is not None:
+                index.episodes.append((episode_start, times[i]))
+                episode_start = None
+            continue
+        if index.peak_value is None or value > index.peak_value:
+            index.peak_value = value
+            index.peak_time = times[i]
+        if i + 1 < length:
+            span = times[i + 1] - times[i]
+        else:
+            span = times[i] - times[i - 1] if i else 3600
+        if value >= threshold:
+            index.hours_above += span / 3600
+            if episode_start is None:
+                episode_start = times[i]
+                if not index.episodes:
+                    index.active = i == 0
+        elif episode_start is not None:
+            index.episodes.append((episode_start, times[i]))
+            episode_start = None
+    if episode_start is not None:
+        index.episodes.append((episode_start, times[length - 1] + span))
+    if index.episodes:
+        index.next_exceedance, index.episode_end = index.episodes[0]
+        index.episode_hours = (index.episode_end - index.next_exceedance) / 3600
+    return index
+
+
+def compute_crossings(series, thresholds: dict) -> dict:
+    """Возвращает {ключ порога: CrossingIndex} для всех переменных ряда, для которых задан порог."""
+    crossings = {}
+    if series is None:
+        return crossings
+    for key, threshold in thresholds.items():
+        column = series.values.get(threshold_column(key))
+        if column is not None and threshold is not None:
+            crossings[key] = crossing_index(series.times, column, threshold)
+    return crossings
@@ -0,0 +1,124 @@
+"""
+websocket.py
+
+Websocket API SILAM Pollen для карточек панели.
+
+Команды:
+  - silam_pollen/forecast – текущий прогноз записи в колоночном виде (columnar.py);
+  - silam_pollen/forecast/subscribe – подписка: первый снимок полностью,
+    далее после каждого обновления координатора – только изменения.
+Ряды аллергенов передаются столбцами и не увеличивают атрибуты сущностей.
+
+Команды регистрируются один раз на экземпляр Home Assistant. При выгрузке записи
+(в том числе при перезагрузке после смены опций) её подписки закрываются сообщением
+об ошибке: координатор записи заменяется, и клиент должен подписаться заново.
+"""
+
+import logging
+
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import callback
+
+from .columnar import ColumnarSnapshot
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Ключ hass.data: {entry_id: {(соединение, id сообщения): закрытие подписки}};
+# наличие ключа означает, что команды уже зарегистрированы
+DATA_WEBSOCKET = f"{DOMAIN}_websocket"
+
+_COMMAND_SCHEMA = {
+    vol.Required("entry_id"): str,
+    vol.Optional("variables"): [str],
+}
+
+
+@callback
+def async_register_websocket_commands(hass):
+    """Регистрирует команды websocket API интеграции (один раз на экземпляр Home Assistant)."""
+    if DATA_WEBSOCKET in hass.data:
+        return
+    hass.data[DATA_WEBSOCKET] = {}
+    websocket_api.async_register_command(hass, websocket_forecast)
+    websocket_api.async_register_command(hass, websocket_subscribe_forecast)
+
+
+@callback
+def async_close_subscriptions(hass, entry_id: str):
+    """Закрывает подписки на прогноз выгружаемой записи."""
+    for close in list(hass.data.get(DATA_WEBSOCKET, {}).get(entry_id, {}).values()):
+        close()
+
+
+def _snapshot(coordinator, variables):
+    merged = coordinator.merged_data
+    return ColumnarSnapshot.from_series(merged.series if merged else None, variables)
+
+
+def _get_coordinator(hass, connection, msg):
+    coordinator = hass.data.get(DOMAIN, {}).get(msg["entry_id"])
+    if coordinator is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, f"Entry {msg['entry_id']} not found")
+    return coordinator
+
+
+@websocket_api.websocket_command({vol.Required("type"): f"{DOMAIN}/forecast", **_COMMAND_SCHEMA})
+@callback
+def websocket_forecast(hass, connection, msg):
+    """Возвращает полный колоночный снимок прогноза."""
+    coordinator = _get_coordinator(hass, connection, msg)
+    if coordinator is None:
+        return
+    connection.send_result(msg["id"], _snapshot(coordinator, msg.get("variables")).full_message())
+
+
+@websocket_api.websocket_command({vol.Required("type"): f"{DOMAIN}/forecast/subscribe", **_COMMAND_SCHEMA})
+@callback
+def websocket_subscribe_forecast(hass, connection, msg):
+    """Подписка на прогноз: полный снимок, затем только изменения после обновлений координатора."""
+    coordinator = _get_coordinator(hass, connection, msg)
+    if coordinator is None:
+        return
+    entry_id = msg["entry_id"]
+    variables = msg.get("variables")
+    # Последний отправленный этому клиенту снимок
+    sent = _snapshot(coordinator, variables)
+    subscriptions = hass.data[DATA_WEBSOCKET].setdefault(entry_id, {})
+    key = (id(connection), msg["id"])
+
+    @callback
+    def forward_update():
+        nonlocal sent
+        if hass.data.get(DOMAIN, {}).get(entry_id) is not coordinator:
+            # Координатор записи заменён: обновления приходят уже от другого объекта
+            close()
+            return
+        snapshot = _snapshot(coordinator, variables)
+        message = snapshot.diff_message(sent)
+        sent = snapshot
+        if message is not None:
+            connection.send_message(websocket_api.event_message(msg["id"], message))
+
+    remove_listener = coordinator.async_add_listener(forward_update)
+
+    @callback
+    def unsubscribe():
+        remove_listener()
+        subscriptions.pop(key, None)
+
+    @callback
+    def close():
+        unsubscribe()
+        connection.subscriptions.pop(msg["id"], None)
+        connection.send_message(websocket_api.error_message(
+            msg["id"], websocket_api.ERR_NOT_FOUND, f"Entry {entry_id} was unloaded"
+        ))
+        _LOGGER.debug("Подписка websocket %s закрыта: запись %s выгружена", msg["id"], entry_id)
+
+    subscriptions[key] = close
+    connection.subscriptions[msg["id"]] = unsubscribe
+    connection.send_result(msg["id"])
+    connection.send_message(websocket_api.event_message(msg["id"], sent.full_message()))
+    _LOGGER.debug("Подписка websocket %s на прогноз записи %s", msg["id"], msg["entry_id"])
@@ -0,0 +1,267 @@
+"""
+bench_entities.py
+
+Entity fan-out benchmark on a stub Home Assistant core (tools/stub_hass.py).
+
+For every combination of the grid (config entries x selected allergens x forecast
+on/off) the real SilamCoordinator, sensor and weather platforms are set up on the
+stub core and driven through refresh and polling cycles. The coordinator replays
+generated SILAM responses through the record/replay path (cassette.py), so the
+timings include parsing and merging but no network.
+
+Reported per grid point:
+  setup     - time to set up all entries (coordinator, first refresh, platforms)
+  refresh   - one requested refresh (all feeds) of every entry, total
+  fan-out   - part of the refresh spent in coordinator listeners plus the tasks they schedule
+  poll      - one polling cycle of the polled entities, if any (async_update + state write)
+  writes    - state writes per refresh + poll cycle, and how many of them changed a state
+  attrs     - attribute JSON bytes written per cycle / bytes the recorder would store
+  dropped   - coroutines returned by listeners that nobody awaits, per cycle
+
+Usage:
+  python tools/bench_entities.py [--entries 1,10,100] [--allergens 0,1,3,7]
+                                 [--forecast on,off] [--cycles N] [--hours H]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stub_hass  # noqa: E402
+
+stub_hass.install()
+
+from integration import load  # noqa: E402
+
+const = load("const")
+cassette = load("cassette")
+coordinator_module = load("coordinator")
+sensor = load("sensor")
+weather = load("weather")
+
+ALLERGENS = sorted(const.URL_VAR_MAPPING)
+BASE_URL = const.BASE_URL_V6_0
+# Distinct responses per request label: consecutive refreshes see changed values
+VARIANTS = 2
+
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _response(rng, start: int, hours: int, variables, altitude: str) -> str:
+    parts = ["<grid>"]
+    for hour in range(max(hours, 1)):
+        parts.append(
+            f'<stationFeature date="{_iso(start + 3600 * hour)}">'
+            f'<station name="GridPoint" latitude="60.1" longitude="24.9" altitude="{altitude}">x</station>'
+        )
+        for name, units, low, high in variables:
+            parts.append(f'<data name="{name}" units="{units}">{rng.uniform(low, high):.4f}</data>')
+        parts.append("</stationFeature>")
+    parts.append("</grid>")
+    return "".join(parts)
+
+
+def write_archive(path: str, allergens, hours: int, seed: int) -> None:
+    """Index and main responses starting at the current hour, VARIANTS of each."""
+    rng = random.Random(seed)
+    start = int(time.time() // 3600 * 3600)
+    index_variables = (("POLI", "", 0.5, 5.9), ("POLISRC", "", -1, 7), ("temp_2m", "K", 255, 305))
+    main_variables = [(const.URL_VAR_MAPPING[key], "grains/m3", 0, 800) for key in allergens]
+    writer = cassette.ArchiveWriter(path)
+    for _ in range(VARIANTS):
+        labels = [("index", index_variables, "0")]
+        if allergens:
+            labels.append(("main", main_variables, "12.0"))
+        for label, variables, altitude in labels:
+            writer.write({
+                "url": BASE_URL,
+                "label": label,
+                "status": 200,
+                "headers": {},
+                "time": start,
+                "elapsed": 0,
+                "body": cassette.encode_body(_response(rng, start, hours + 1, variables, altitude)),
+            })
+
+
+class Bench:
+    """One grid point: entries entries with the same options on one stub core."""
+
+    def __init__(self, config_dir: str, entries: int, allergens, forecast: bool, hours: int):
+        self.hass = stub_hass.HomeAssistant(config_dir)
+        self.entries = [
+            stub_hass.ConfigEntry(
+                f"entry{number:03d}",
+                f"Home {number}",
+                {
+                    "base_url": BASE_URL,
+                    "manual_coordinates": True,
+                    "latitude": 60.1,
+                    "longitude": 24.9,
+                    "altitude": 12,
+                    "var": list(allergens),
+                    "update_interval": 60,
+                    "forecast": forecast,
+                },
+                {"forecast_hours": hours, "cassette": "replay", "cassette_speed": 0},
+            )
+            for number in range(entries)
+        ]
+        self.platforms = []
+        self.coordinators = []
+
+    async def async_setup_entry(self, entry) -> None:
+        """The coordinator part of async_setup_entry in __init__.py, then the platforms."""
+        hass = self.hass
+        data, options = entry.data, entry.options
+        coordinator = coordinator_module.SilamCoordinator(
+            hass,
+            entry.title,
+            data["var"],
+            data["manual_coordinates"],
+            data["latitude"],
+            data["longitude"],
+            data["altitude"],
+            data["update_interval"],
+            data["base_url"],
+            forecast=data["forecast"],
+            entry_id=entry.entry_id,
+            forecast_hours=options["forecast_hours"],
+        )
+        await coordinator.async_load_history()
+        await coordinator.async_set_cassette(options["cassette"], options["cassette_speed"])
+        await coordinator.async_config_entry_first_refresh()
+        hass.data.setdefault(const.DOMAIN, {})[entry.entry_id] = coordinator
+        self.coordinators.append(coordinator)
+
+        modules = [("sensor", sensor)]
+        if data["forecast"]:
+            modules.append(("weather", weather))
+        for domain, module in modules:
+            platform = stub_hass.EntityPlatform(hass, domain)
+            self.platforms.append(platform)
+            await module.async_setup_entry(hass, entry, platform.async_add_entities)
+
+    async def async_setup(self) -> float:
+        started = time.perf_counter()
+        for entry in self.entries:
+            await self.async_setup_entry(entry)
+        await self.hass.async_block_till_done()
+        return time.perf_counter() - started
+
+    async def async_cycle(self):
+        """Refresh every coordinator, then poll every platform. Returns (refresh, fan-out, poll) seconds."""
+        metrics = self.hass.metrics
+        listeners_before = metrics.listener_seconds
+        started = time.perf_counter()
+        for coordinator in self.coordinators:
+            # A requested refresh downloads every feed, whatever their intervals
+            await coordinator.async_request_refresh()
+        deferred = time.perf_counter()
+        await self.hass.async_block_till_done()
+        refreshed = time.perf_counter()
+        fanout = metrics.listener_seconds - listeners_before + refreshed - deferred
+        for platform in self.platforms:
+            await platform.async_poll()
+        return refreshed - started, fanout, time.perf_counter() - refreshed
+
+
+async def async_run_point(args, entries: int, allergen_count: int, forecast: bool) -> dict:
+    allergens = ALLERGENS[:allergen_count]
+    config_dir = tempfile.mkdtemp(prefix="silam_bench_")
+    try:
+        template = os.path.join(config_dir, "template")
+        write_archive(template, allergens, args.hours, args.seed)
+        bench = Bench(config_dir, entries, allergens, forecast, args.hours)
+        for entry in bench.entries:
+            shutil.copytree(template, cassette.cassette_path(bench.hass, entry.entry_id))
+
+        setup = await bench.async_setup()
+        entities = sum(len(platform.entities) for platform in bench.platforms)
+        metrics = bench.hass.metrics
+        metrics.reset()
+        totals = [0.0, 0.0, 0.0]
+        for _ in range(args.cycles):
+            for position, seconds in enumerate(await bench.async_cycle()):
+                totals[position] += seconds
+        cycles = args.cycles
+        return {
+            "entries": entries,
+            "allergens": allergen_count,
+            "forecast": "on" if forecast else "off",
+            "entities": entities,
+            "setup_ms": setup * 1000,
+            "refresh_ms": totals[0] / cycles * 1000,
+            "fanout_ms": totals[1] / cycles * 1000,
+            "poll_ms": totals[2] / cycles * 1000,
+            "writes": metrics.writes / cycles,
+            "changes": metrics.changes / cycles,
+            "attr_kb": metrics.attribute_bytes / cycles / 1024,
+            "recorded_kb": metrics.recorded_bytes / cycles / 1024,
+            "dropped": metrics.dropped_coroutines / cycles,
+        }
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+
+COLUMNS = (  # (name, format spec)
+    ("entries", "7"),
+    ("allergens", "9"),
+    ("forecast", "8"),
+    ("entities", "8"),
+    ("setup_ms", "9.1f"),
+    ("refresh_ms", "10.1f"),
+    ("fanout_ms", "9.2f"),
+    ("poll_ms", "8.2f"),
+    ("writes", "7.0f"),
+    ("changes", "7.0f"),
+    ("attr_kb", "8.1f"),
+    ("recorded_kb", "11.1f"),
+    ("dropped", "7.0f"),
+)
+
+
+def _int_list(text: str):
+    return [int(part) for part in text.split(",") if part]
+
+
+async def async_main(args) -> None:
+    print(" ".join(f"{name:>{spec.split('.')[0]}}" for name, spec in COLUMNS))
+    for forecast in args.forecast:
+        for entries in args.entries:
+            for allergen_count in args.allergens:
+                row = await async_run_point(args, entries, allergen_count, forecast)
+                print(" ".join(format(row[name], ">" + spec) for name, spec in COLUMNS), flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--entries", type=_int_list, default=[1, 10, 100], help="config entries per grid point")
+    parser.add_argument("--allergens", type=_int_list, default=[0, 1, 3, 7],
+                        help=f"selected allergens per entry (0-{len(ALLERGENS)})")
+    parser.add_argument("--forecast", default=[True, False],
+                        type=lambda text: [part == "on" for part in text.split(",") if part],
+                        help="forecast option values: on,off")
+    parser.add_argument("--cycles", type=int, default=5, help="refresh + poll cycles per grid point")
+    parser.add_argument("--hours", type=int, default=const.DEFAULT_FORECAST_HOURS,
+                        help="forecast hours of the replayed responses")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    if any(count > len(ALLERGENS) for count in args.allergens):
+        parser.error(f"at most {len(ALLERGENS)} allergens")
+    asyncio.run(async_main(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
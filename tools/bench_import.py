@@ -0,0 +1,118 @@
+"""
+bench_import.py
+
+Import-time regression benchmark for the SILAM Pollen integration.
+
+Every scenario imports the modules Home Assistant would load for it (the package
+__init__ plus platforms) in a fresh interpreter on the stub core (tools/stub_hass.py),
+with -X importtime. The stub core and the modules Home Assistant itself always has
+loaded (asyncio, aiohttp, logging, ...) are imported first, so the time reported is
+what the integration adds.
+
+Scenarios:
+  setup     - package __init__ and the sensor platform (every entry)
+  forecast  - setup plus the weather platform (forecast option on)
+  threshold - setup plus the binary_sensor platform (thresholds configured)
+
+Each scenario lists integration modules that must stay deferred on its path
+(config and options flow, forecast machinery without forecasts, debug and
+profiling tools, prefetched responses). Loading one of them, or exceeding
+--budget-ms, is a regression: the exit status is 1.
+
+Usage:
+  python tools/bench_import.py [--repeat N] [--budget-ms MS] [--detail K]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+TOOLS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TOOLS)
+PACKAGE = "custom_components.silam_pollen"
+
+# Loaded before the measured imports: the stub core and what Home Assistant always has loaded
+PRELOAD = ("asyncio", "logging", "json", "aiohttp", "async_timeout", "voluptuous", "xml.etree.ElementTree")
+
+# Integration modules loaded only when a flow, a service or a debug option needs them
+ON_DEMAND = ("config_flow", "migration", "profiling", "cassette", "prefetch", "blending", "websocket", "columnar", "streaming")
+# Forecast machinery: weather entity, sliding windows, local calendar
+FORECAST = ("weather", "pollen_forecast", "rolling", "local_calendar")
+
+SCENARIOS = {  # name: (platforms, modules that must not be loaded)
+    "setup": (("sensor",), ON_DEMAND + FORECAST + ("binary_sensor",)),
+    "forecast": (("sensor", "weather"), ON_DEMAND + ("binary_sensor",)),
+    "threshold": (("sensor", "binary_sensor"), ON_DEMAND + FORECAST),
+}
+
+CHILD = """
+import sys, time
+sys.path[:0] = [{tools!r}, {root!r}]
+import stub_hass
+stub_hass.install()
+for name in {preload!r}:
+    __import__(name)
+before = set(sys.modules)
+started = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - started
+print(elapsed)
+print(" ".join(sorted(set(sys.modules) - before)))
+"""
+
+IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def run_scenario(platforms):
+    """One fresh interpreter: (seconds, newly loaded module names, {module: self microseconds})."""
+    modules = [PACKAGE] + [f"{PACKAGE}.{platform}" for platform in platforms]
+    code = CHILD.format(tools=TOOLS, root=ROOT, preload=PRELOAD, modules=modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"import failed: {errors[-1] if errors else result.returncode}")
+    elapsed, loaded = result.stdout.splitlines()[:2]
+    loaded = set(loaded.split())
+    self_times = {}
+    for match in IMPORTTIME.finditer(result.stderr):
+        if match.group(4) in loaded:
+            self_times[match.group(4)] = int(match.group(1))
+    return float(elapsed), loaded, self_times
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per scenario; the fastest counts")
+    parser.add_argument("--budget-ms", type=float, help="fail if a scenario imports slower than this")
+    parser.add_argument("--detail", type=int, default=0, help="print the K slowest modules of each scenario")
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'scenario':10} {'import_ms':>9} {'modules':>7} {'own':>4}  deferred modules loaded")
+    for name, (platforms, deferred) in SCENARIOS.items():
+        try:
+            runs = [run_scenario(platforms) for _ in range(max(args.repeat, 1))]
+        except RuntimeError as err:
+            print(f"{name:10} {err}")
+            failures.append(f"{name}: {err}")
+            continue
+        elapsed, loaded, self_times = min(runs, key=lambda run: run[0])
+        own = sorted(module for module in loaded if module.startswith(PACKAGE + "."))
+        violations = [module for module in deferred if f"{PACKAGE}.{module}" in loaded]
+        print(f"{name:10} {elapsed * 1000:9.2f} {len(loaded):7} {len(own):4}  {', '.join(violations) or '-'}")
+        if violations:
+            failures.append(f"{name}: loads {', '.join(violations)}")
+        if args.budget_ms is not None and elapsed * 1000 > args.budget_ms:
+            failures.append(f"{name}: {elapsed * 1000:.2f} ms > {args.budget_ms} ms")
+        for module, micros in sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:args.detail]:
+            print(f"    {micros / 1000:8.2f} ms  {module}")
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+bench_memory.py
+
+Peak-memory benchmark of one SILAM Pollen refresh, normal vs low-memory mode.
+
+Each grid point builds a real SilamCoordinator on the stub core (tools/stub_hass.py) and
+runs one full refresh against an in-process server: gzip-compressed SILAM-like responses
+are generated before the measurement and streamed in DOWNLOAD_CHUNK_SIZE pieces, like
+a socket would deliver them. tracemalloc records the peak of Python allocations during
+the refresh (download, decompression, parsing, merging, forecasts) above what was
+allocated before it.
+
+In low-memory mode (the "low_memory" option) the peak must stay within the memory budget
+(--budget-mb, the "memory_budget" option, 0.5 MB by default: below the normal-mode peak of
+the larger grid points, so a regression of the low-memory path fails here). The budget
+covers the whole refresh - the decompressor, the pull parser and its texts, the dataset
+description, the series and the forecast building; the peak it accounted
+(coordinator.memory_peak) is reported next to the measured one. Exceeding the budget,
+a refresh the budget stopped, or a refresh whose data differs between the modes is a
+failure: the exit status is 1.
+
+Usage:
+  python tools/bench_memory.py [--budget-mb MB] [--allergens 1,7] [--hours 36,120] [--altitudes 1,3]
+"""
+
+import argparse
+import asyncio
+import gzip
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stub_hass  # noqa: E402
+
+stub_hass.install()
+
+from integration import load  # noqa: E402
+
+const = load("const")
+coordinator_module = load("coordinator")
+# Modules the refresh loads on first use are imported outside the measurement
+load("streaming")
+
+INDEX_VARIABLES = (("POLI", "", 0.5, 5.9), ("POLISRC", "", -1, 7), ("temp_2m", "K", 255, 305))
+EXTRA_ALTITUDES = (50, 275)
+
+
+def _response(rng, start: int, points: int, variables, altitude: str) -> bytes:
+    parts = ['<?xml version="1.0" encoding="UTF-8"?><stationFeatureCollection>']
+    for hour in range(points):
+        date = datetime.fromtimestamp(start + 3600 * hour, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        parts.append(
+            f'<stationFeature date="{date}">'
+            f'<station name="GridPoint" latitude="60.1" longitude="24.9" altitude="{altitude}">GridPoint</station>'
+        )
+        for name, units, low, high in variables:
+            parts.append(f'<data name="{name}" units="{units}">{rng.uniform(low, high):.4f}</data>')
+        parts.append("</stationFeature>")
+    parts.append("</stationFeatureCollection>")
+    return gzip.compress("".join(parts).encode())
+
+
+class _Content:
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def iter_chunked(self, size: int):
+        for start in range(0, len(self._body), size):
+            yield self._body[start:start + size]
+
+
+class _Response:
+    status = 200
+
+    def __init__(self, body: bytes):
+        self.headers = {"Content-Encoding": "gzip", "Content-Type": "application/xml"}
+        self.content = _Content(body)
+
+    async def read(self):
+        return b""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class Server:
+    """Compressed responses by request kind, generated once outside the measurement."""
+
+    def __init__(self, allergens, hours: int, seed: int = 1):
+        rng = random.Random(seed)
+        start = int(time.time() // 3600 * 3600)
+        main_variables = [(const.URL_VAR_MAPPING[key], "grains/m3", 0, 800) for key in allergens]
+        self.index = _response(rng, start, hours + 1, INDEX_VARIABLES, "0")
+        self.main = _response(rng, start, hours + 1, main_variables, "12.0")
+        self.requests = 0
+
+    def session(self):
+        server = self
+
+        class Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def get(self, url, **kwargs):
+                server.requests += 1
+                return _Response(server.index if "var=POLI" in url else server.main)
+
+        return Session()
+
+
+async def async_refresh(config_dir: str, server: Server, allergens, hours: int, altitudes: int,
+                        low_memory: bool, budget_mb: float):
+    """One full refresh: (tracemalloc peak bytes, coordinator)."""
+    hass = stub_hass.HomeAssistant(config_dir)
+    coordinator = coordinator_module.SilamCoordinator(
+        hass, "bench", list(allergens), True, 60.1, 24.9, 12, 60, const.BASE_URL_V6_0,
+        forecast=True, forecast_hours=hours, extra_altitudes=EXTRA_ALTITUDES[:altitudes - 1],
+        low_memory=low_memory, memory_budget=budget_mb,
+    )
+    coordinator._prefetch_pending = False
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    try:
+        await coordinator.async_full_refresh()
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return peak, coordinator
+
+
+def _same_data(first, second) -> bool:
+    a, b = first.merged_data, second.merged_data
+    return a.as_dict() == b.as_dict() and list(a.series.values) == list(b.series.values)
+
+
+def _csv(text: str):
+    return [int(item) for item in text.split(",") if item]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--budget-mb", type=float, default=const.DEFAULT_MEMORY_BUDGET_MB,
+                        help="memory budget of the low-memory mode (MB)")
+    parser.add_argument("--allergens", default="1,7", help="numbers of allergens")
+    parser.add_argument("--hours", default=f"{const.DEFAULT_FORECAST_HOURS},{const.MAX_FORECAST_HOURS}",
+                        help="forecast horizons (hours)")
+    parser.add_argument("--altitudes", default="1,3", help="altitudes of the vertical profile (1-3)")
+    args = parser.parse_args(argv)
+
+    budget = int(args.budget_mb * 1024 * 1024)
+    keys = list(const.URL_VAR_MAPPING)
+    failures = []
+    print(f"{'allergens':>9} {'hours':>5} {'alts':>4} {'normal_kb':>9} {'low_kb':>7} {'accounted_kb':>12} {'ratio':>6}")
+    with tempfile.TemporaryDirectory() as config_dir:
+        original_session = coordinator_module.client_session
+        try:
+            for count, hours, altitudes in itertools.product(_csv(args.allergens), _csv(args.hours), _csv(args.altitudes)):
+                allergens = keys[:count]
+                server = Server(allergens, hours)
+                coordinator_module.client_session = server.session
+                # Warm-up: caches filled on the first refresh (local calendar, interned names) are not measured
+                for low_memory in (False, True):
+                    asyncio.run(async_refresh(config_dir, server, allergens, hours, altitudes, low_memory, args.budget_mb))
+                normal, reference = asyncio.run(
+                    async_refresh(config_dir, server, allergens, hours, altitudes, False, args.budget_mb)
+                )
+                low, coordinator = asyncio.run(
+                    async_refresh(config_dir, server, allergens, hours, altitudes, True, args.budget_mb)
+                )
+                name = f"{count} allergens, {hours} h, {altitudes} altitudes"
+                if not coordinator.last_update_success or not coordinator.merged_data:
+                    failures.append(f"{name}: low-memory refresh failed")
+                elif not _same_data(reference, coordinator):
+                    failures.append(f"{name}: data differs from the normal mode")
+                if low > budget:
+                    failures.append(f"{name}: peak {low / 1024:.0f} kB > budget {budget / 1024:.0f} kB")
+                accounted = coordinator.memory_peak or 0
+                print(f"{count:9} {hours:5} {altitudes:4} {normal / 1024:9.0f} {low / 1024:7.0f} "
+                      f"{accounted / 1024:12.1f} {low / normal:6.2f}")
+        finally:
+            coordinator_module.client_session = original_session
+    for failure in failures:
+        print(f"FAILED {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
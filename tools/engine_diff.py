@@ -0,0 +1,449 @@
+"""
+engine_diff.py
+
+Differential correctness harness for the forecast engine.
+
+Runs the live merge_station_features (custom_components/silam_pollen/data_processing.py)
+and the frozen reference (tools/reference_engine.py) on the same inputs, reports every
+divergence and the relative speed of the two engines.
+
+Inputs:
+  - generated cases: random time zones (DST, half-hour and 45-minute offsets), clock
+    instants around DST transitions, blank values, variables missing from
+    some time steps, gaps, half-hour offsets and misaligned index/main time axes;
+  - recorded cases: index/main response pairs from a record/replay archive
+    (the "cassette" option, see cassette.py), evaluated at the time they were recorded
+    in every test time zone.
+
+Both engines see the same frozen wall clock (their module-level datetime is replaced
+for the duration of a case) and the same process time zone (TZ + time.tzset, POSIX only).
+Nothing is normalized: every difference is reported. The only outputs not taken from the
+reference are the intentional calendar changes: twice_daily_forecast groups local day halves
+instead of 12-hour windows from now and daily_forecast is new. Both are compared with an
+oracle (expected_calendar) that assigns every timestamp to its local half and day with
+zoneinfo and aggregates with the reference rules. NaN text is generated only with --nan:
+the live engine treats it as a missing value while the reference propagates NaN through
+max() and median(), so those cases are expected to diverge.
+
+Usage:
+  python tools/engine_diff.py [--cases N] [--seed S] [--cassette DIR] [--repeat R] [--show K]
+"""
+
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+
+try:
+    import zoneinfo
+except ImportError:  # Python < 3.9: no DST-targeted instants
+    zoneinfo = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import reference_engine  # noqa: E402
+from integration import load  # noqa: E402
+
+data_processing = load("data_processing")
+
+ZONES = (
+    "UTC",
+    "Europe/Helsinki",
+    "Europe/Berlin",
+    "Europe/London",
+    "America/New_York",
+    "America/St_Johns",
+    "Asia/Kolkata",
+    "Australia/Lord_Howe",
+    "Pacific/Chatham",
+    "Pacific/Kiritimati",
+)
+YEARS = range(2024, 2028)
+
+INDEX_VARIABLES = (("POLI", "", 0.5, 5.9), ("POLISRC", "", -1, 7), ("temp_2m", "K", 255, 305))
+ALLERGENS = {
+    key: (variable, "grains/m3", 0, 800)
+    for key, variable in reference_engine.URL_VAR_MAPPING.items()
+}
+
+class Case:
+    """One engine input: responses, selected allergens, frozen clock and time zone."""
+
+    __slots__ = ("name", "zone", "now", "index_xml", "main_xml", "allergens", "forecast")
+
+    def __init__(self, name, zone, now, index_xml, main_xml, allergens, forecast):
+        self.name = name
+        self.zone = zone
+        self.now = now
+        self.index_xml = index_xml
+        self.main_xml = main_xml
+        self.allergens = allergens
+        self.forecast = forecast
+
+    def describe(self) -> str:
+        now = datetime.fromtimestamp(self.now, timezone.utc).isoformat(timespec="seconds")
+        return f"{self.name} zone={self.zone} now={now} forecast={self.forecast} allergens={self.allergens}"
+
+
+# --- Clock and time zone -------------------------------------------------------------------
+
+def frozen_datetime(ts: float):
+    """datetime subclass whose now()/utcnow() return the instant ts."""
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(ts, tz)
+
+        @classmethod
+        def utcnow(cls):
+            return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+    return FrozenDatetime
+
+
+def set_zone(zone: str) -> None:
+    os.environ["TZ"] = zone
+    time.tzset()
+
+
+_TRANSITIONS = {}
+
+
+def dst_transitions(zone: str):
+    """UTC instants (s) at which the zone's offset changes in YEARS (found with an hourly scan)."""
+    if zone not in _TRANSITIONS:
+        instants = []
+        if zoneinfo is not None:
+            tz = zoneinfo.ZoneInfo(zone)
+            ts = datetime(YEARS[0], 1, 1, tzinfo=timezone.utc).timestamp()
+            end = datetime(YEARS[-1] + 1, 1, 1, tzinfo=timezone.utc).timestamp()
+            previous = datetime.fromtimestamp(ts, tz).utcoffset()
+            while ts < end:
+                ts += 3600
+                offset = datetime.fromtimestamp(ts, tz).utcoffset()
+                if offset != previous:
+                    instants.append(ts)
+                    previous = offset
+        _TRANSITIONS[zone] = instants
+    return _TRANSITIONS[zone]
+
+
+# --- Generated inputs ----------------------------------------------------------------------
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _axis(rng, start: int, hours: int):
+    """Hourly axis with optional gaps and half-hour offsets."""
+    axis = [start + 3600 * hour for hour in range(hours)]
+    if rng.random() < 0.3:
+        axis = [ts for ts in axis if rng.random() > 0.15]
+    if rng.random() < 0.15:
+        axis = sorted({ts + 1800 if rng.random() < 0.2 else ts for ts in axis})
+    return axis
+
+
+def _value(rng, low, high, missing, nan):
+    roll = rng.random()
+    if roll < missing:
+        return None
+    if nan and roll < missing + 0.01:
+        return "NaN"
+    return f"{rng.uniform(low, high):.4f}"
+
+
+def _response(rng, axis, variables, altitude, missing, dropped, nan):
+    parts = ["<grid>"]
+    for ts in axis:
+        parts.append(
+            f'<stationFeature date="{_iso(ts)}">'
+            f'<station name="GridPoint" latitude="60.1" longitude="24.9" altitude="{altitude}">x</station>'
+        )
+        for name, units, low, high in variables:
+            if rng.random() < dropped:
+                continue
+            text = _value(rng, low, high, missing, nan)
+            if text is None:
+                parts.append(f'<data name="{name}" units="{units}"/>')
+            else:
+                parts.append(f'<data name="{name}" units="{units}">{text}</data>')
+        parts.append("</stationFeature>")
+    parts.append("</grid>")
+    return ET.fromstring("".join(parts))
+
+
+def generated_case(index: int, seed: int, nan: bool = False) -> Case:
+    rng = random.Random(seed * 1_000_003 + index)
+    zone = rng.choice(ZONES)
+    transitions = dst_transitions(zone)
+    if transitions and rng.random() < 0.5:
+        now = rng.choice(transitions) + rng.uniform(-36 * 3600, 12 * 3600)
+    else:
+        start = datetime(YEARS[0], 1, 1, tzinfo=timezone.utc).timestamp()
+        end = datetime(YEARS[-1] + 1, 1, 1, tzinfo=timezone.utc).timestamp()
+        now = rng.uniform(start, end)
+    start = int(now // 3600 * 3600) + 3600 * rng.randint(-4, 2)
+
+    missing = rng.choice((0.0, 0.05, 0.2, 0.5))
+    dropped = rng.choice((0.0, 0.0, 0.05))
+    index_axis = _axis(rng, start, rng.randint(0, 60))
+    index_xml = _response(rng, index_axis, INDEX_VARIABLES, "0", missing, dropped, nan)
+
+    allergens = rng.sample(sorted(ALLERGENS), rng.randint(0, 3))
+    main_xml = None
+    if allergens and rng.random() < 0.85:
+        if rng.random() < 0.3:
+            main_axis = _axis(rng, start + 3600 * rng.randint(-2, 2), rng.randint(0, 60))
+        else:
+            main_axis = index_axis
+        # A selected allergen may be missing from the response
+        published = [ALLERGENS[key] for key in allergens if rng.random() < 0.9]
+        altitude = rng.choice(("0", "12.0", "125.0"))
+        main_xml = _response(rng, main_axis, published, altitude, missing, dropped, nan)
+    return Case(f"gen-{index}", zone, now, index_xml, main_xml, allergens, rng.random() < 0.8)
+
+
+# --- Recorded inputs -----------------------------------------------------------------------
+
+def _query(url: str) -> dict:
+    params = {}
+    for param in url.partition("?")[2].split("&"):
+        name, _, value = param.partition("=")
+        params.setdefault(name, []).append(value)
+    return params
+
+
+def recorded_cases(path: str):
+    """Index/main pairs of a record/replay archive, each evaluated in every test zone."""
+    cassette = load("cassette")
+    reader = cassette.ArchiveReader(path)
+    keys = {variable: key for key, variable in reference_engine.URL_VAR_MAPPING.items()}
+    mains = [record for record in reader.records.get("main", []) if record["status"] == 200]
+    cases = []
+    for number, record in enumerate(reader.records.get("index", [])):
+        if record["status"] != 200:
+            continue
+        index_xml = ET.fromstring(cassette.decode_body(record["body"]))
+        forecast = _query(record["url"]).get("time_duration", ["PT0H"])[0] != "PT0H"
+        # The main response of the same refresh is the one recorded closest in time
+        main = min(mains, key=lambda item: abs(item["time"] - record["time"]), default=None)
+        main_xml, allergens = None, []
+        if main is not None and abs(main["time"] - record["time"]) < 120:
+            main_xml = ET.fromstring(cassette.decode_body(main["body"]))
+            allergens = [keys.get(variable, variable) for variable in _query(main["url"]).get("var", [])]
+        for zone in ZONES:
+            cases.append(Case(f"rec-{number}", zone, record["time"], index_xml, main_xml, allergens, forecast))
+    return cases
+
+
+# --- Comparison ----------------------------------------------------------------------------
+
+def first_difference(expected, actual, path="$"):
+    """Path and values of the first difference between two JSON-like structures or None."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in list(expected) + [key for key in actual if key not in expected]:
+            if key not in expected or key not in actual:
+                return f"{path}.{key}", expected.get(key, "<missing>"), actual.get(key, "<missing>")
+            difference = first_difference(expected[key], actual[key], f"{path}.{key}")
+            if difference is not None:
+                return difference
+        return None
+    if isinstance(expected, list) and isinstance(actual, list):
+        for position, (left, right) in enumerate(zip(expected, actual)):
+            difference = first_difference(left, right, f"{path}[{position}]")
+            if difference is not None:
+                return difference
+        if len(expected) != len(actual):
+            return f"{path}.length", len(expected), len(actual)
+        return None
+    if isinstance(expected, float) and isinstance(actual, float) and math.isnan(expected) and math.isnan(actual):
+        return None
+    if expected != actual or isinstance(expected, bool) != isinstance(actual, bool):
+        return path, expected, actual
+    return None
+
+
+def _parse_value(text, convert):
+    """Value of a <data> element as the reference converts it (None if blank or not a number)."""
+    if text is None:
+        return None
+    try:
+        return convert(float(text))
+    except (ValueError, TypeError):
+        return None
+
+
+def _features(xml_root) -> dict:
+    """{date: {variable: text}} of a response; a repeated date replaces the earlier record."""
+    features = {}
+    if xml_root is not None:
+        for feature in xml_root.iter("stationFeature"):
+            features[feature.get("date")] = {data.get("name"): data.text for data in feature.findall("data")}
+    return features
+
+
+def reference_points(case: Case):
+    """
+    Per-timestamp values of the merged responses converted as the reference does before
+    aggregating: [(epoch, temperature °C, index, {forecast key: value})] sorted by time.
+    """
+    index, main = _features(case.index_xml), _features(case.main_xml)
+    points = []
+    for date in set(index) | set(main):
+        data = {**index.get(date, {}), **main.get(date, {})}
+        ts = datetime.fromisoformat(date.rstrip("Z")).replace(tzinfo=timezone.utc).timestamp()
+        temperature = _parse_value(data.get("temp_2m"), lambda value: round(value - 273.15, 1))
+        allergens = {
+            "pollen_" + key.split("_")[0].lower():
+                _parse_value(data.get(reference_engine.URL_VAR_MAPPING.get(key, key)), int)
+            for key in case.allergens
+        }
+        points.append((ts, temperature, _parse_value(data.get("POLI"), int), allergens))
+    points.sort(key=lambda point: point[0])
+    return points
+
+
+def _local_midnight(day, tz, hour: int = 0) -> int:
+    return int(datetime.combine(day, datetime.min.time().replace(hour=hour), tzinfo=tz).timestamp())
+
+
+def _aggregate(group, allergens, label: int, is_daytime):
+    """Entry of a local day half or day built with the reference aggregation rules (None if empty)."""
+    temps = [point[1] for point in group if point[1] is not None]
+    indices = [point[2] for point in group if point[2] is not None]
+    if not (temps and indices):
+        return None
+    median_index = statistics.median(indices)
+    entry = {"datetime": datetime.fromtimestamp(label, timezone.utc).isoformat()}
+    if is_daytime is not None:
+        entry["is_daytime"] = is_daytime
+    entry.update({
+        "condition": reference_engine.INDEX_MAPPING.get(int(round(median_index)), "unknown"),
+        "native_temperature": round(max(temps), 1),
+    })
+    if is_daytime is None:
+        entry["native_temperature_unit"] = "°C"
+    entry.update({
+        "native_templow": round(min(temps), 1),
+        "pollen_index": int(math.ceil(median_index)),
+        "temperature": round(max(temps), 1),
+    })
+    for key in allergens:
+        values = [point[3][key] for point in group if point[3][key] is not None]
+        if values:
+            entry[key] = int(math.ceil(statistics.median(values)))
+    return entry
+
+
+def expected_calendar(case: Case):
+    """
+    Expected twice_daily_forecast and daily_forecast: the points in (now, now + forecast_hours]
+    assigned to local day halves (06-18 labelled 12:00, 18-06 labelled midnight) and local
+    calendar days one timestamp at a time, independently of the live engine's local_calendar.
+    """
+    if not case.forecast or case.index_xml is None:
+        return [], []
+    tz = zoneinfo.ZoneInfo(case.zone) if zoneinfo is not None else None
+    end = case.now + data_processing.DEFAULT_FORECAST_HOURS * 3600
+    halves, days = {}, {}
+    for point in reference_points(case):
+        if not case.now < point[0] <= end:
+            continue
+        local = datetime.fromtimestamp(point[0], tz)
+        day = local.date()
+        if 6 <= local.hour < 18:
+            half = (_local_midnight(day, tz, 12), True)
+        elif local.hour >= 18:
+            half = (_local_midnight(day + timedelta(days=1), tz), False)
+        else:
+            half = (_local_midnight(day, tz), False)
+        halves.setdefault(half, []).append(point)
+        days.setdefault(_local_midnight(day, tz), []).append(point)
+    allergens = list(dict.fromkeys("pollen_" + key.split("_")[0].lower() for key in case.allergens))
+    twice_daily = [_aggregate(group, allergens, label, daytime) for (label, daytime), group in sorted(halves.items())]
+    daily = [_aggregate(group, allergens, label, None) for label, group in sorted(days.items())]
+    return [entry for entry in twice_daily if entry], [entry for entry in daily if entry]
+
+
+def run_case(case: Case, repeat: int):
+    """Runs both engines; returns (difference or None, reference seconds, live seconds)."""
+    set_zone(case.zone)
+    clock = frozen_datetime(case.now)
+    time_zone = zoneinfo.ZoneInfo(case.zone) if zoneinfo is not None else None
+    saved = reference_engine.datetime, data_processing.datetime
+    reference_engine.datetime = data_processing.datetime = clock
+    try:
+        reference_time = live_time = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            expected = reference_engine.merge_station_features(
+                case.index_xml, case.main_xml, forecast_enabled=case.forecast, selected_allergens=case.allergens
+            )
+            reference_time = min(reference_time, time.perf_counter() - started)
+            started = time.perf_counter()
+            merged = data_processing.merge_station_features(
+                case.index_xml, case.main_xml, forecast_enabled=case.forecast, selected_allergens=case.allergens,
+                time_zone=time_zone,
+            )
+            live_time = min(live_time, time.perf_counter() - started)
+        actual = merged.as_dict()
+    finally:
+        reference_engine.datetime, data_processing.datetime = saved
+    # Local day halves and days replace the reference's 12-hour windows from now
+    expected["twice_daily_forecast"], expected["daily_forecast"] = expected_calendar(case)
+    return first_difference(expected, actual), reference_time, live_time
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--cases", type=int, default=500, help="number of generated cases")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated cases")
+    parser.add_argument("--cassette", help="record/replay archive directory with recorded responses")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest is timed")
+    parser.add_argument("--show", type=int, default=10, help="divergent cases to print")
+    parser.add_argument("--nan", action="store_true", help="also generate NaN text values (expected to diverge)")
+    args = parser.parse_args(argv)
+
+    cases = [generated_case(index, args.seed, args.nan) for index in range(args.cases)]
+    if args.cassette:
+        cases += recorded_cases(args.cassette)
+
+    original_zone = os.environ.get("TZ")
+    divergent = []
+    reference_total = live_total = 0.0
+    try:
+        for case in cases:
+            difference, reference_time, live_time = run_case(case, args.repeat)
+            reference_total += reference_time
+            live_total += live_time
+            if difference is not None:
+                divergent.append((case, difference))
+    finally:
+        if original_zone is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = original_zone
+        time.tzset()
+
+    print(f"cases: {len(cases)}")
+    print(f"divergent: {len(divergent)}")
+    for case, (path, expected, actual) in divergent[:args.show]:
+        print(f"  {case.describe()}")
+        print(f"    {path}: reference {expected!r} != live {actual!r}")
+    if live_total > 0:
+        print(
+            f"speed: reference {reference_total:.3f} s, live {live_total:.3f} s "
+            f"({reference_total / live_total:.2f}x)"
+        )
+    return 1 if divergent else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
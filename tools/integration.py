@@ -0,0 +1,31 @@
+"""
+integration.py
+
+Loads modules of the SILAM Pollen integration outside Home Assistant.
+
+The package __init__ imports Home Assistant, so the integration directory is
+registered as a bare package and only the requested submodules are imported.
+Modules that do not import Home Assistant themselves (data_processing, records,
+cassette, ...) then work in a plain Python environment.
+"""
+
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+PACKAGE = "silam_pollen"
+PACKAGE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "custom_components", PACKAGE
+)
+
+
+def load(module: str):
+    """Imports silam_pollen.<module> without running the package __init__."""
+    if PACKAGE not in sys.modules:
+        spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+        package = importlib.util.module_from_spec(spec)
+        package.__path__ = [PACKAGE_DIR]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module}")
@@ -0,0 +1,228 @@
+"""
+prefetch.py
+
+Headless batch download of SILAM responses for many locations.
+
+Every location of the input file is refreshed once by a real SilamCoordinator on the
+stub core (tools/stub_hass.py): the integration's URL builders, download layer
+(compression, size limit, hedging), parsing, merging and forecasts all run as they
+would in Home Assistant. The coordinator records its responses with the record/replay
+archive (cassette.py) into the prefetch directory of the location,
+<config>/silam_pollen/prefetch/<latitude>,<longitude>/. A new entry for the same
+coordinates, allergens, horizon and altitude then answers its first refresh from
+these responses (see custom_components/silam_pollen/prefetch.py) as long as they
+are younger than its update interval.
+
+Locations are refreshed concurrently: at most --parallel at a time and at most
+--rate requests per second over all of them. Pointed at a local stand-in server
+(--base-url), the run doubles as a throughput test of the download layer.
+
+Input: CSV with a header row. Columns (only latitude and longitude are required):
+  latitude, longitude   - coordinates as they are stored in the config entry
+  altitude              - metres above sea level (default 0)
+  allergens             - space-separated allergen keys (alder_m22 birch_m22 ...)
+  hours                 - forecast horizon (0 = current values only)
+  base_url              - SILAM dataset (default --base-url)
+
+Usage:
+  python tools/prefetch.py LOCATIONS.csv --config /config [--base-url URL]
+                           [--parallel N] [--rate R] [--json]
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stub_hass  # noqa: E402
+
+stub_hass.install()
+
+from integration import load  # noqa: E402
+
+const = load("const")
+cassette = load("cassette")
+coordinator_module = load("coordinator")
+prefetch = load("prefetch")
+
+
+class Location:
+    """One input row."""
+
+    __slots__ = ("latitude", "longitude", "altitude", "allergens", "hours", "base_url")
+
+    def __init__(self, row: dict, base_url: str):
+        self.latitude = float(row["latitude"])
+        self.longitude = float(row["longitude"])
+        self.altitude = float(row.get("altitude") or 0)
+        self.allergens = (row.get("allergens") or "").split()
+        unknown = [key for key in self.allergens if key not in const.URL_VAR_MAPPING]
+        if unknown:
+            raise ValueError(f"unknown allergens {unknown}")
+        self.hours = min(int(row.get("hours") or const.DEFAULT_FORECAST_HOURS), const.MAX_FORECAST_HOURS)
+        self.base_url = row.get("base_url") or base_url
+
+    def __str__(self) -> str:
+        return prefetch.location_key(self.latitude, self.longitude)
+
+
+def read_locations(path: str, base_url: str):
+    with open(path, newline="", encoding="utf-8") as file:
+        rows = [{key.strip(): (value or "").strip() for key, value in row.items() if key} for row in csv.DictReader(file)]
+    return [Location(row, base_url) for row in rows]
+
+
+class RateLimiter:
+    """At most rate acquisitions per second, spaced evenly (0 = unlimited)."""
+
+    def __init__(self, rate: float):
+        self._interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        if not self._interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        wait = self._next - now
+        self._next = max(now, self._next) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class Prefetcher:
+    """Refreshes locations on one stub core and collects transfer statistics."""
+
+    def __init__(self, config_dir: str, parallel: int, rate: float, update_interval: int):
+        self.hass = stub_hass.HomeAssistant(config_dir)
+        self._slots = asyncio.Semaphore(max(parallel, 1))
+        self._limiter = RateLimiter(rate)
+        self._update_interval = update_interval
+        self.latencies = []  # seconds per request
+        self.compressed = 0
+        self.uncompressed = 0
+
+    def _coordinator(self, location: Location):
+        coordinator = coordinator_module.SilamCoordinator(
+            self.hass,
+            str(location),
+            location.allergens,
+            True,
+            location.latitude,
+            location.longitude,
+            location.altitude,
+            self._update_interval,
+            location.base_url,
+            forecast=location.hours > 0,
+            forecast_hours=location.hours or const.DEFAULT_FORECAST_HOURS,
+        )
+        # Every request passes the rate limiter and is timed
+        request = coordinator._async_request_xml
+
+        async def limited_request(session, url, label):
+            await self._limiter.acquire()
+            started = time.monotonic()
+            root = await request(session, url, label)
+            self.latencies.append(time.monotonic() - started)
+            return root
+
+        coordinator._async_request_xml = limited_request
+        return coordinator
+
+    async def async_fetch(self, location: Location) -> dict:
+        """Refreshes one location and records its responses; returns a result row."""
+        async with self._slots:
+            path = prefetch.prefetch_path(self.hass, location.latitude, location.longitude)
+            # Responses of an earlier run are replaced
+            await self.hass.async_add_executor_job(shutil.rmtree, path, True)
+            coordinator = self._coordinator(location)
+            coordinator.cassette = cassette.Cassette(self.hass, path, "record")
+            started = time.monotonic()
+            try:
+                await coordinator.async_refresh()
+            except Exception as err:
+                return {"location": str(location), "ok": False, "error": str(err),
+                        "seconds": time.monotonic() - started}
+            merged = coordinator.merged_data
+            for stats in coordinator.transfers.values():
+                if stats is not None:
+                    self.compressed += stats.compressed
+                    self.uncompressed += stats.uncompressed
+            return {
+                "location": str(location),
+                "ok": merged.now_time is not None,
+                "hours": len(merged.series.times) if merged.series is not None else 0,
+                "requests": len(coordinator.sources),
+                "seconds": time.monotonic() - started,
+            }
+
+    async def async_run(self, locations):
+        results = await asyncio.gather(*(self.async_fetch(location) for location in locations))
+        # Archive writes run in the executor
+        await self.hass.async_block_till_done()
+        return results
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def async_main(args) -> int:
+    locations = read_locations(args.locations, args.base_url)
+    prefetcher = Prefetcher(args.config, args.parallel, args.rate, args.update_interval)
+    started = time.monotonic()
+    results = await prefetcher.async_run(locations)
+    elapsed = time.monotonic() - started
+    ok = [result for result in results if result["ok"]]
+    summary = {
+        "locations": len(results),
+        "ok": len(ok),
+        "failed": len(results) - len(ok),
+        "seconds": round(elapsed, 3),
+        "locations_per_s": round(len(results) / elapsed, 2) if elapsed else None,
+        "requests": len(prefetcher.latencies),
+        "requests_per_s": round(len(prefetcher.latencies) / elapsed, 2) if elapsed else None,
+        "latency_p50_ms": round(_percentile(prefetcher.latencies, 0.5) * 1000, 1),
+        "latency_p95_ms": round(_percentile(prefetcher.latencies, 0.95) * 1000, 1),
+        "compressed_mb": round(prefetcher.compressed / 1e6, 3),
+        "uncompressed_mb": round(prefetcher.uncompressed / 1e6, 3),
+    }
+    if args.json:
+        print(json.dumps({"summary": summary, "results": results}, indent=2))
+    else:
+        for result in results:
+            if not result["ok"]:
+                print(f"FAILED {result['location']}: {result.get('error', 'no data')}")
+        for key, value in summary.items():
+            print(f"{key:16} {value}")
+    return 0 if len(ok) == len(results) else 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("locations", help="CSV file of locations")
+    parser.add_argument("--config", required=True, help="Home Assistant configuration directory")
+    parser.add_argument("--base-url", default=const.BASE_URL_V6_0, help="default SILAM dataset URL")
+    parser.add_argument("--parallel", type=int, default=8, help="locations refreshed at the same time")
+    parser.add_argument("--rate", type=float, default=5.0, help="requests per second over all locations (0 = unlimited)")
+    parser.add_argument("--update-interval", type=int, default=const.DEFAULT_UPDATE_INTERVAL,
+                        help="update interval (minutes) of the entries; only used to build the coordinators")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+    try:
+        return asyncio.run(async_main(args))
+    except (OSError, ValueError, KeyError) as err:
+        parser.error(str(err))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
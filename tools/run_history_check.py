@@ -0,0 +1,133 @@
+"""
+run_history_check.py
+
+Scenario checks of the run history ring buffer (custom_components/silam_pollen/run_history.py).
+
+Scenarios:
+  shifted   - one model run refreshed hourly: every refresh is a window of the same run
+              shifted by an hour, its last hour falls past the end of the previous window.
+              Only the first push is a new run; the others are repeats.
+  revised   - a new model run after the hourly refreshes: it is stored, its revision
+              is measured on the hours both runs have.
+  disjoint  - runs without a single common value are never repeats.
+  capacity  - hourly refreshes of one run do not push earlier runs out of the buffer.
+
+A failed scenario is reported and the exit status is 1.
+
+Usage:
+  python tools/run_history_check.py [--hours H] [--refreshes N]
+"""
+
+import argparse
+import os
+import sys
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stub_hass  # noqa: E402
+
+stub_hass.install()
+
+from integration import load  # noqa: E402
+
+run_history = load("run_history")
+records = load("records")
+
+VARIABLE = "POLI"
+T0 = 1_790_000_000 // 3600 * 3600
+
+
+def _model_run(analysis: int, offset: float = 0.0):
+    """Values of one model run: fixed for every absolute hour, differ between runs by offset."""
+    return lambda ts: (ts - analysis) / 3600 % 17 + 1.0 + offset
+
+
+def _window(run, start: int, hours: int):
+    series = records.ForecastSeries()
+    series.times = array("q", (start + 3600 * hour for hour in range(hours)))
+    series.values[VARIABLE] = array("d", (run(ts) for ts in series.times))
+    return series
+
+
+def _push(history, start: int, series) -> bool:
+    return history.push(start, series, (VARIABLE,))
+
+
+def check_shifted(hours: int, refreshes: int):
+    history = run_history.RunHistory()
+    run = _model_run(T0)
+    stored = [_push(history, T0 + 3600 * k, _window(run, T0 + 3600 * k, hours)) for k in range(refreshes)]
+    if stored != [True] + [False] * (refreshes - 1):
+        return f"pushes returned {stored}"
+    if len(history) != 1:
+        return f"{len(history)} runs stored"
+    return None
+
+
+def check_revised(hours: int, refreshes: int):
+    history = run_history.RunHistory()
+    run = _model_run(T0)
+    for k in range(refreshes):
+        _push(history, T0 + 3600 * k, _window(run, T0 + 3600 * k, hours))
+    start = T0 + 3600 * refreshes
+    if not _push(history, start, _window(_model_run(T0, 0.5), start, hours)):
+        return "new model run taken for a repeat"
+    metrics = history.metrics[VARIABLE]
+    if len(history) != 2 or metrics.revised_hours == 0 or abs(metrics.revision - 0.5) > 1e-9:
+        return f"{len(history)} runs, revision {metrics.revision} over {metrics.revised_hours} h"
+    return None
+
+
+def check_disjoint(hours: int, refreshes: int):
+    history = run_history.RunHistory()
+    run = _model_run(T0)
+    first = _window(run, T0, hours)
+    first.values[VARIABLE][hours // 2:] = array("d", [records.NAN]) * (hours - hours // 2)
+    second = _window(run, T0, hours)
+    second.values[VARIABLE][:hours // 2] = array("d", [records.NAN]) * (hours // 2)
+    _push(history, T0, first)
+    if not _push(history, T0, second):
+        return "run without common values taken for a repeat"
+    return None
+
+
+def check_capacity(hours: int, refreshes: int):
+    history = run_history.RunHistory()
+    analyses = [T0 + 12 * 3600 * k for k in range(history.capacity)]
+    for analysis in analyses:
+        _push(history, analysis, _window(_model_run(analysis, analysis / 3600 % 3), analysis, hours))
+    last = analyses[-1]
+    run = _model_run(last, last / 3600 % 3)
+    for k in range(1, 2 * history.capacity):
+        _push(history, last + 3600 * k, _window(run, last + 3600 * k, hours))
+    times = sorted(history.run_times[:len(history)])
+    if times != analyses:
+        return f"stored runs {[(t - T0) // 3600 for t in times]} h, expected {[(t - T0) // 3600 for t in analyses]} h"
+    return None
+
+
+SCENARIOS = {
+    "shifted": check_shifted,
+    "revised": check_revised,
+    "disjoint": check_disjoint,
+    "capacity": check_capacity,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=int, default=36, help="forecast horizon of every refresh (hours)")
+    parser.add_argument("--refreshes", type=int, default=10, help="hourly refreshes of one model run")
+    args = parser.parse_args()
+
+    failures = 0
+    for name, check in SCENARIOS.items():
+        error = check(args.hours, args.refreshes)
+        print(f"{name:<10} {'FAILED ' + error if error else 'ok'}")
+        failures += bool(error)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,501 @@
+"""
+stub_hass.py
+
+Minimal stand-in for the parts of the Home Assistant core that the SILAM Pollen
+platforms touch: the state machine, the entity registry, entity platforms
+(async_add_entities with update_before_add), the Entity / CoordinatorEntity
+life cycle and the recorder's attribute serialization.
+
+It only models what matters for measuring the integration's own costs: how many
+times each entity is updated and written, how large its attributes are and how
+much of them the recorder would store. Nothing is persisted and no network or
+event bus exists. install() registers the stub modules under the homeassistant.*
+names (and placeholder aiohttp / async_timeout / voluptuous modules if those are not
+installed) before the integration is imported; it must run before tools.integration.load().
+The names the package __init__ imports are registered too, so the package itself can be
+imported (tools/bench_import.py); its services and config flow are not modelled.
+"""
+
+import asyncio
+import enum
+import json
+import os
+import re
+import sys
+import time
+import types
+import zoneinfo
+
+# Attributes Home Assistant itself never records
+RECORDER_EXCLUDED = frozenset({"friendly_name", "icon", "entity_picture", "supported_features"})
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^0-9a-z]+", "_", str(text).lower()).strip("_")
+
+
+class Metrics:
+    """Counters collected by the stub core."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.writes = 0  # async_write_ha_state calls
+        self.changes = 0  # writes that changed state or attributes (state_changed events)
+        self.attribute_bytes = 0  # JSON size of the attributes of every write
+        self.recorded_bytes = 0  # JSON size of the attributes the recorder would store per change
+        self.updates = 0  # Entity.async_update calls
+        self.listener_calls = 0  # coordinator listener invocations
+        self.dropped_coroutines = 0  # listeners that returned a coroutine nobody awaits
+        self.tasks = 0  # hass.async_create_task calls
+        self.listener_seconds = 0.0  # time spent in coordinator listeners
+
+
+class State:
+    __slots__ = ("entity_id", "state", "attributes")
+
+    def __init__(self, entity_id, state, attributes):
+        self.entity_id = entity_id
+        self.state = state
+        self.attributes = attributes
+
+
+class StateMachine:
+    def __init__(self, metrics: Metrics):
+        self._states = {}
+        self._metrics = metrics
+
+    def get(self, entity_id):
+        return self._states.get(entity_id)
+
+    def async_all(self):
+        return list(self._states.values())
+
+    def async_set(self, entity_id, state, attributes, unrecorded=frozenset()):
+        metrics = self._metrics
+        metrics.writes += 1
+        encoded = json.dumps(attributes, default=str, separators=(",", ":"))
+        metrics.attribute_bytes += len(encoded)
+        previous = self._states.get(entity_id)
+        if previous is not None and previous.state == state and previous.attributes == attributes:
+            return
+        metrics.changes += 1
+        recorded = {
+            key: value for key, value in attributes.items()
+            if key not in unrecorded and key not in RECORDER_EXCLUDED
+        }
+        metrics.recorded_bytes += len(json.dumps(recorded, default=str, separators=(",", ":")))
+        self._states[entity_id] = State(entity_id, state, dict(attributes))
+
+
+class EntityRegistry:
+    def __init__(self):
+        self.entities = {}  # {(platform, unique_id): entity_id}
+
+    def async_get_or_create(self, domain, platform, unique_id):
+        key = (platform, unique_id)
+        if key not in self.entities:
+            self.entities[key] = f"{domain}.{slugify(unique_id)}"
+        return self.entities[key]
+
+
+class Config:
+    def __init__(self, config_dir: str):
+        self.config_dir = config_dir
+        self.elevation = 10
+        self.latitude = 60.17
+        self.longitude = 24.94
+        self.time_zone = "UTC"
+        # No recorder: long-term statistics are not published
+        self.components = set()
+
+    def path(self, *parts):
+        return os.path.join(self.config_dir, *parts)
+
+
+class HomeAssistant:
+    """Event loop, state machine, entity registry and hass.data."""
+
+    def __init__(self, config_dir: str):
+        self.metrics = Metrics()
+        self.data = {}
+        self.config = Config(config_dir)
+        self.states = StateMachine(self.metrics)
+        self.entity_registry = EntityRegistry()
+        self.loop = asyncio.get_event_loop()
+        self._tasks = set()
+
+    def async_create_task(self, coroutine, name=None):
+        self.metrics.tasks += 1
+        task = self.loop.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def async_add_executor_job(self, target, *args):
+        future = self.loop.run_in_executor(None, target, *args)
+        self._tasks.add(future)
+        future.add_done_callback(self._tasks.discard)
+        return future
+
+    async def async_block_till_done(self):
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+
+
+class ConfigEntry:
+    def __init__(self, entry_id, title, data, options=None):
+        self.entry_id = entry_id
+        self.title = title
+        self.data = data
+        self.options = options or {}
+        self._on_unload = []
+
+    def async_on_unload(self, func):
+        self._on_unload.append(func)
+
+
+def callback(func):
+    return func
+
+
+# --- Entities ------------------------------------------------------------------------------
+
+class Entity:
+    _attr_should_poll = True
+    _unrecorded_attributes = frozenset()
+    _attr_name = None
+    _attr_translation_key = None
+    _attr_has_entity_name = False
+    _attr_device_info = None
+    _attr_supported_features = None
+    _attr_unique_id = None
+
+    hass = None
+    entity_id = None
+    platform = None
+
+    def async_on_remove(self, func):
+        self.__dict__.setdefault("_on_remove", []).append(func)
+
+    @property
+    def should_poll(self):
+        return self._attr_should_poll
+
+    @property
+    def unique_id(self):
+        return self._attr_unique_id
+
+    @property
+    def state(self):
+        return None
+
+    @property
+    def extra_state_attributes(self):
+        return None
+
+    @property
+    def state_attributes(self):
+        return None
+
+    async def async_added_to_hass(self):
+        pass
+
+    def async_write_ha_state(self):
+        attributes = dict(self.state_attributes or {})
+        attributes.update(self.extra_state_attributes or {})
+        if self._attr_supported_features:
+            attributes["supported_features"] = self._attr_supported_features
+        self.hass.states.async_set(self.entity_id, self.state, attributes, self._unrecorded_attributes)
+
+    def async_schedule_update_ha_state(self, force_refresh=False):
+        if force_refresh:
+            self.hass.async_create_task(self._async_update_and_write())
+        else:
+            self.async_write_ha_state()
+
+    async def _async_update_and_write(self):
+        self.hass.metrics.updates += 1
+        await self.async_update()
+        self.async_write_ha_state()
+
+
+class SensorEntity(Entity):
+    @property
+    def native_value(self):
+        return None
+
+    @property
+    def native_unit_of_measurement(self):
+        return None
+
+    @property
+    def state(self):
+        return self.native_value
+
+    @property
+    def state_attributes(self):
+        unit = self.native_unit_of_measurement
+        return {"unit_of_measurement": unit} if unit else None
+
+
+class BinarySensorEntity(Entity):
+    @property
+    def is_on(self):
+        return None
+
+    @property
+    def state(self):
+        return None if self.is_on is None else ("on" if self.is_on else "off")
+
+
+class WeatherEntity(Entity):
+    _attr_native_temperature_unit = None
+
+    def __init__(self):
+        pass
+
+
+class DataUpdateCoordinator:
+    def __init__(self, hass, logger, name=None, update_interval=None, always_update=True, **kwargs):
+        self.hass = hass
+        self.logger = logger
+        self.name = name
+        self.update_interval = update_interval
+        self.data = None
+        self.last_update_success = True
+        self._listeners = {}
+
+    def async_add_listener(self, update_callback, context=None):
+        key = object()
+        self._listeners[key] = update_callback
+
+        def remove():
+            self._listeners.pop(key, None)
+
+        return remove
+
+    def async_update_listeners(self):
+        metrics = self.hass.metrics
+        started = time.perf_counter()
+        for update_callback in list(self._listeners.values()):
+            metrics.listener_calls += 1
+            result = update_callback()
+            if asyncio.iscoroutine(result):
+                # Home Assistant calls listeners synchronously: a coroutine is never awaited
+                metrics.dropped_coroutines += 1
+                result.close()
+        metrics.listener_seconds += time.perf_counter() - started
+
+    def _schedule_refresh(self):
+        pass
+
+    async def async_request_refresh(self):
+        await self.async_refresh()
+
+    async def async_refresh(self):
+        self.data = await self._async_update_data()
+        self.async_update_listeners()
+
+    async def async_config_entry_first_refresh(self):
+        await self.async_refresh()
+
+
+class CoordinatorEntity(Entity):
+    _attr_should_poll = False
+
+    def __init__(self, coordinator, context=None):
+        self.coordinator = coordinator
+
+    async def async_added_to_hass(self):
+        self.async_on_remove(self.coordinator.async_add_listener(self._handle_coordinator_update))
+
+    def _handle_coordinator_update(self):
+        self.async_write_ha_state()
+
+    async def async_update(self):
+        await self.coordinator.async_request_refresh()
+
+
+class UpdateFailed(Exception):
+    pass
+
+
+class Debouncer:
+    def __init__(self, hass, logger, cooldown=0, immediate=False, function=None):
+        self.function = function
+
+    async def async_call(self):
+        if self.function is not None:
+            await self.function()
+
+    def async_cancel(self):
+        pass
+
+
+class Store:
+    def __init__(self, hass, version, key, **kwargs):
+        self.key = key
+
+    async def async_load(self):
+        return None
+
+    def async_delay_save(self, data_func, delay=0):
+        pass
+
+    async def async_remove(self):
+        pass
+
+
+class DeviceEntryType(enum.Enum):
+    SERVICE = "service"
+
+
+def DeviceInfo(**kwargs):
+    return kwargs
+
+
+def async_track_state_change_event(hass, entity_ids, action):
+    return lambda: None
+
+
+class HomeAssistantError(Exception):
+    pass
+
+
+def _ensure_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def _persistent_notification(hass, message, title=None, notification_id=None):
+    pass
+
+
+def get_time_zone(time_zone_str):
+    try:
+        return zoneinfo.ZoneInfo(time_zone_str)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def distance(lat1, lon1, lat2, lon2):
+    return 0.0
+
+
+class _OfflineSession:
+    """aiohttp.ClientSession placeholder: the benchmark replays responses and never connects."""
+
+    def __init__(self, **kwargs):
+        self.options = kwargs
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def get(self, url, **kwargs):
+        raise RuntimeError(f"stub_hass has no network: {url}")
+
+
+# --- Entity platform -----------------------------------------------------------------------
+
+class EntityPlatform:
+    """async_add_entities of one platform of one entry, as Home Assistant runs it."""
+
+    def __init__(self, hass: HomeAssistant, domain: str):
+        self.hass = hass
+        self.domain = domain
+        self.entities = []
+        self.setup_seconds = 0.0
+
+    async def async_add(self, entities, update_before_add=False):
+        hass = self.hass
+        for entity in entities:
+            entity.hass = hass
+            entity.platform = self
+            entity.entity_id = hass.entity_registry.async_get_or_create(
+                self.domain, "silam_pollen", entity.unique_id or id(entity)
+            )
+            if update_before_add and hasattr(entity, "async_update"):
+                hass.metrics.updates += 1
+                await entity.async_update()
+            await entity.async_added_to_hass()
+            entity.async_write_ha_state()
+            self.entities.append(entity)
+
+    def async_add_entities(self, entities, update_before_add=False):
+        self.hass.async_create_task(self.async_add(list(entities), update_before_add))
+
+    async def async_poll(self):
+        """One polling cycle: async_update and a state write for every polled entity."""
+        for entity in self.entities:
+            if entity.should_poll and hasattr(entity, "async_update"):
+                self.hass.metrics.updates += 1
+                await entity.async_update()
+                entity.async_write_ha_state()
+
+
+# --- Module installation -------------------------------------------------------------------
+
+def _module(name, **attributes):
+    module = sys.modules.get(name)
+    if module is None or not getattr(module, "__stub__", False):
+        module = types.ModuleType(name)
+        module.__stub__ = True
+        module.__path__ = []
+        sys.modules[name] = module
+    for key, value in attributes.items():
+        setattr(module, key, value)
+    return module
+
+
+def install() -> None:
+    """Registers the stub modules (replacing an installed Home Assistant for this process)."""
+    _module("homeassistant")
+    _module("homeassistant.core", HomeAssistant=HomeAssistant, callback=callback,
+            SupportsResponse=types.SimpleNamespace(OPTIONAL="optional", ONLY="only"))
+    _module("homeassistant.config_entries", ConfigEntry=ConfigEntry)
+    _module("homeassistant.components")
+    _module("homeassistant.components.sensor", SensorEntity=SensorEntity)
+    _module("homeassistant.components.binary_sensor", BinarySensorEntity=BinarySensorEntity)
+    _module("homeassistant.components.weather", WeatherEntity=WeatherEntity)
+    _module("homeassistant.helpers")
+    _module("homeassistant.helpers.device_registry", DeviceInfo=DeviceInfo, DeviceEntryType=DeviceEntryType,
+            async_get=lambda hass: None)
+    _module("homeassistant.helpers.update_coordinator", DataUpdateCoordinator=DataUpdateCoordinator,
+            CoordinatorEntity=CoordinatorEntity, UpdateFailed=UpdateFailed)
+    _module("homeassistant.helpers.debounce", Debouncer=Debouncer)
+    _module("homeassistant.helpers.event", async_track_state_change_event=async_track_state_change_event)
+    _module("homeassistant.helpers.storage", Store=Store)
+    _module("homeassistant.helpers.entity_registry", async_get=lambda hass: hass.entity_registry)
+    _module("homeassistant.helpers.config_validation", ensure_list=_ensure_list, boolean=bool,
+            datetime=lambda value: value)
+    _module("homeassistant.components.persistent_notification", async_create=_persistent_notification)
+    _module("homeassistant.exceptions", HomeAssistantError=HomeAssistantError)
+    _module("homeassistant.util")
+    _module("homeassistant.util.location", distance=distance)
+    _module("homeassistant.util.dt", get_time_zone=get_time_zone)
+    # Responses are replayed: aiohttp and async_timeout are only placeholders when not installed
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        _module("aiohttp", ClientSession=_OfflineSession, ClientError=OSError)
+    try:
+        import async_timeout  # noqa: F401
+    except ImportError:
+        _module("async_timeout", timeout=asyncio.timeout)
+    try:
+        import voluptuous  # noqa: F401
+    except ImportError:
+        _module("voluptuous")
+
+
+__all__ = [
+    "ConfigEntry",
+    "EntityPlatform",
+    "HomeAssistant",
+    "Metrics",
+    "install",
+]